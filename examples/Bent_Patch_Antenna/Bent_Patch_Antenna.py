@@ -12,27 +12,25 @@
 
 ### Import Libraries
 import os
+import sys
 import tempfile
-from matplotlib import pyplot as plt
 from math import pi
 import numpy as np
-from dataclasses import dataclass
 
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from simtools import Simulation
+from simtools.runmode import pyplot
+from simtools.farfield import FarFieldCache
+from simtools import meshgen
+from simtools.meshgen import MeshGenerator
+
 from CSXCAD import CSXCAD
 from openEMS.openEMS import openEMS
 from openEMS.physical_constants import C0, EPS0, Z0, MUE0
 
-from mpl_toolkits.mplot3d import Axes3D
-
-
-@dataclass
-class Simulation:
-    name: str
-    geometry_file: Path
-    sim_path: Path
-
+plt = pyplot()
 
 ### General parameter setup
 dir_  = Path(__file__).parent
@@ -71,7 +69,12 @@ feed_R     = 50    #feed resistance
 SimBox_rad    = 2*100
 SimBox_height = 1.5*200
 
+# replace the hand-built mesh by a generated one within a cell budget
+auto_mesh   = meshgen.auto_mesh(False)  # or OPENEMS_AUTO_MESH=1
+cell_budget = 300e3
+
 ### Setup FDTD parameter & excitation function
+sim.checkpoint('setup')
 FDTD = openEMS(CoordSystem=1, EndCriteria=1e-4) # init a cylindrical FDTD
 f0 = 2e9 # center frequency
 fc = 1e9 # 20 dB corner frequency
@@ -87,6 +90,7 @@ mesh.SetDeltaUnit(unit)
 
 ### Setup the geometry using cylindrical coordinates
 # calculate some width as an angle in radiant
+sim.checkpoint('geometry')
 patch_ang_width = patch_width/(patch_radius+substrate_thickness)
 substr_ang_width = substrate_width/patch_radius
 feed_angle = feed_pos/patch_radius
@@ -106,10 +110,9 @@ substrate.AddBox(start=start, stop=stop)
 FDTD.AddEdges2Grid(dirs='all', properties=substrate)
 
 # save current density oon the patch
-jt_patch = CSX.AddDump('Jt_patch', dump_type=3, file_type=1)
 start = [patch_radius+substrate_thickness, -substr_ang_width/2, -substrate_length/2]
 stop  = [patch_radius+substrate_thickness, +substr_ang_width/2,  substrate_length/2]
-jt_patch.AddBox(start=start, stop=stop)
+jt_patch = sim.add_dump(CSX, 'Jt_patch', start, stop, preset='compressed', field='rotH')
 
 # create ground
 gnd = CSX.AddMetal('gnd') # create a perfect electric conductor (PEC)
@@ -124,6 +127,7 @@ stop  = [patch_radius+substrate_thickness,  feed_angle, 0]
 port = FDTD.AddLumpedPort(1 ,feed_R, start, stop, 'r', 1.0, priority=50, edges2grid='all')
 
 ### Finalize the Mesh
+sim.checkpoint('mesh')
 # add the simulation domain size
 mesh.AddLine('r', patch_radius+np.array([-20, SimBox_rad]))
 mesh.AddLine('a', [-0.75*pi, 0.75*pi])
@@ -138,21 +142,30 @@ max_ang = max_res/(SimBox_rad+patch_radius) # max res in radiant
 mesh.SmoothMeshLines(0, max_res, 1.4)
 mesh.SmoothMeshLines(1, max_ang, 1.4)
 mesh.SmoothMeshLines(2, max_res, 1.4)
+if auto_mesh:
+    # cylindrical: the angular resolution is taken at the outer radius, like max_ang
+    gen = MeshGenerator.from_csx(CSX, f_max=f0+fc, unit=unit, coord_system=1)
+    mesh_report = gen.apply(mesh, budget=cell_budget)
+    sim.profiler.set(auto_mesh=mesh_report.as_dict())
+    print(mesh_report)
 
 ## Add the nf2ff recording box
 nf2ff = FDTD.CreateNF2FFBox()
 
+sim.checkpoint('Write2XML')
 CSX.Write2XML(str(sim.geometry_file))
 
-FDTD.Run(str(sim.sim_path), cleanup=False)
+sim.run(FDTD, cleanup=False)
 
 ### Postprocessing & plotting
+sim.checkpoint('CalcPort')
 f = np.linspace(max(1e9,f0-fc),f0+fc,401)
 port.CalcPort(str(sim.sim_path), f)
 Zin = port.uf_tot / port.if_tot
 s11 = port.uf_ref/port.uf_inc
 s11_dB = 20.0*np.log10(np.abs(s11))
 
+sim.checkpoint('plot')
 plt.figure()
 plt.plot(f/1e9, s11_dB)
 plt.grid()
@@ -181,8 +194,11 @@ else:
     f_res = f[idx[0]]
     theta = np.arange(-180.0, 180.0, 2.0)
     print("Calculate NF2FF")
-    nf2ff_res_phi0 = nf2ff.CalcNF2FF(str(str(sim.sim_path)), f_res, theta, 0, center=np.array([patch_radius+substrate_thickness, 0, 0])*unit, read_cached=True, outfile='nf2ff_xz.h5')
+    sim.checkpoint('CalcNF2FF')
+    farfield = FarFieldCache(nf2ff, sim.sim_path)
+    nf2ff_res_phi0 = farfield.calc(f_res, theta, 0, center=np.array([patch_radius+substrate_thickness, 0, 0])*unit)
 
+    sim.checkpoint('plot')
     plt.figure(figsize=(15, 7))
     ax = plt.subplot(121, polar=True)
     E_norm = 20.0*np.log10(nf2ff_res_phi0.E_norm/np.max(nf2ff_res_phi0.E_norm)) + 10.0*np.log10(nf2ff_res_phi0.Dmax)
@@ -194,7 +210,7 @@ else:
     ax.legend(loc=3)
 
     phi = theta
-    nf2ff_res_theta90 = nf2ff.CalcNF2FF(str(str(sim.sim_path)), f_res, 90, phi, center=np.array([patch_radius+substrate_thickness, 0, 0])*unit, read_cached=True, outfile='nf2ff_xy.h5')
+    nf2ff_res_theta90 = farfield.calc(f_res, 90, phi, center=np.array([patch_radius+substrate_thickness, 0, 0])*unit)
 
     ax = plt.subplot(122, polar=True)
     E_norm = 20.0*np.log10(nf2ff_res_theta90.E_norm/np.max(nf2ff_res_theta90.E_norm)) + 10.0*np.log10(nf2ff_res_theta90.Dmax)
@@ -209,3 +225,5 @@ else:
     print( 'efficiency:   nu_rad = {:.1f} %'.format(100*nf2ff_res_theta90.Prad[0]/np.real(P_in[idx[0]])))
 
     plt.savefig(dir_ / "resonance.svg")
+
+sim.write_report()
@@ -12,28 +12,28 @@
 
 ### Import Libraries
 import os
+import sys
 import tempfile
-from matplotlib import pyplot as plt
 from math import pi, floor, ceil
 import numpy as np
-from numpy import linspace, imag, real, sqrt, array, log10, cos, sin, arange, squeeze, angle
-from dataclasses import dataclass
+from numpy import linspace, imag, real, sqrt, array, log10, cos, sin, arange, squeeze, angle, cumsum, interp, arccos
 
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from simtools import Simulation
+from simtools.runmode import pyplot
+from simtools.meshgen import periodic_mesh_hint
+from simtools import network
+from simtools.crossings import first_crossing, local_slope
+
 from CSXCAD import CSXCAD, ContinuousStructure
 from openEMS.openEMS import openEMS
 from openEMS.physical_constants import C0, EPS0, Z0, MUE0
 
-from mpl_toolkits.mplot3d import Axes3D
 from openEMS.automesh import mesh_hint_from_box
 
-
-@dataclass
-class Simulation:
-    name: str
-    geometry_file: Path
-    sim_path: Path
+plt = pyplot()
 
 ### General parameter setup
 dir_  = Path(__file__).parent
@@ -43,6 +43,28 @@ sim = Simulation(
     geometry_file= dir_ / f"{name}.xml",
     sim_path=dir_ / "results")
 
+unit = 1e-6 # specify everything in um
+
+feed_length = 30000
+
+# extraction method:
+#  'single'      one cell between long feeds (feed_length)
+#  'two-length'  one and two cells between short feeds, the feeds cancel out in
+#                the cascade (T_2 @ inv(T_1)), giving the Bloch phase of one cell
+#  'compare'     both, with engine time and deviation of the two-length results
+extraction = 'single'
+short_feed_length = 10000
+
+substrate_thickness = [1524, 101 , 254 ]
+substrate_epsr      = [3.48, 3.48, 3.48]
+
+# frequency range of interest
+f_start = 0.8e9
+f_stop  = 6e9
+
+# default unit cell geometry
+cell_params = dict(LL = 14e3, LW = 4e3, GLB = 1950, GLT = 4700, SL = 7800, SW = 1000, VR = 250)
+
 
 ### Class to represent single CRLH unit cells
 class CRLH_Cells:
@@ -66,30 +88,34 @@ class CRLH_Cells:
     def setEdgeResolution(self, res):
         self.edge_resolution = res
 
-    def createCell(self, translate = [0,0,0]):
+    def createCell(self, translate = [0,0,0], mesh_hint = True):
         mesh = [None,None,None]
-        third_res = self.edge_resolution/3
+        def add_hint(box, dirs, **kw):
+            nonlocal mesh
+            if mesh_hint:
+                mesh = mesh_hint_from_box(box, dirs, metal_edge_res=self.edge_resolution, mesh=mesh, **kw)
+
         translate = array(translate)
         start = [-self.LL/2 , -self.LW/2, self.Top] + translate
         stop  = [-self.GLT/2,  self.LW/2, self.Top] + translate
         box = self.props['metal_top'].AddBox(start, stop, priority=10)
-        mesh = mesh_hint_from_box(box, 'x', metal_edge_res=self.edge_resolution, down_dir=False, mesh=mesh)
-        mesh = mesh_hint_from_box(box, 'y', metal_edge_res=self.edge_resolution, mesh=mesh)
+        add_hint(box, 'x', down_dir=False)
+        add_hint(box, 'y')
 
         start = [+self.LL/2 , -self.LW/2, self.Top] + translate
         stop  = [+self.GLT/2,  self.LW/2, self.Top] + translate
         box = self.props['metal_top'].AddBox(start, stop, priority=10)
-        mesh = mesh_hint_from_box(box, 'x', metal_edge_res=self.edge_resolution, up_dir=False, mesh=mesh)
+        add_hint(box, 'x', up_dir=False)
 
         start = [-(self.LL-self.GLB)/2, -self.LW/2, self.Bot] + translate
         stop  = [+(self.LL-self.GLB)/2,  self.LW/2, self.Bot] + translate
         box = self.props['metal_bot'].AddBox(start, stop, priority=10)
-        mesh = mesh_hint_from_box(box, 'x', metal_edge_res=self.edge_resolution, mesh=mesh)
+        add_hint(box, 'x')
 
         start = [-self.SW/2, -self.LW/2-self.SL, self.Bot] + translate
         stop  = [+self.SW/2,  self.LW/2+self.SL, self.Bot] + translate
         box = self.props['metal_bot'].AddBox(start, stop, priority=10)
-        mesh = mesh_hint_from_box(box, 'xy', metal_edge_res=self.edge_resolution, mesh=mesh)
+        add_hint(box, 'xy')
 
         start = [0, -self.LW/2-self.SL+self.SW/2, 0       ] + translate
         stop  = [0, -self.LW/2-self.SL+self.SW/2, self.Bot] + translate
@@ -102,27 +128,28 @@ class CRLH_Cells:
 
         return mesh
 
+    def createCells(self, count, translate = [0,0,0]):
+        """
+        Create `count` cells in a row along x, centered at `translate`. The mesh
+        hint is computed for the first cell only and translated to the others,
+        returns (mesh hint, line counts before and after merging).
+        """
+        offsets = (arange(count) - (count-1)/2) * self.LL
+        hint = None
+        for dx in offsets:
+            cell_hint = self.createCell(array(translate) + [dx, 0, 0], mesh_hint=hint is None)
+            hint = hint or cell_hint
+        return periodic_mesh_hint(hint, offsets - offsets[0], axis=0, tol=self.edge_resolution/10)
 
-if __name__ == '__main__':
-    ### Setup the simulation
-    str(sim.sim_path) = os.path.join(tempfile.gettempdir(), 'CRLH_Extraction')
-    post_proc_only = False
-
-    unit = 1e-6 # specify everything in um
-
-    feed_length = 30000
-
-    substrate_thickness = [1524, 101 , 254 ]
-    substrate_epsr      = [3.48, 3.48, 3.48]
 
-    CRLH = CRLH_Cells(LL  = 14e3, LW  = 4e3, GLB = 1950, GLT = 4700, SL  = 7800, SW  = 1000, VR  = 250 , \
-                      Top = sum(substrate_thickness), \
-                      Bot = sum(substrate_thickness[:-1]))
+def createCRLH(**kw):
+    """ Create a CRLH unit cell on the default substrate, `kw` overrides cell_params """
+    params = dict(cell_params, **kw)
+    return CRLH_Cells(Top = sum(substrate_thickness), Bot = sum(substrate_thickness[:-1]), **params)
 
-    # frequency range of interest
-    f_start = 0.8e9
-    f_stop  = 6e9
 
+def createSimulation(CRLH, n_cells=1, feed=feed_length):
+    """ Setup the FDTD model of `n_cells` CRLH cells between two MSL feeds, returns (FDTD, CSX, port) """
     ### Setup FDTD parameters & excitation function
     CSX  = ContinuousStructure()
     FDTD = openEMS(EndCriteria=1e-5)
@@ -133,14 +160,14 @@ if __name__ == '__main__':
     CRLH.createProperties(CSX)
 
     FDTD.SetGaussExcite((f_start+f_stop)/2, (f_stop-f_start)/2 )
-    BC   = {'PML_8' 'PML_8' 'MUR' 'MUR' 'PEC' 'PML_8'}
     FDTD.SetBoundaryCond( ['PML_8', 'PML_8', 'MUR', 'MUR', 'PEC', 'PML_8'] )
 
     ### Setup a basic mesh and create the CRLH unit cell
     resolution = C0/(f_stop*sqrt(max(substrate_epsr)))/unit /30 # resolution of lambda/30
     CRLH.setEdgeResolution(resolution/4)
 
-    mesh.SetLines('x', [-feed_length-CRLH.LL/2, 0, feed_length+CRLH.LL/2])
+    length = n_cells*CRLH.LL
+    mesh.SetLines('x', [-feed-length/2, 0, feed+length/2])
     mesh.SetLines('y', [-30000, 0, 30000])
 
     substratelines = cumsum(substrate_thickness)
@@ -148,8 +175,9 @@ if __name__ == '__main__':
     mesh.AddLine('z', cumsum(substrate_thickness))
     mesh.AddLine('z', linspace(substratelines[-2],substratelines[-1],4))
 
-    # create the CRLH unit cell (will define additional fixed mesh lines)
-    mesh_hint = CRLH.createCell()
+    # create the CRLH unit cells (will define additional fixed mesh lines)
+    mesh_hint, counts = CRLH.createCells(n_cells)
+    print('mesh hints: {lines} lines for {cells} cell(s), {unique} after merging'.format(**counts))
     mesh.AddLine('x', mesh_hint[0])
     mesh.AddLine('y', mesh_hint[1])
 
@@ -172,78 +200,186 @@ if __name__ == '__main__':
     port = [None, None]
     x_lines = mesh.GetLines('x')
     portstart = [ x_lines[0], -CRLH.LW/2, substratelines[-1]]
-    portstop  = [ -CRLH.LL/2,  CRLH.LW/2, 0]
-    port[0] = FDTD.AddMSLPort( 1,  pec, portstart, portstop, 'x', 'z', excite=-1, FeedShift=10*resolution, MeasPlaneShift=feed_length/2, priority=10)
-
+    portstop  = [ -length/2,  CRLH.LW/2, 0]
+    port[0] = FDTD.AddMSLPort( 1,  pec, portstart, portstop, 'x', 'z', excite=-1, FeedShift=min(10*resolution, feed/3), MeasPlaneShift=feed/2, priority=10)
 
     portstart = [ x_lines[-1], -CRLH.LW/2, substratelines[-1]]
-    portstop  = [ +CRLH.LL/2 ,  CRLH.LW/2, 0]
-    port[1] = FDTD.AddMSLPort( 2,  pec, portstart, portstop, 'x', 'z', MeasPlaneShift=feed_length/2, priority=10)
+    portstop  = [ +length/2 ,  CRLH.LW/2, 0]
+    port[1] = FDTD.AddMSLPort( 2,  pec, portstart, portstop, 'x', 'z', MeasPlaneShift=feed/2, priority=10)
 
-    ### Run the simulation
-    CSX.Write2XML(sim.geometry_file)
+    return FDTD, CSX, port
 
-    FDTD.Run(str(sim.sim_path), cleanup=False)
 
-    ### Post-Processing
-    f = linspace( f_start, f_stop, 1601 )
+def calcSParameter(port, sim_path, f, feed=feed_length):
+    """ Calculate S11 and S21 at the reference planes of the unit cell """
     for p in port:
-        p.CalcPort( str(sim.sim_path), f, ref_impedance = 50, ref_plane_shift = feed_length)
-
-    # calculate and plot scattering parameter
-    s11 = port[0].uf_ref / port[0].uf_inc
-    s21 = port[1].uf_ref / port[0].uf_inc
-
-    plt.plot(f/1e9,20*log10(abs(s11)),'k-' , linewidth=2, label='$S_{11}$')
-    plt.plot(f/1e9,20*log10(abs(s21)),'r--', linewidth=2, label='$S_{21}$')
-    plt.grid()
-    plt.legend(loc=3)
-    plt.ylabel('S-Parameter (dB)')
-    plt.xlabel('frequency (GHz)')
-    plt.ylim([-40, 2])
-    plt.savefig(dir_ / "sparams.svg")
-
-    ### Extract CRLH parameter form ABCD matrix
-    A = ((1+s11)*(1-s11) + s21*s21)/(2*s21)
-    C = ((1-s11)*(1-s11) - s21*s21)/(2*s21) / port[1].Z_ref
-
+        p.CalcPort( str(sim_path), f, ref_impedance = 50, ref_plane_shift = feed)
+
+    net = network.Network.from_ports(port)
+    return net.S[:,0,0], net.S[:,1,0]
+
+
+def extractCRLH(f, s11, s21, Z_ref):
+    """
+    Extract the CRLH series and shunt tank parameter from the ABCD matrix of one
+    cell, s11/s21 may hold one row per design (designs x frequencies)
+    """
+    T = network.s2abcd(network.two_port(s11, s21), Z_ref)
+    return extractTanks(f, T[...,0,0], T[...,1,0])
+
+
+def extractTwoLength(f, s_short, s_long, Z_ref):
+    """
+    Extract the tank parameter and the Bloch phase of one cell from the
+    (s11, s21) of models with one and two cells
+    """
+    T = [network.s2abcd(network.two_port(*sp), Z_ref) for sp in (s_short, s_long)]
+    M = network.deembed_cell(*T)
+    res = extractTanks(f, (M[...,0,0]+M[...,1,1])/2, M[...,1,0])
+    res['beta_p'] = imag(network.bloch_phase(M))
+    return res
+
+
+def extractTanks(f, A, C, half_width=3):
+    """
+    Tank parameter from the A and C element of the ABCD matrix of a symmetric
+    cell, A and C are (..., frequencies). The resonances are the first rising
+    zero crossings of Im(Z) and Im(Y), the slopes d/dw at them (twice LR and
+    CR) are least-squares fits over 2*half_width samples. Values are NaN for
+    designs without a resonance in the band.
+    """
     Y = C
     Z = 2*(A-1)/C
 
     iZ = imag(Z)
     iY = imag(Y)
+    w = 2*pi*np.asarray(f)
 
-    fse = interp(0, iZ, f)
-    fsh = interp(0, iY, f)
-
-    df = f[1]-f[0]
-    fse_idx = np.where(f>fse)[0][0]
-    fsh_idx = np.where(f>fsh)[0][0]
+    fse, fse_idx = first_crossing(f, iZ, rising=True)
+    fsh, fsh_idx = first_crossing(f, iY, rising=True)
 
-    LR = 0.5*(iZ[fse_idx]-iZ[fse_idx-1])/(2*pi*df)
+    LR = 0.5*local_slope(w, iZ, fse_idx, half_width)
     CL = 1/(2*pi*fse)**2/LR
 
-    CR = 0.5*(iY[fsh_idx]-iY[fsh_idx-1])/(2*pi*df)
+    CR = 0.5*local_slope(w, iY, fsh_idx, half_width)
     LL = 1/(2*pi*fsh)**2/CR
 
+    res = dict(CL=CL, LR=LR, CR=CR, LL=LL, f_se=fse, f_sh=fsh)
+    return {k: v[()] for k, v in res.items()}
+
+
+def cellSimulation(n_cells):
+    """ Simulation of the short feed model with `n_cells` cells """
+    tag = '{}cell_short'.format(n_cells)
+    return Simulation(
+        name='{}_{}'.format(name, tag),
+        geometry_file=dir_ / '{}_{}.xml'.format(name, tag),
+        sim_path=dir_ / 'results_{}'.format(tag))
+
+
+def runCells(s, CRLH, f, n_cells=1, feed=feed_length):
+    """ Build and run the model with `n_cells` cells as Simulation `s`, returns its port results """
+    s.checkpoint('setup')
+    FDTD, CSX, port = createSimulation(CRLH, n_cells, feed)
+
+    s.checkpoint('Write2XML')
+    CSX.Write2XML(str(s.geometry_file))
+
+    s.run(FDTD, cleanup=False)
+
+    # the stages are skipped on a re-run if their inputs and the FDTD results are unchanged
+    def calc_ports(f):
+        s11, s21 = calcSParameter(port, s.sim_path, f, feed)
+        return dict(s11=s11, s21=s21, Z_ref=port[1].Z_ref, beta_MSL=real(port[1].beta))
+
+    return s.stage('CalcPort', calc_ports, f)
+
+
+def engineTime(s):
+    return sum(p['wall_time'] for p in s.profiler.phases if p['name'] == 'FDTD.Run')
+
+
+def compareExtractions(single, two_length):
+    """ Print engine time, mesh size and deviation of the two-length extraction, arguments are (simulations, results) """
+    print(' method        cells (k)   engine time (s)')
+    for label, (sims, res) in [('single', single), ('two-length', two_length)]:
+        cells = sum(s.profiler.info.get('mesh_cells') or 0 for s in sims)
+        print(' {:<12} {:10.1f} {:17.1f}'.format(label, cells/1e3, sum(engineTime(s) for s in sims)))
+    print(' parameter      single   two-length   deviation')
+    for k, scale in [('CL', 1e12), ('LR', 1e9), ('CR', 1e12), ('LL', 1e9), ('f_se', 1e-9), ('f_sh', 1e-9)]:
+        a, b = single[1][k], two_length[1][k]
+        print(' {:<8} {:12.3f} {:12.3f} {:10.1%}'.format(k, a*scale, b*scale, (b-a)/a))
+    beta_single = abs(angle(single[1]['s21']))
+    print(' beta*p/pi rms deviation: {:.3f}'.format(sqrt(np.mean((two_length[1]['beta_p'] - beta_single)**2))/pi))
+
+
+if __name__ == '__main__':
+    def plot_results(f, s11, s21, beta_MSL, betas, CL, LR, CR, LL, f_se, f_sh):
+        # calculate and plot scattering parameter
+        plt.plot(f/1e9,network.db(s11),'k-' , linewidth=2, label='$S_{11}$')
+        plt.plot(f/1e9,network.db(s21),'r--', linewidth=2, label='$S_{21}$')
+        plt.grid()
+        plt.legend(loc=3)
+        plt.ylabel('S-Parameter (dB)')
+        plt.xlabel('frequency (GHz)')
+        plt.ylim([-40, 2])
+        plt.savefig(dir_ / "sparams.svg")
+
+        ### Calculate analytical wave-number of an inf-array of cells
+        w = 2*pi*f
+        wse = 2*pi*f_se
+        wsh = 2*pi*f_sh
+        beta_calc = real(arccos(1-(w**2-wse**2)*(w**2-wsh**2)/(2*w**2/CR/LR)))
+
+        # plot
+        plt.figure()
+        styles = iter(['k-', 'b-.'])
+        for label, beta_p in betas.items():
+            plt.plot(beta_p/pi,f*1e-9,next(styles), linewidth=2, label=label)
+        plt.grid()
+        plt.plot(beta_calc/pi,f*1e-9,'c--', linewidth=2, label=r'$\beta_{CRLH,\ \infty\ cells}$')
+        plt.plot(beta_MSL*CRLH.LL*unit/pi,f*1e-9,'g-', linewidth=2, label=r'$\beta_{MSL}$')
+        plt.ylim([1, 6])
+        plt.xlabel(r'$|\beta| p / \pi$')
+        plt.ylabel('frequency (GHz)')
+        plt.legend(loc=2)
+        plt.savefig(dir_ / "beta.svg")
+
+    ### Setup and run the simulations
+    CRLH = createCRLH()
+    f = linspace( f_start, f_stop, 1601 )
+    betas = dict()
+
+    if extraction in ('single', 'compare'):
+        sp = runCells(sim, CRLH, f)
+        ### Extract CRLH parameter form ABCD matrix
+        res = sim.stage('extract', extractCRLH, f, sp['s11'], sp['s21'], sp['Z_ref'])
+        betas[r'$\beta_{CRLH,\ 1\ cell}$'] = abs(angle(sp['s21']))
+        single = ([sim], dict(res, s21=sp['s21']))
+
+    if extraction in ('two-length', 'compare'):
+        sims = [cellSimulation(1), cellSimulation(2)]
+        sps = [runCells(s, CRLH, f, n, short_feed_length) for s, n in zip(sims, [1, 2])]
+        sp = sps[0]
+        res = sims[1].stage('extract', extractTwoLength, f, (sps[0]['s11'], sps[0]['s21']),
+                            (sps[1]['s11'], sps[1]['s21']), sp['Z_ref'])
+        two_length = (sims, dict(res))
+        betas[r'$\beta_{CRLH,\ Bloch}$'] = res.pop('beta_p')
+
+    # in compare mode the two-length results are shown
+    CL, LR, CR, LL, fse, fsh = [res[k] for k in ['CL', 'LR', 'CR', 'LL', 'f_se', 'f_sh']]
+
     print(' Series tank: CL = {:.2f} pF,  LR = {:.2f} nH -> f_se = {:.2f} GHz '.format(CL*1e12, LR*1e9, fse*1e-9))
     print(' Shunt  tank: CR = {:.2f} pF,  LL = {:.2f} nH -> f_sh = {:.2f} GHz '.format(CR*1e12, LL*1e9, fsh*1e-9))
 
-    ### Calculate analytical wave-number of an inf-array of cells
-    w = 2*pi*f
-    wse = 2*pi*fse
-    wsh = 2*pi*fsh
-    beta_calc = real(arccos(1-(w**2-wse**2)*(w**2-wsh**2)/(2*w**2/CR/LR)))
-
-    # plot
-    plt.figure()
-    beta = -angle(s21)/CRLH.LL/unit
-    plt.plot(abs(beta)*CRLH.LL*unit/pi,f*1e-9,'k-', linewidth=2, label=r'$\beta_{CRLH,\ 1\ cell}$' )
-    plt.grid()
-    plt.plot(beta_calc/pi,f*1e-9,'c--', linewidth=2, label=r'$\beta_{CRLH,\ \infty\ cells}$')
-    plt.plot(real(port[1].beta)*CRLH.LL*unit/pi,f*1e-9,'g-', linewidth=2, label=r'$\beta_{MSL}$')
-    plt.ylim([1, 6])
-    plt.xlabel(r'$|\beta| p / \pi$')
-    plt.ylabel('frequency (GHz)')
-    plt.legend(loc=2)
-    plt.savefig(dir_ / "beta.svg")
+    if extraction == 'compare':
+        compareExtractions(single, two_length)
+
+    reports = [sim] if extraction != 'two-length' else []
+    if extraction != 'single':
+        reports += sims
+    reports[-1].stage('plot', plot_results, f, sp['s11'], sp['s21'], sp['beta_MSL'], betas, **res,
+                      outputs=[dir_ / "sparams.svg", dir_ / "beta.svg"])
+
+    for s in reports:
+        s.write_report()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+ Parameter sweep over the CRLH unit cell geometry
+
+ Every sweep point is built with CRLH_Extraction.createSimulation into its own
+ directory below sweep/, the points are simulated in a pool of worker
+ processes and the extracted CL/LR/CR/LL and f_se/f_sh values are collected
+ into sweep/results.csv.
+
+ Usage:
+   python3 CRLH_Sweep.py                 # full grid over gap, stub length and via radius
+   python3 CRLH_Sweep.py --lhs 30        # 30 point Latin hypercube over the same ranges
+"""
+
+import os
+import sys
+import json
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from simtools import Simulation
+from simtools.sweep import grid, latin_hypercube, run_sweep, write_table
+
+import CRLH_Extraction as crlh
+
+dir_ = Path(__file__).parent
+sweep_dir = dir_ / "sweep"
+
+# swept CRLH_Cells arguments in um, all others are taken from crlh.cell_params
+sweep_values = dict(
+    GLB = [1500, 1950, 2400],  # gap length bottom
+    SL  = [6800, 7800, 8800],  # stub length
+    VR  = [200, 250, 300],     # via radius
+)
+
+
+def evaluate(index, params, threads):
+    """ Build, simulate and extract a single sweep point """
+    point_dir = sweep_dir / f"point_{index:03d}"
+    point_dir.mkdir(parents=True, exist_ok=True)
+    with open(point_dir / "params.json", "w") as fh:
+        json.dump(params, fh, indent=1)
+
+    sim = Simulation(
+        name=f"CRLH_{index:03d}",
+        geometry_file=point_dir / "CRLH_Cell.xml",
+        sim_path=point_dir / "results")
+
+    CRLH = crlh.createCRLH(**params)
+    FDTD, CSX, port = crlh.createSimulation(CRLH)
+    CSX.Write2XML(str(sim.geometry_file))
+    sim.run(FDTD, cleanup=False, numThreads=threads)
+
+    f = np.linspace(crlh.f_start, crlh.f_stop, 1601)
+    with sim.phase("CalcPort"):
+        s11, s21 = crlh.calcSParameter(port, sim.sim_path, f)
+    res = crlh.extractCRLH(f, s11, s21, port[1].Z_ref)
+    sim.write_report(verbose=False)
+    return res
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lhs", type=int, default=0, help="number of Latin hypercube samples instead of the full grid")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for the Latin hypercube")
+    parser.add_argument("--threads", type=int, default=None, help="total engine threads available")
+    parser.add_argument("--jobs", type=int, default=None, help="maximum number of simulations running at once")
+    args = parser.parse_args()
+
+    if args.lhs:
+        ranges = {k: (min(v), max(v)) for k, v in sweep_values.items()}
+        points = latin_hypercube(args.lhs, seed=args.seed, **ranges)
+    else:
+        points = grid(**sweep_values)
+
+    sweep_dir.mkdir(parents=True, exist_ok=True)
+    table = run_sweep(evaluate, points, total_threads=args.threads, max_parallel=args.jobs)
+    write_table(table, sweep_dir / "results.csv")
+
+    print()
+    print(' point    GLB     SL     VR    CL/pF   LR/nH   CR/pF   LL/nH  f_se/GHz  f_sh/GHz')
+    for k in range(len(points)):
+        if table['error'][k]:
+            print(' {:5d}  failed: {}'.format(k, table['error'][k]))
+            continue
+        print(' {:5d} {:6.0f} {:6.0f} {:6.0f} {:8.2f} {:7.2f} {:7.2f} {:7.2f} {:9.2f} {:9.2f}'.format(
+            k, table['GLB'][k], table['SL'][k], table['VR'][k],
+            table['CL'][k]*1e12, table['LR'][k]*1e9, table['CR'][k]*1e12, table['LL'][k]*1e9,
+            table['f_se'][k]*1e-9, table['f_sh'][k]*1e-9))
+    print('results written to', sweep_dir / "results.csv")
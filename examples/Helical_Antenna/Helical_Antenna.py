@@ -12,27 +12,24 @@
 
 ### Import Libraries
 import os
+import sys
 import tempfile
-from matplotlib import pyplot as plt
 from math import pi, floor, ceil
 import numpy as np
 from numpy import linspace, imag, real, sqrt, array, log10, cos, sin, arange, squeeze, interp
-from dataclasses import dataclass
 
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from simtools import Simulation
+from simtools.runmode import pyplot
+from simtools.farfield import FarFieldCache
+
 from CSXCAD import CSXCAD, ContinuousStructure
 from openEMS.openEMS import openEMS
 from openEMS.physical_constants import C0, EPS0, Z0, MUE0
 
-from mpl_toolkits.mplot3d import Axes3D
-
-
-@dataclass
-class Simulation:
-    name: str
-    geometry_file: Path
-    sim_path: Path
+plt = pyplot()
 
 ### General parameter setup
 dir_  = Path(__file__).parent
@@ -44,8 +41,6 @@ sim = Simulation(
 
 
 ### Setup the simulation
-post_proc_only = False
-
 unit = 1e-3 # all length in mm
 
 f0 = 2.4e9 # center frequency, frequency of interest!
@@ -67,6 +62,7 @@ feed_R = 120    #feed impedance
 SimBox = array([1, 1, 1.5])*2.0*lambda0
 
 ### Setup FDTD parameter & excitation function
+sim.checkpoint('setup')
 FDTD = openEMS(EndCriteria=1e-4)
 FDTD.SetGaussExcite( f0, fc )
 FDTD.SetBoundaryCond( ['MUR', 'MUR', 'MUR', 'MUR', 'MUR', 'PML_8'] )
@@ -77,6 +73,7 @@ FDTD.SetCSX(CSX)
 mesh = CSX.GetGrid()
 mesh.SetDeltaUnit(unit)
 
+sim.checkpoint('mesh')
 max_res = floor(C0 / (f0+fc) / unit / 20) # cell size: lambda/20
 
 # create helix mesh
@@ -102,6 +99,7 @@ mesh.SmoothMeshLines('z', max_res, ratio=1.4)
 ### Create the Geometry
 ## * Create the metal helix using the wire primitive.
 ## * Create a metal gorund plane as cylinder.
+sim.checkpoint('geometry')
 # create a perfect electric conductor (PEC)
 helix_metal = CSX.AddMetal('helix' )
 
@@ -143,17 +141,20 @@ port = FDTD.AddLumpedPort(1 ,feed_R, start, stop, 'z', 1.0, priority=5)
 nf2ff = FDTD.CreateNF2FFBox(opt_resolution=[lambda0/15]*3)
 
 ### Run the simulation
+sim.checkpoint('Write2XML')
 CSX.Write2XML(sim.geometry_file)
 
-FDTD.Run(str(sim.sim_path), cleanup=False)
+sim.run(FDTD, cleanup=False)
 
 ### Postprocessing & plotting
+sim.checkpoint('CalcPort')
 freq = linspace( f0-fc, f0+fc, 501 )
 port.CalcPort(str(sim.sim_path), freq)
 
 Zin = port.uf_tot / port.if_tot
 s11 = port.uf_ref / port.uf_inc
 
+sim.checkpoint('plot')
 ## Plot the feed point impedance
 plt.figure()
 plt.plot( freq/1e6, real(Zin), 'k-', linewidth=2, label=r'$\Re(Z_{in})$' )
@@ -180,7 +181,9 @@ theta = arange(0.,180.,1.)
 phi = arange(-180,180,2)
 print( 'calculating the 3D far field...' )
 
-nf2ff_res = nf2ff.CalcNF2FF(str(sim.sim_path), f0, theta, phi, read_cached=True, verbose=True )
+sim.checkpoint('CalcNF2FF')
+farfield = FarFieldCache(nf2ff, sim.sim_path)
+nf2ff_res = farfield.calc(f0, theta, phi, verbose=True)
 
 Dmax_dB = 10*log10(nf2ff_res.Dmax[0])
 E_norm = 20.0*log10(nf2ff_res.E_norm[0]/np.max(nf2ff_res.E_norm[0])) + 10*log10(nf2ff_res.Dmax[0])
@@ -197,6 +200,7 @@ E_norm = 20.0*log10(nf2ff_res.E_norm[0]/np.max(nf2ff_res.E_norm[0])) + 10*log10(
 E_CPRH = 20.0*log10(np.abs(nf2ff_res.E_cprh[0])/np.max(nf2ff_res.E_norm[0])) + 10*log10(nf2ff_res.Dmax[0])
 E_CPLH = 20.0*log10(np.abs(nf2ff_res.E_cplh[0])/np.max(nf2ff_res.E_norm[0])) + 10*log10(nf2ff_res.Dmax[0])
 
+sim.checkpoint('plot')
 ## * Plot the pattern
 plt.figure()
 plt.plot(theta, E_norm[:,phi==0],'k-' , linewidth=2, label='$|E|$')
@@ -208,3 +212,5 @@ plt.ylabel('directivity (dBi)')
 plt.title('Frequency: {} GHz'.format(nf2ff_res.freq[0]/1e9))
 plt.legend()
 plt.savefig(dir_ / "directivity.svg")
+
+sim.write_report()
@@ -10,27 +10,26 @@
 
 """
 import os
+import sys
 import tempfile
-from matplotlib import pyplot as plt
 from math import pi
 import numpy as np
 from numpy import linspace, imag, real, sqrt, array, log10
-from dataclasses import dataclass
 
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from simtools import Simulation
+from simtools.runmode import pyplot
+from simtools.adaptive import adaptive_sweep, use_adaptive
+from simtools.probes import ProbePort, ProbeTraces
+from simtools.network import Network, db
+
 from CSXCAD import CSXCAD, ContinuousStructure
 from openEMS.openEMS import openEMS
 from openEMS.physical_constants import C0, EPS0, Z0, MUE0
 
-from mpl_toolkits.mplot3d import Axes3D
-
-
-@dataclass
-class Simulation:
-    name: str
-    geometry_file: Path
-    sim_path: Path
+plt = pyplot()
 
 ### General parameter setup
 dir_  = Path(__file__).parent
@@ -48,7 +47,13 @@ substrate_epr = 3.66
 stub_length = 12e3
 f_max = 7e9
 
+# sample the ports adaptively (refined around the notch) and evaluate a
+# rational fit on the plot grid, instead of calculating all plot points;
+# the calculated samples are plotted as markers on top of the fit
+adaptive = use_adaptive(True)  # or OPENEMS_ADAPTIVE=0
+
 ### Setup FDTD parameters & excitation function
+sim.checkpoint('setup')
 FDTD = openEMS()
 FDTD.SetGaussExcite( f_max/2, f_max/2 )
 FDTD.SetBoundaryCond( ['PML_8', 'PML_8', 'MUR', 'MUR', 'PEC', 'MUR'] )
@@ -62,6 +67,7 @@ mesh.SetDeltaUnit(unit)
 resolution = C0/(f_max*sqrt(substrate_epr))/unit/50 # resolution of lambda/50
 third_mesh = array([2*resolution/3, -resolution/3])/4
 
+sim.checkpoint('mesh')
 ## Do manual meshing
 mesh.AddLine('x', 0)
 mesh.AddLine('x',  MSL_width/2+third_mesh)
@@ -84,6 +90,7 @@ mesh.AddLine('z', linspace(0,substrate_thickness,5))
 mesh.AddLine('z', 3000)
 mesh.SmoothMeshLines('z', resolution)
 
+sim.checkpoint('geometry')
 ## Add the substrate
 substrate = CSX.AddMaterial( 'RO4350B', epsilon=substrate_epr)
 start = [-MSL_length, -15*MSL_width, 0]
@@ -107,23 +114,43 @@ stop  = [ MSL_width/2,  MSL_width/2+stub_length, substrate_thickness]
 pec.AddBox(start, stop, priority=10 )
 
 ### Run the simulation
+sim.checkpoint('Write2XML')
 CSX.Write2XML(sim.geometry_file)
 
-FDTD.Run(str(sim.sim_path), cleanup=False)
+sim.run(FDTD, cleanup=False)
 
 ### Post-processing and plotting
-f = linspace( 1e6, f_max, 1601 )
-for p in port:
-    p.CalcPort( str(sim.sim_path), f, ref_impedance = 50)
-
-s11 = port[0].uf_ref / port[0].uf_inc
-s21 = port[1].uf_ref / port[0].uf_inc
+sim.checkpoint('CalcPort')
+# the probe traces are read once, every refinement round only adds the DFT
+# at its new frequencies
+traces = ProbeTraces(sim.sim_path)
+probe_port = [ProbePort.of(p, traces) for p in port]
+def calc_sparams(f):
+    for p in probe_port:
+        p.CalcPort( sim.sim_path, f, ref_impedance = 50)
+    return Network.from_ports(probe_port).S[:,:,0]
 
-plt.plot(f/1e9,20*log10(abs(s11)),'k-',linewidth=2 , label='$S_{11}$')
+f = linspace( 1e6, f_max, 1601 )
+if adaptive:
+    sweep = adaptive_sweep(calc_sparams, f[0], f[-1])
+    sim.checkpoint('fit')
+    S = sweep.model(f)
+    print('{} of {} frequencies calculated, fit error {:.1e}'.format(len(sweep.f), len(f), sweep.rms_error()))
+else:
+    S = calc_sparams(f)
+s11, s21 = S[:,0], S[:,1]
+
+sim.checkpoint('plot')
+plt.plot(f/1e9,db(s11),'k-',linewidth=2 , label='$S_{11}$')
 plt.grid()
-plt.plot(f/1e9,20*log10(abs(s21)),'r--',linewidth=2 , label='$S_{21}$')
+plt.plot(f/1e9,db(s21),'r--',linewidth=2 , label='$S_{21}$')
+if adaptive:
+    plt.plot(sweep.f/1e9,db(sweep.H[:,0]),'k.', label='$S_{11}$ calculated')
+    plt.plot(sweep.f/1e9,db(sweep.H[:,1]),'r.', label='$S_{21}$ calculated')
 plt.legend()
 plt.ylabel('S-Parameter (dB)')
 plt.xlabel('frequency (GHz)')
 plt.ylim([-40, 2])
 plt.savefig(dir_ / "sparams.svg")
+
+sim.write_report()
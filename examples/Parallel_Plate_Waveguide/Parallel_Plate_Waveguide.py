@@ -5,26 +5,22 @@
 #
 
 import os
+import sys
 import tempfile
 import copy
 from math import pi
 from pathlib import Path
-from dataclasses import dataclass
 
 import numpy as np
-from matplotlib import pyplot as plt
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from simtools import Simulation
 
 from CSXCAD  import ContinuousStructure, CSProperties
 from openEMS import openEMS
 from openEMS.physical_constants import C0, EPS0, Z0, MUE0
 
 
-@dataclass
-class Simulation:
-    name: str
-    geometry_file: Path
-    sim_path: Path
-
 ### General parameter setup
 dir_  = Path(__file__).parent
 name  = Path(__file__).stem
@@ -36,6 +32,7 @@ sim = Simulation(
 ### FDTD setup
 ## * Limit the simulation to 100 timesteps
 ## * Define a reduced end criteria of -40dB
+sim.checkpoint('setup')
 FDTD = openEMS(CoordSystem=0, NrTS=100, EndCriteria=0, OverSampling=50)
 f0 = 10e6
 
@@ -65,15 +62,20 @@ SimBox = np.array([20, 20, 40])
 
 excitation.AddBox(start=[-SimBox[0]/2,-SimBox[1]/2, 0], stop=[SimBox[0]/2,SimBox[1]/2,0])
 
+sim.checkpoint('mesh')
 mesh.AddLine('x', np.arange(-SimBox[0]/2, SimBox[0]/2))
 mesh.AddLine('y', np.arange(-SimBox[1]/2, SimBox[1]/2))
 mesh.AddLine('z', np.arange(-SimBox[2]/4, SimBox[2]*3/4))
 
 
+sim.checkpoint('geometry')
 Et = CSX.AddDump('Et')
 Et.AddBox(start=[-SimBox[0]/2,0,-SimBox[2]/4], stop=[10,0,SimBox[2]*3/4]);
 
 # os.mkdir(str(sim.sim_path))
 
+sim.checkpoint('Write2XML')
 CSX.Write2XML(str(sim.geometry_file))
-FDTD.Run(str(sim.sim_path), cleanup=False)
+sim.run(FDTD, cleanup=False)
+
+sim.write_report()
@@ -11,29 +11,26 @@
 
 ### Import Libraries
 import os
+import sys
 import tempfile
-from matplotlib import pyplot as plt
 from math import pi, floor, ceil
 import numpy as np
 from numpy import linspace, imag, real, sqrt, array, log10, cos, sin, arange, squeeze
 from numpy.linalg import norm
-from dataclasses import dataclass
 
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from simtools import Simulation
+from simtools.runmode import pyplot
+from simtools.farfield import FarFieldCache
+from simtools.rcs import calc_rcs, calc_monostatic
+
 from CSXCAD import CSXCAD, ContinuousStructure
 from openEMS.openEMS import openEMS
 from openEMS.physical_constants import C0, EPS0, Z0, MUE0
-from openEMS.ports  import UI_data
-
-from mpl_toolkits.mplot3d import Axes3D
-
 
-@dataclass
-class Simulation:
-    name: str
-    geometry_file: Path
-    sim_path: Path
+plt = pyplot()
 
 ### General parameter setup
 dir_  = Path(__file__).parent
@@ -45,8 +42,6 @@ sim = Simulation(
 
 
 ### Setup the simulation
-post_proc_only = False
-
 unit = 1e-3 # all length in mm
 
 sphere_rad = 200
@@ -58,6 +53,7 @@ SimBox = 1200
 PW_Box = 750
 
 ### Setup FDTD parameters & excitation function
+sim.checkpoint('setup')
 FDTD = openEMS(EndCriteria=1e-5)
 
 f_start =  50e6 # start frequency
@@ -73,6 +69,7 @@ FDTD.SetCSX(CSX)
 mesh = CSX.GetGrid()
 mesh.SetDeltaUnit(unit)
 
+sim.checkpoint('mesh')
 #create mesh
 mesh.SetLines('x', [-SimBox/2, 0, SimBox/2])
 mesh.SmoothMeshLines('x', C0 / f_stop / unit / 20) # cell size: lambda/20
@@ -80,6 +77,7 @@ mesh.SetLines('y', mesh.GetLines('x'))
 mesh.SetLines('z', mesh.GetLines('x'))
 
 ### Create a metal sphere and plane wave source
+sim.checkpoint('geometry')
 sphere_metal = CSX.AddMetal( 'sphere' ) # create a perfect electric conductor (PEC)
 sphere_metal.AddSphere(priority=10, center=[0, 0, 0], radius=sphere_rad)
 
@@ -99,46 +97,49 @@ pw_exc.AddBox(start, stop)
 nf2ff = FDTD.CreateNF2FFBox()
 
 ### Run the simulation
+sim.checkpoint('Write2XML')
 CSX.Write2XML(sim.geometry_file)
-FDTD.Run(str(sim.sim_path), cleanup=False)
+sim.run(FDTD, cleanup=False)
 
 ### Postprocessing & plotting
-# get Gaussian pulse strength at frequency f0
-ef = UI_data('et', str(sim.sim_path), freq=f0)
+# the stages are skipped on a re-run if their inputs and the FDTD results are unchanged
+def calc_RCS(freq, phi):
+    """ Bistatic RCS in the xy-plane at f0 and backscattered RCS over frequency """
+    farfield = FarFieldCache(nf2ff, sim.sim_path)
+    RCS = calc_rcs(nf2ff, sim.sim_path, f0, 90, phi, E_dir, farfield=farfield).at_freq(f0)
+    # RCS over frequency in backward direction (monostatic)
+    back_scat = calc_monostatic(nf2ff, sim.sim_path, freq, k_dir, E_dir, farfield=farfield)
+    return dict(RCS=RCS, back_scat=back_scat)
+
+def plot_RCS(freq, phi, RCS, back_scat):
+    fig = plt.figure()
+    ax  = fig.add_subplot(111, polar=True)
+    ax.plot( np.deg2rad(phi), RCS[0], 'k-', linewidth=2 )
+    ax.grid(True)
+    plt.savefig(dir_ / "phi.svg")
+
+    plt.figure()
+    plt.plot(freq/1e6,back_scat, linewidth=2)
+    plt.grid()
+    plt.xlabel('frequency (MHz)')
+    plt.ylabel('RCS ($m^2$)')
+    plt.title('radar cross section')
+    plt.savefig(dir_ / "radar_cross_section.svg")
+
+    plt.figure()
+    plt.semilogy(sphere_rad*unit/C0*freq,back_scat/(pi*sphere_rad*unit*sphere_rad*unit), linewidth=2)
+    plt.ylim([10^-2, 10^1])
+    plt.grid()
+    plt.xlabel('sphere radius / wavelength')
+    plt.ylabel('RCS / ($\pi a^2$)')
+    plt.title('normalized radar cross section')
+    plt.savefig(dir_ / "radar_cross_section_normalized.svg")
 
-Pin = 0.5*norm(E_dir)**2/Z0 * abs(ef.ui_f_val[0])**2
-#
-nf2ff_res = nf2ff.CalcNF2FF(str(sim.sim_path), f0, 90, arange(-180, 180.1, 2))
-RCS = 4*pi/Pin[0]*nf2ff_res.P_rad[0]
+freq = linspace(f_start,f_stop,100)
+phi = arange(-180, 180.1, 2)
+res = sim.stage('CalcNF2FF', calc_RCS, freq, phi)
 
-fig = plt.figure()
-ax  = fig.add_subplot(111, polar=True)
-ax.plot( nf2ff_res.phi, RCS[0], 'k-', linewidth=2 )
-ax.grid(True)
-plt.savefig(dir_ / "phi.svg")
+plots = [dir_ / "phi.svg", dir_ / "radar_cross_section.svg", dir_ / "radar_cross_section_normalized.svg"]
+sim.stage('plot', plot_RCS, freq, phi, res['RCS'], res['back_scat'], outputs=plots)
 
-# calculate RCS over frequency
-freq = linspace(f_start,f_stop,100)
-ef = UI_data( 'et', str(sim.sim_path), freq ) # time domain/freq domain voltage
-Pin = 0.5*norm(E_dir)**2/Z0 * abs(np.array(ef.ui_f_val[0]))**2
-
-nf2ff_res = nf2ff.CalcNF2FF(str(sim.sim_path), freq, 90, 180+inc_angle, outfile='back_nf2ff.h5')
-
-back_scat = np.array([4*pi/Pin[fn]*nf2ff_res.P_rad[fn][0][0] for fn in range(len(freq))])
-
-plt.figure()
-plt.plot(freq/1e6,back_scat, linewidth=2)
-plt.grid()
-plt.xlabel('frequency (MHz)')
-plt.ylabel('RCS ($m^2$)')
-plt.title('radar cross section')
-plt.savefig(dir_ / "radar_cross_section.svg")
-
-plt.figure()
-plt.semilogy(sphere_rad*unit/C0*freq,back_scat/(pi*sphere_rad*unit*sphere_rad*unit), linewidth=2)
-plt.ylim([10^-2, 10^1])
-plt.grid()
-plt.xlabel('sphere radius / wavelength')
-plt.ylabel('RCS / ($\pi a^2$)')
-plt.title('normalized radar cross section')
-plt.savefig(dir_ / "radar_cross_section_normalized.svg")
+sim.write_report()
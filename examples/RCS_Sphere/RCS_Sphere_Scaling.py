@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+ MPI scaling test with a resized radar cross section model
+
+ The metal sphere of RCS_Sphere.py with its plane wave excitation, scaled up
+ by --scale at the same mesh resolution (lambda/20 at f_stop) and run for a
+ fixed number of timesteps, so every run does the same work. The model is
+ written to scaling/ and run with mpirun on every rank count of --ranks
+ (needs the MPI build of openEMS, see builder/Dockerfile-MPI); wall time,
+ speedup and parallel efficiency are printed and written to
+ scaling/scaling.json.
+
+ The boundaries are MUR instead of PML_8: PML cells are more expensive and
+ only the outer boxes contain them, which would skew the per-rank load.
+
+ Usage:
+   python3 RCS_Sphere_Scaling.py                       # scale 1.5, 1/2/4 ranks
+   python3 RCS_Sphere_Scaling.py --scale 2 --ranks 1 2 4 8 --min-efficiency 0.5
+"""
+
+### Import Libraries
+import os
+import sys
+import json
+import shlex
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from simtools import mpi
+
+from CSXCAD import ContinuousStructure
+from openEMS.openEMS import openEMS
+from openEMS.physical_constants import C0
+
+dir_ = Path(__file__).parent
+work_dir = dir_ / "scaling"
+
+### Setup the simulation
+unit = 1e-3 # all length in mm
+
+f_start =  50e6 # start frequency
+f_stop  = 1000e6 # stop  frequency
+f0      = 500e6
+
+
+def createModel(fn, scale=1.5, nrts=1000):
+    """ Write the resized RCS sphere model (FDTD setup and geometry) to `fn` """
+    sphere_rad = 200 * scale
+    SimBox = 1200 * scale
+    PW_Box = 750 * scale
+
+    FDTD = openEMS(NrTS=nrts, EndCriteria=0)
+    FDTD.SetGaussExcite( 0.5*(f_start+f_stop), 0.5*(f_stop-f_start) )
+    FDTD.SetBoundaryCond( ['MUR', 'MUR', 'MUR', 'MUR', 'MUR', 'MUR'] )
+
+    CSX = ContinuousStructure()
+    FDTD.SetCSX(CSX)
+    mesh = CSX.GetGrid()
+    mesh.SetDeltaUnit(unit)
+    mesh.SetLines('x', [-SimBox/2, 0, SimBox/2])
+    mesh.SmoothMeshLines('x', C0 / f_stop / unit / 20) # cell size: lambda/20
+    mesh.SetLines('y', mesh.GetLines('x'))
+    mesh.SetLines('z', mesh.GetLines('x'))
+
+    sphere_metal = CSX.AddMetal( 'sphere' )
+    sphere_metal.AddSphere(priority=10, center=[0, 0, 0], radius=sphere_rad)
+
+    pw_exc = CSX.AddExcitation('plane_wave', exc_type=10, exc_val=[0, 0, 1])
+    pw_exc.SetPropagationDir([1, 0, 0])
+    pw_exc.SetFrequency(f0)
+    start = np.array([-PW_Box/2, -PW_Box/2, -PW_Box/2])
+    pw_exc.AddBox(start, -start)
+
+    FDTD.Write2XML(str(fn))
+    return fn
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.5, help="size of the model relative to RCS_Sphere.py")
+    parser.add_argument("--nrts", type=int, default=1000, help="timesteps per run")
+    parser.add_argument("--ranks", type=int, nargs="+", default=[1, 2, 4], help="MPI rank counts to run")
+    parser.add_argument("--mpirun-args", default="", help="extra mpirun arguments, e.g. '--oversubscribe'")
+    parser.add_argument("--min-efficiency", type=float, default=0.0,
+                        help="exit non-zero if the parallel efficiency at the most ranks is lower")
+    args = parser.parse_args()
+
+    work_dir.mkdir(parents=True, exist_ok=True)
+    model = createModel(work_dir / "RCS_Sphere_Scaling.xml", args.scale, args.nrts)
+    res = mpi.scaling(model, args.ranks, work_dir, mpirun_args=shlex.split(args.mpirun_args))
+    res.update(scale=args.scale, cpus=os.cpu_count())
+    print(mpi.format_scaling(res))
+    with open(work_dir / "scaling.json", "w") as fh:
+        json.dump(res, fh, indent=1)
+
+    last = res["results"][-1]
+    sys.exit(0 if last["efficiency"] >= args.min_efficiency else 1)
@@ -10,26 +10,23 @@
 
 """
 import os
+import sys
 import tempfile
-from matplotlib import pyplot as plt
 from math import pi
 import numpy as np
-from dataclasses import dataclass
 
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from simtools import Simulation
+from simtools.runmode import pyplot
+from simtools.network import Network, db
+
 from CSXCAD import CSXCAD
 from openEMS.openEMS import openEMS
 from openEMS.physical_constants import C0, EPS0, Z0, MUE0
 
-from mpl_toolkits.mplot3d import Axes3D
-
-
-@dataclass
-class Simulation:
-    name: str
-    geometry_file: Path
-    sim_path: Path
+plt = pyplot()
 
 ### General parameter setup
 dir_  = Path(__file__).parent
@@ -40,7 +37,6 @@ sim = Simulation(
     sim_path=dir_ / "results")
 
 ### Setup the simulation
-post_proc_only = False
 unit = 1e-6; #drawing unit in um
 
 # waveguide dimensions
@@ -62,6 +58,7 @@ TE_mode = 'TE10';
 mesh_res = lambda0/30
 
 ### Setup FDTD parameter & excitation function
+sim.checkpoint('setup')
 FDTD = openEMS(NrTS=1e4);
 FDTD.SetGaussExcite(0.5*(f_start+f_stop),0.5*(f_stop-f_start));
 
@@ -74,6 +71,7 @@ FDTD.SetCSX(CSX)
 mesh = CSX.GetGrid()
 mesh.SetDeltaUnit(unit)
 
+sim.checkpoint('geometry')
 mesh.AddLine('x', [0, a])
 mesh.AddLine('y', [0, b])
 mesh.AddLine('z', [0, length])
@@ -90,46 +88,59 @@ stop =[a, b, length-15*mesh_res];
 mesh.AddLine('z', [start[2], stop[2]])
 ports.append(FDTD.AddRectWaveGuidePort( 1, start, stop, 'z', a*unit, b*unit, TE_mode))
 
+sim.checkpoint('mesh')
 mesh.SmoothMeshLines('all', mesh_res, ratio=1.4)
 
 ### Define dump box...
-Et = CSX.AddDump('Et', file_type=0, sub_sampling=[2,2,2])
+sim.checkpoint('dumps')
 start = [0, 0, 0];
 stop  = [a, b, length];
-Et.AddBox(start, stop);
+# VTK files for ParaView as before, OPENEMS_DUMP_PRESET selects e.g. an HDF5 preset
+Et = sim.add_dump(CSX, 'Et', start, stop, preset='vtk', sub_sampling=(2,2,2))
 
 ### Run the simulation
+sim.checkpoint('Write2XML')
 CSX.Write2XML(sim.geometry_file)
 
-FDTD.Run(str(sim.sim_path), cleanup=False)
+sim.run(FDTD, cleanup=False)
 
 ### Postprocessing & plotting
+# the stages are skipped on a re-run if their inputs and the FDTD results are unchanged
+def calc_ports(freq):
+    for port in ports:
+        port.CalcPort(str(sim.sim_path), freq)
+
+    net = Network.from_ports(ports)
+    return dict(
+        s11 = net.S[:,0,0],
+        s21 = net.S[:,1,0],
+        ZL  = net.Z_in[:,0],
+        ZL_a = ports[0].ZL) # analytic waveguide impedance
+
+def plot_ports(freq, s11, s21, ZL, ZL_a):
+    ## Plot s-parameter
+    plt.figure()
+    plt.plot(freq*1e-6,db(s11),'k-',linewidth=2, label='$S_{11}$')
+    plt.grid()
+    plt.plot(freq*1e-6,db(s21),'r--',linewidth=2, label='$S_{21}$')
+    plt.legend();
+    plt.ylabel('S-Parameter (dB)')
+    plt.xlabel(r'frequency (MHz) $\rightarrow$')
+    plt.savefig(dir_ / "sparam.svg")
+
+    ## Compare analytic and numerical wave-impedance
+    plt.figure()
+    plt.plot(freq*1e-6,np.real(ZL), linewidth=2, label='$\Re\{Z_L\}$')
+    plt.grid()
+    plt.plot(freq*1e-6,np.imag(ZL),'r--', linewidth=2, label='$\Im\{Z_L\}$')
+    plt.plot(freq*1e-6,ZL_a,'g-.',linewidth=2, label='$Z_{L, analytic}$')
+    plt.ylabel('ZL $(\Omega)$')
+    plt.xlabel(r'frequency (MHz) $\rightarrow$')
+    plt.legend()
+    plt.savefig(dir_ / "frequency_impedance.svg")
+
 freq = np.linspace(f_start,f_stop,201)
-for port in ports:
-    port.CalcPort(str(sim.sim_path), freq)
-
-s11 = ports[0].uf_ref / ports[0].uf_inc
-s21 = ports[1].uf_ref / ports[0].uf_inc
-ZL  = ports[0].uf_tot / ports[0].if_tot
-ZL_a = ports[0].ZL # analytic waveguide impedance
-
-## Plot s-parameter
-plt.figure()
-plt.plot(freq*1e-6,20*np.log10(abs(s11)),'k-',linewidth=2, label='$S_{11}$')
-plt.grid()
-plt.plot(freq*1e-6,20*np.log10(abs(s21)),'r--',linewidth=2, label='$S_{21}$')
-plt.legend();
-plt.ylabel('S-Parameter (dB)')
-plt.xlabel(r'frequency (MHz) $\rightarrow$')
-plt.savefig(dir_ / "sparam.svg")
-
-## Compare analytic and numerical wave-impedance
-plt.figure()
-plt.plot(freq*1e-6,np.real(ZL), linewidth=2, label='$\Re\{Z_L\}$')
-plt.grid()
-plt.plot(freq*1e-6,np.imag(ZL),'r--', linewidth=2, label='$\Im\{Z_L\}$')
-plt.plot(freq*1e-6,ZL_a,'g-.',linewidth=2, label='$Z_{L, analytic}$')
-plt.ylabel('ZL $(\Omega)$')
-plt.xlabel(r'frequency (MHz) $\rightarrow$')
-plt.legend()
-plt.savefig(dir_ / "frequency_impedance.svg")
+res = sim.stage('CalcPort', calc_ports, freq)
+sim.stage('plot', plot_ports, freq, **res, outputs=[dir_ / "sparam.svg", dir_ / "frequency_impedance.svg"])
+
+sim.write_report()
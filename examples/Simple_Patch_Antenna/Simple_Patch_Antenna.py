@@ -11,25 +11,25 @@
 """
 
 import os
+import sys
 import tempfile
 import copy
 from math import pi
 from pathlib import Path
-from dataclasses import dataclass
 
 import numpy as np
-from matplotlib import pyplot as plt
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from simtools import Simulation
+from simtools.runmode import pyplot
+from simtools import meshgen
+from simtools.meshgen import MeshGenerator
 
 from CSXCAD  import ContinuousStructure
 from openEMS import openEMS
 from openEMS.physical_constants import C0, EPS0, Z0, MUE0
 
-
-@dataclass
-class Simulation:
-    name: str
-    geometry_file: Path
-    sim_path: Path
+plt = pyplot()
 
 ### General parameter setup
 dir_  = Path(__file__).parent
@@ -64,9 +64,14 @@ feed_R = 50     #feed resistance
 # size of the simulation box
 SimBox = np.array([200, 200, 150])
 
+# replace the hand-built mesh by a generated one within a cell budget
+auto_mesh   = meshgen.auto_mesh(False)  # or OPENEMS_AUTO_MESH=1
+cell_budget = 150e3
+
 ### FDTD setup
 ## * Limit the simulation to 30k timesteps
 ## * Define a reduced end criteria of -40dB
+sim.checkpoint('setup')
 FDTD = openEMS(NrTS=30000, EndCriteria=1e-4)
 FDTD.SetGaussExcite( f0, fc )
 FDTD.SetBoundaryCond( ['MUR', 'MUR', 'MUR', 'MUR', 'MUR', 'MUR'] )
@@ -77,6 +82,7 @@ mesh = CSX.GetGrid()
 mesh.SetDeltaUnit(1e-3)
 mesh_res = C0/(f0+fc)/1e-3/20
 
+sim.checkpoint('geometry')
 ### Generate properties, primitives and mesh-grid
 #initialize the mesh with the "air-box" dimensions
 mesh.AddLine('x', [-SimBox[0]/2, SimBox[0]/2])
@@ -112,7 +118,13 @@ start = [feed_pos, 0, 0]
 stop  = [feed_pos, 0, substrate_thickness]
 port = FDTD.AddLumpedPort(1, feed_R, start, stop, 'z', 1.0, priority=5, edges2grid='xy')
 
+sim.checkpoint('mesh')
 mesh.SmoothMeshLines('all', mesh_res, 1.4)
+if auto_mesh:
+    gen = MeshGenerator.from_csx(CSX, f_max=f0+fc, unit=1e-3, metal_edge_res=mesh_res/2)
+    mesh_report = gen.apply(mesh, budget=cell_budget)
+    sim.profiler.set(auto_mesh=mesh_report.as_dict())
+    print(mesh_report)
 
 # Add the nf2ff recording box
 nf2ff = FDTD.CreateNF2FFBox()
@@ -121,10 +133,12 @@ nf2ff = FDTD.CreateNF2FFBox()
 def analyze(path):
 ### Post-processing and plotting
     f = np.linspace(max(1e9,f0-fc),f0+fc,401)
+    sim.checkpoint('CalcPort')
     port.CalcPort(path, f)
     s11 = port.uf_ref/port.uf_inc
     s11_dB = 20.0*np.log10(np.abs(s11))
 
+    sim.checkpoint('plot')
     plt.figure()
     plt.plot(f/1e9, s11_dB, 'k-', linewidth=2, label='$S_{11}$')
     plt.grid()
@@ -140,8 +154,10 @@ def analyze(path):
         f_res = f[idx[0]]
         theta = np.arange(-180.0, 180.0, 2.0)
         phi   = [0., 90.]
+        sim.checkpoint('CalcNF2FF')
         nf2ff_res = nf2ff.CalcNF2FF(path, f_res, theta, phi, center=[0,0,1e-3])
 
+        sim.checkpoint('plot')
         E_norm = 20.0*np.log10(nf2ff_res.E_norm[0]/np.max(nf2ff_res.E_norm[0])) + 10.0*np.log10(nf2ff_res.Dmax[0])
 
         plt.figure()
@@ -167,9 +183,11 @@ def analyze(path):
 
 
 if __name__ == "__main__":
-    post_proc_only = False
+    sim.checkpoint('Write2XML')
     CSX.Write2XML(str(sim.geometry_file))
 ### Run the simulation
-    FDTD.Run(str(sim.sim_path), cleanup=False)
+    sim.run(FDTD, cleanup=False)
 
     analyze(str(sim.sim_path))
+
+    sim.write_report()
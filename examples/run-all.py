@@ -1,7 +1,16 @@
+"""
+ Run all example simulations in parallel.
+
+ Usage:
+   python3 run-all.py [--threads N] [--jobs N] [--logs DIR] [--mode MODE] [example ...]
+
+ The available engine threads (default: all cores) are split across the
+ running jobs so that the machine is never oversubscribed.
+"""
+
 simulations = [
   "Bent_Patch_Antenna",
   "CRLH_Extraction",
-  "Circ_Waveguide",
   "Helical_Antenna",
   "MSL_NotchFilter",
   "Parallel_Plate_Waveguide",
@@ -11,8 +20,28 @@ simulations = [
 ]
 
 import os
+import sys
+import argparse
 from pathlib import Path
 
-for p in simulations:
-    print(p)
-    os.system(f"python3 {p}/{p}.py")
+from simtools import Job, run_jobs, summary_table
+from simtools.runmode import MODES, MODE_ENV
+
+dir_ = Path(__file__).parent
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("examples", nargs="*", default=simulations, help="examples to run (default: all)")
+parser.add_argument("--threads", type=int, default=os.cpu_count(), help="total engine threads available")
+parser.add_argument("--jobs", type=int, default=None, help="maximum number of simulations running at once")
+parser.add_argument("--logs", type=Path, default=None, help="write each example's output to DIR/<example>.log")
+parser.add_argument("--mode", choices=MODES, default=os.environ.get(MODE_ENV, "simulate"),
+                    help="run mode of the examples, 'headless' skips all plotting")
+args = parser.parse_args()
+os.environ[MODE_ENV] = args.mode
+
+jobs = [Job(name=p, script=dir_ / p / f"{p}.py") for p in args.examples]
+run_jobs(jobs, total_threads=args.threads, max_parallel=args.jobs, cwd=dir_, log_dir=args.logs)
+
+print()
+print(summary_table(jobs))
+sys.exit(0 if all(j.ok for j in jobs) else 1)
@@ -0,0 +1,21 @@
+"""
+ Shared helpers for the openEMS example scripts.
+
+ The examples add their parent directory to sys.path so this package can be
+ imported without installing it.
+"""
+
+from .scheduler import Job, num_threads, run_jobs, summary_table, thread_budget
+from .cache import ResultCache, simulation_key
+from .profiling import Profiler
+from .preflight import PreflightError
+from .simulation import Simulation
+from .nport import run_excitations, calc_network, s_matrix
+from .touchstone import read_touchstone, write_touchstone
+from .sweep import grid, latin_hypercube, run_sweep, read_table, write_table
+from .farfield import FarField, FarFieldCache
+from .rcs import RCSResult, calc_monostatic, calc_rcs
+from .probes import DFTAccumulator, ProbePort, ProbeTraces, StreamingLumpedPort, iter_probe, probe_dft, probe_memmap
+from .tdr import TDRResult, tdr, tdr_ports
+from .dumps import FieldDump, add_dump, open_dump, roi
+from .network import Network
@@ -0,0 +1,31 @@
+"""
+ Command line entry point, run from the examples directory:
+   python3 -m simtools <command> [options]
+"""
+
+import sys
+
+from . import cache, profiling, benchmark, preflight, dumps, jobqueue, autotune, mpi
+
+commands = {
+    "cache": cache.main,
+    "profile": profiling.main,
+    "bench": benchmark.main,
+    "preflight": preflight.main,
+    "dumps": dumps.main,
+    "queue": jobqueue.main,
+    "autotune": autotune.main,
+    "mpi": mpi.main,
+}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in commands:
+        print(f"usage: python3 -m simtools {{{','.join(commands)}}} ...")
+        return 2
+    return commands[argv[0]](argv[1:])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+ Adaptive frequency sampling and rational (vector fitting) models.
+
+ Every frequency point of CalcPort costs a DFT over the full time traces,
+ yet most of a wide sweep is smooth. adaptive_sweep() starts from a coarse
+ grid and bisects only the intervals where the response bends: the
+ magnitude (dB) or unwrapped phase deviates from the straight line through
+ the neighbouring samples by more than the tolerances. The samples are then
+ fitted with a rational model (vector fitting, common poles for all
+ responses), which evaluates at any frequency afterwards:
+
+   sweep = adaptive_sweep(calc, f_start, f_stop)     # calc(f) -> (nf, ...) complex
+   S = sweep.model(linspace(f_start, f_stop, 1601))
+
+ Examples switch it with use_adaptive(), OPENEMS_ADAPTIVE=0 selects the
+ full sweep.
+"""
+
+import os
+
+import numpy as np
+
+ADAPTIVE_ENV = "OPENEMS_ADAPTIVE"
+
+
+def use_adaptive(default=True):
+    """ Whether an example uses the adaptive sweep: OPENEMS_ADAPTIVE=1/0, else `default` """
+    value = os.environ.get(ADAPTIVE_ENV)
+    if value is None or value == "":
+        return default
+    return value.lower() not in ("0", "false", "no", "off")
+
+
+class RationalModel:
+    """
+    f(s) = sum_k r_k / (s - p_k) + d + s*e, common poles for all responses,
+    with the normalized frequency s = j*f/f_scale
+    """
+
+    def __init__(self, poles, residues, d, e, f_scale, shape=()):
+        self.poles = poles
+        self.residues = residues    # (n_poles, n_responses)
+        self.d = d
+        self.e = e
+        self.f_scale = f_scale
+        self.shape = shape
+
+    def __call__(self, f):
+        s = 1j*np.asarray(f, dtype=float)[:, None] / self.f_scale
+        H = (1/(s - self.poles)) @ self.residues + self.d + s*self.e
+        return H.reshape((len(s),) + self.shape)
+
+
+def _basis(s, poles, with_e):
+    cols = [1/(s[:, None] - poles), np.ones((len(s), 1))]
+    if with_e:
+        cols.append(s[:, None])
+    return np.hstack(cols)
+
+
+def vector_fit(f, H, n_poles=10, iterations=10, with_e=True):
+    """
+    Rational model of the samples H (nf, ...) at frequencies f by vector
+    fitting with complex poles (Gustavsen/Semlyen pole relocation).
+    """
+    f = np.asarray(f, dtype=float)
+    H = np.asarray(H, dtype=complex)
+    shape = H.shape[1:]
+    H = H.reshape(len(f), -1)
+    f_scale = f.max()
+    s = 1j*f/f_scale
+    # starting poles: weakly damped, spread over the band
+    beta = np.linspace(max(f.min()/f_scale, 0.01), 1, n_poles)
+    poles = -beta/100 + 1j*beta
+
+    for _ in range(iterations):
+        B = _basis(s, poles, with_e)
+        P = 1/(s[:, None] - poles)
+        # per response: B*x - H*P*r~ = H, sigma residues r~ shared by all responses
+        nb, m = B.shape[1], H.shape[1]
+        A = np.zeros((len(s)*m, nb*m + n_poles), dtype=complex)
+        for k in range(m):
+            A[k*len(s):(k+1)*len(s), k*nb:(k+1)*nb] = B
+            A[k*len(s):(k+1)*len(s), nb*m:] = -H[:, k:k+1] * P
+        x = np.linalg.lstsq(A, H.T.ravel(), rcond=None)[0]
+        sigma_r = x[nb*m:]
+        poles = np.linalg.eigvals(np.diag(poles) - np.outer(np.ones(n_poles), sigma_r))
+        # keep the model stable
+        poles = np.where(poles.real > 0, -poles.conj(), poles)
+
+    B = _basis(s, poles, with_e)
+    X = np.linalg.lstsq(B, H, rcond=None)[0]
+    e = X[n_poles+1] if with_e else np.zeros(H.shape[1])
+    return RationalModel(poles, X[:n_poles], X[n_poles], e, f_scale, shape)
+
+
+class AdaptiveSweep:
+    """ Samples of an adaptive sweep and the rational model fitted to them """
+
+    def __init__(self, f, H, n_poles, iterations):
+        self.f = f
+        self.H = H
+        self._fit = (n_poles, iterations)
+        self._model = None
+
+    @property
+    def model(self):
+        """ Rational model fitted to the samples (on first use) """
+        if self._model is None:
+            n_poles, iterations = self._fit
+            n_poles = n_poles or min(max(4, len(self.f)//4), 30)
+            self._model = vector_fit(self.f, self.H, n_poles, iterations)
+        return self._model
+
+    def rms_error(self):
+        """ RMS deviation of the model from the samples, relative to their RMS """
+        H = self.H.reshape(len(self.f), -1)
+        M = self.model(self.f).reshape(len(self.f), -1)
+        return np.sqrt(np.mean(np.abs(M - H)**2) / np.mean(np.abs(H)**2))
+
+
+def _bend(f, H, db_tol, phase_tol):
+    """ Intervals (index i for [f_i, f_i+1]) whose neighbourhood bends beyond the tolerances """
+    mag = 20*np.log10(np.maximum(np.abs(H), 1e-15))
+    ph = np.degrees(np.unwrap(np.angle(H), axis=0))
+    refine = np.zeros(len(f) - 1, dtype=bool)
+    for y, tol in ((mag, db_tol), (ph, phase_tol)):
+        # deviation of the middle sample from the chord of its neighbours
+        t = ((f[1:-1] - f[:-2]) / (f[2:] - f[:-2]))[:, None]
+        dev = np.abs(y[1:-1] - (y[:-2] + t*(y[2:] - y[:-2])))
+        dev = dev.reshape(len(dev), -1).max(axis=1)
+        bad = dev > tol
+        refine[:-1] |= bad
+        refine[1:] |= bad
+    return np.where(refine)[0]
+
+
+def adaptive_sweep(func, f_start, f_stop, n_init=33, db_tol=0.5, phase_tol=5.0, max_points=801,
+                   min_df=1e-5, n_poles=None, iterations=10):
+    """
+    Sample `func(f) -> (nf, ...)` complex adaptively between f_start and
+    f_stop, starting from n_init points and bisecting intervals that bend
+    by more than db_tol (dB) or phase_tol (degree) until max_points.
+    Intervals narrower than 2*min_df (relative to the span) are not split,
+    so a notch with an exact zero does not use up the whole budget.
+    """
+    f = np.linspace(f_start, f_stop, n_init)
+    H = np.asarray(func(f), dtype=complex)
+    df_min = min_df * (f_stop - f_start)
+    while len(f) < max_points:
+        idx = _bend(f, H, db_tol, phase_tol)
+        idx = idx[f[idx+1] - f[idx] >= 2*df_min]
+        if not len(idx):
+            break
+        idx = idx[:max_points - len(f)]
+        f_new = np.setdiff1d((f[idx] + f[idx+1]) / 2, f)
+        if not len(f_new):
+            break
+        H_new = np.asarray(func(f_new), dtype=complex)
+        f = np.concatenate([f, f_new])
+        H = np.concatenate([H, H_new])
+        order = np.argsort(f)
+        f, H = f[order], H[order]
+    return AdaptiveSweep(f, H, n_poles, iterations)
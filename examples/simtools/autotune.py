@@ -0,0 +1,242 @@
+"""
+ Engine thread count tuned per model size and host.
+
+ Small meshes run slower with many threads (synchronisation dominates),
+ large ones saturate the memory bandwidth long before all cores are busy.
+ The tuner measures the engine throughput of the actual model at several
+ thread counts (1, 2, 4, ... up to the allowed maximum) in short bursts
+ with a capped number of timesteps. Every burst runs in a forked process on
+ a copy of the setup, so the model of the calling script stays untouched.
+ One burst per thread count is enough: the throughput is the speed the
+ engine reports for its timestep loop, which excludes the setup (mesh,
+ operator). Only if the engine output has no speed, a second burst of twice
+ the length is timed and the difference is used; differences within the
+ timing noise are measured again, thread counts without a usable
+ difference are skipped.
+
+ The best count (the fewest threads within TOLERANCE of the fastest) is
+ stored per host and cell count bucket (half octaves) in threads.json in
+ the cache directory and used by Simulation.run for all models of that
+ size. OPENEMS_AUTOTUNE selects the behaviour:
+
+   cached     use a stored count if there is one (default)
+   calibrate  calibrate models whose bucket has no stored count yet
+   off        never change the thread count
+
+ An explicit numThreads and the OPENEMS_NUM_THREADS budget of the
+ scheduler take precedence, the budget caps the tuned count.
+
+   python3 -m simtools autotune list
+   python3 -m simtools autotune clear [--host HOST]
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+from math import log2
+from pathlib import Path
+
+from .cache import default_cache_dir
+from .scheduler import fork_context
+
+AUTOTUNE_ENV = "OPENEMS_AUTOTUNE"
+TABLE_ENV = "OPENEMS_THREADS_FILE"
+HOST_ENV = "OPENEMS_HOST_ID"
+MODES = ("off", "cached", "calibrate")
+
+DEFAULT_BURST = 100     # timesteps of a burst, the long one of the fallback has twice as many
+TOLERANCE = 0.05
+REPEATS = 3             # attempts to get a usable difference of the burst times
+MIN_DIFFERENCE = 0.05   # smallest usable difference, relative to the short burst
+
+# final speed report of the engine, e.g. "Speed: 123.4 MCells/s"
+SPEED_RE = re.compile(rb"Speed:\s*([0-9.eE+-]+)\s*MCells/s")
+
+
+def mode():
+    value = os.environ.get(AUTOTUNE_ENV, "cached").lower()
+    if value in ("0", "no", "false"):
+        return "off"
+    return value if value in MODES else "cached"
+
+
+def host_id():
+    """ Host the calibration is valid for: OPENEMS_HOST_ID or host name and core count """
+    return os.environ.get(HOST_ENV) or f"{socket.gethostname()}/{os.cpu_count()}"
+
+
+def bucket(cells):
+    """ Cell count bucket (half octaves), e.g. 'b33' for 78..110 kCells """
+    return f"b{round(2*log2(max(cells, 1)))}"
+
+
+def candidates(max_threads):
+    """ Thread counts to try: powers of two up to max_threads and max_threads itself """
+    counts = {max_threads}
+    n = 1
+    while n < max_threads:
+        counts.add(n)
+        n *= 2
+    return sorted(counts)
+
+
+class ThreadTable:
+    """ Stored thread counts, {host: {bucket: {'threads', 'cells', 'mcells_per_s', 'time'}}} """
+
+    def __init__(self, fn=None):
+        self.fn = Path(fn or os.environ.get(TABLE_ENV) or default_cache_dir() / "threads.json")
+        try:
+            with open(self.fn) as fh:
+                self.data = json.load(fh)
+        except (OSError, ValueError):
+            self.data = {}
+
+    def get(self, cells, host=None):
+        entry = self.data.get(host or host_id(), {}).get(bucket(cells))
+        return entry and entry["threads"]
+
+    def put(self, cells, threads, rates, host=None):
+        self.data.setdefault(host or host_id(), {})[bucket(cells)] = {
+            "threads": threads, "cells": cells, "time": time.time(),
+            "mcells_per_s": {str(n): r for n, r in rates.items()}}
+        self.save()
+
+    def clear(self, host=None):
+        if host is None:
+            self.data = {}
+        else:
+            self.data.pop(host, None)
+        self.save()
+
+    def save(self):
+        self.fn.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.fn.with_name(f".{self.fn.name}.{os.getpid()}.tmp")
+        with open(tmp, "w") as fh:
+            json.dump(self.data, fh, indent=1)
+        os.replace(tmp, self.fn)
+
+
+def _burst(FDTD, sim_path, log, threads, nrts, conn):
+    # forked child: the changes to FDTD and the engine output stay here
+    out = os.open(log, os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+    os.dup2(out, 1)
+    os.dup2(out, 2)
+    FDTD.SetNumberOfTimeSteps(nrts)
+    FDTD.SetEndCriteria(0)
+    start = time.perf_counter()
+    FDTD.Run(sim_path, cleanup=True, numThreads=threads)
+    conn.send(time.perf_counter() - start)
+    conn.close()
+
+
+def engine_speed(output):
+    """ Last throughput in MCells/s reported in the engine output (bytes), or None """
+    speeds = SPEED_RE.findall(output)
+    if not speeds:
+        return None
+    try:
+        speed = float(speeds[-1])
+    except ValueError:
+        return None
+    return speed if speed > 0 else None
+
+
+def burst(FDTD, threads, nrts):
+    """
+    Run FDTD capped to `nrts` timesteps in a forked process; returns the wall
+    time and the engine speed in MCells/s (None if not reported)
+    """
+    ctx = fork_context()
+    recv, send = ctx.Pipe(duplex=False)
+    work = tempfile.mkdtemp(prefix="openems-autotune-")
+    log = os.path.join(work, "engine.log")
+    try:
+        proc = ctx.Process(target=_burst, args=(FDTD, os.path.join(work, "sim"), log, threads, nrts, send))
+        proc.start()
+        send.close()
+        try:
+            result = recv.recv()
+        except EOFError:
+            result = None
+        proc.join()
+        with open(log, "rb") as fh:
+            speed = engine_speed(fh.read())
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    if result is None or proc.exitcode != 0:
+        raise RuntimeError(f"calibration burst with {threads} threads failed (exit {proc.exitcode})")
+    return result, speed
+
+
+def throughput(FDTD, cells, threads, nrts=DEFAULT_BURST):
+    """ Engine throughput in MCells/s at `threads`, None if it could not be measured """
+    t1, speed = burst(FDTD, threads, nrts)
+    if speed is not None:
+        return speed
+    for attempt in range(REPEATS):
+        if attempt:
+            t1, _ = burst(FDTD, threads, nrts)
+        t2, _ = burst(FDTD, threads, 2*nrts)
+        if t2 - t1 > MIN_DIFFERENCE * t1:
+            return cells * nrts / (t2 - t1) / 1e6
+    return None
+
+
+def calibrate(FDTD, cells, max_threads=None, nrts=DEFAULT_BURST):
+    """ Best thread count and the measured throughput {threads: MCells/s} """
+    rates = {}
+    for n in candidates(max_threads or os.cpu_count() or 1):
+        rate = throughput(FDTD, cells, n, nrts)
+        if rate is None:
+            print(f"autotune: no usable timing with {n} threads, skipped")
+            continue
+        rates[n] = rate
+    if not rates:
+        raise RuntimeError("calibration failed, the burst times did not grow with the number of timesteps")
+    fastest = max(rates.values())
+    return min(n for n, r in rates.items() if r >= (1 - TOLERANCE)*fastest), rates
+
+
+def tuned_threads(FDTD, cells, max_threads=None, table=None):
+    """
+    Thread count for a model of `cells` cells according to OPENEMS_AUTOTUNE,
+    capped at max_threads; None if there is no tuned value.
+    """
+    m = mode()
+    if m == "off" or not cells:
+        return None
+    table = table or ThreadTable()
+    threads = table.get(cells)
+    if threads is None and m == "calibrate":
+        threads, rates = calibrate(FDTD, cells, max_threads)
+        table.put(cells, threads, rates)
+        print(f"autotune: {cells/1e3:.0f} kCells -> {threads} threads ("
+              + ", ".join(f"{n}: {r:.0f}" for n, r in rates.items()) + " MCells/s)")
+    if threads is not None and max_threads:
+        threads = min(threads, max_threads)
+    return threads
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="simtools autotune", description="Engine thread counts per model size")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list", help="show the stored thread counts")
+    clr = sub.add_parser("clear", help="forget stored thread counts")
+    clr.add_argument("--host", default=None, help="only those of HOST (default: all)")
+    args = parser.parse_args(argv)
+
+    table = ThreadTable()
+    if args.cmd == "clear":
+        table.clear(args.host)
+        return 0
+    for host, buckets in sorted(table.data.items()):
+        print(host)
+        for entry in sorted(buckets.values(), key=lambda e: e["cells"]):
+            rates = ", ".join(f"{n}: {r:.0f}" for n, r in entry["mcells_per_s"].items())
+            print(f"  {entry['cells']/1e3:>10.1f} kCells  {entry['threads']:>3} threads  ({rates} MCells/s)")
+    return 0
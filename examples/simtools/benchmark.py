@@ -0,0 +1,252 @@
+"""
+ Throughput benchmark over the bundled examples.
+
+ With OPENEMS_BENCH=1 Simulation.run reduces every model before running it:
+ the number of timesteps is fixed to OPENEMS_BENCH_NRTS (end criteria
+ disabled, so every run does the same amount of work) and the mesh is
+ coarsened by keeping every OPENEMS_BENCH_COARSEN-th line; lines on the
+ faces of primitives (ports, lumped elements, metals, substrates) are always
+ kept so that no structure loses its mesh lines. The benchmark runs each
+ example in this mode, one after the other with all threads, and collects
+ the profiling reports into a JSON baseline:
+
+   python3 -m simtools bench run --label ubuntu-24.04 --out bench-ubuntu.json
+   python3 -m simtools bench compare bench-debian.json bench-ubuntu.json
+
+ Engine throughput is given in MCells/s (cells x timesteps / engine time).
+"""
+
+import os
+import sys
+import json
+import socket
+import argparse
+import platform
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from .scheduler import Job, run_jobs
+
+BENCH_ENV = "OPENEMS_BENCH"
+NRTS_ENV = "OPENEMS_BENCH_NRTS"
+COARSEN_ENV = "OPENEMS_BENCH_COARSEN"
+PROFILE_DIR_ENV = "OPENEMS_PROFILE_DIR"
+
+DEFAULT_NRTS = 2000
+DEFAULT_COARSEN = 2
+
+EXAMPLES = [
+    "Bent_Patch_Antenna",
+    "CRLH_Extraction",
+    "Helical_Antenna",
+    "MSL_NotchFilter",
+    "Parallel_Plate_Waveguide",
+    "RCS_Sphere",
+    "Rect_Waveguide",
+    "Simple_Patch_Antenna",
+]
+
+# metrics compared between baselines and whether larger is better
+METRICS = {
+    "mcells_per_s": True,
+    "setup_time": False,
+    "postproc_time": False,
+}
+
+
+def settings():
+    """ Reduction settings {'nrts', 'coarsen'} if benchmark mode is enabled, else None """
+    if os.environ.get(BENCH_ENV, "0").lower() in ("", "0", "no", "off", "false"):
+        return None
+    return {
+        "nrts": int(os.environ.get(NRTS_ENV, DEFAULT_NRTS)),
+        "coarsen": int(os.environ.get(COARSEN_ENV, DEFAULT_COARSEN)),
+    }
+
+
+def coarsen_lines(lines, factor, keep=()):
+    """
+    Keep every `factor`-th mesh line, always including the first and last one
+    and those at the coordinates `keep`
+    """
+    lines = np.sort(np.asarray(lines, dtype=float))
+    if factor <= 1 or len(lines) < 3:
+        return lines
+    mask = np.zeros(len(lines), dtype=bool)
+    mask[::factor] = True
+    mask[-1] = True
+    keep = np.asarray(keep, dtype=float).ravel()
+    if len(keep):
+        tol = 1e-6 * (lines[-1] - lines[0])
+        mask |= np.any(np.abs(lines[:, None] - keep[None, :]) <= tol, axis=1)
+    return lines[mask]
+
+
+def primitive_faces(CSX):
+    """ Coordinates of the bounding box faces of all primitives of a CSX model, per direction """
+    faces = [[], [], []]
+    for prop in CSX.GetAllProperties():
+        for prim in prop.GetPrimitives():
+            for corner in prim.GetBoundBox():
+                for n in range(3):
+                    faces[n].append(corner[n])
+    return faces
+
+
+def reduce_model(FDTD, nrts=DEFAULT_NRTS, coarsen=DEFAULT_COARSEN):
+    """
+    Cap the timesteps of FDTD and coarsen the mesh of its CSX in place; lines
+    on primitive faces (ports, lumped elements, thin layers) are kept.
+    """
+    FDTD.SetNumberOfTimeSteps(nrts)
+    FDTD.SetEndCriteria(0)
+    if coarsen > 1:
+        CSX = FDTD.GetCSX()
+        grid = CSX.GetGrid()
+        faces = primitive_faces(CSX)
+        for n in range(3):
+            grid.SetLines(n, coarsen_lines(grid.GetLines(n), coarsen, faces[n]))
+
+
+def summarize(rep):
+    """ Benchmark figures of one profiling report """
+    phases = rep["phases"]
+    names = [p["name"] for p in phases]
+    run = names.index("FDTD.Run") if "FDTD.Run" in names else None
+    res = {
+        "cells": rep["info"].get("mesh_cells"),
+        "timesteps": rep["info"].get("max_timesteps"),
+        "threads": rep["info"].get("threads"),
+        "total_time": rep["total_wall_time"],
+        "peak_rss_mb": rep["peak_rss_mb"],
+    }
+    if run is None:
+        return res
+    res["run_time"] = phases[run]["wall_time"]
+    res["setup_time"] = sum(p["wall_time"] for p in phases[:run])
+    res["postproc_time"] = sum(p["wall_time"] for p in phases[run+1:])
+    if res["cells"] and res["timesteps"] and res["run_time"] > 0:
+        res["mcells_per_s"] = res["cells"] * res["timesteps"] / res["run_time"] / 1e6
+    return res
+
+
+def system_info():
+    info = {"host": socket.gethostname(), "platform": platform.platform(),
+            "python": platform.python_version(), "cpus": os.cpu_count()}
+    try:
+        with open("/etc/os-release") as fh:
+            for line in fh:
+                if line.startswith("PRETTY_NAME="):
+                    info["os"] = line.split("=", 1)[1].strip().strip('"')
+    except OSError:
+        pass
+    return info
+
+
+def run_benchmark(examples=EXAMPLES, nrts=DEFAULT_NRTS, coarsen=DEFAULT_COARSEN, threads=None,
+                  label=None, examples_dir=None, log_dir=None):
+    """ Run the reduced examples one by one and return the baseline dict """
+    examples_dir = Path(examples_dir or Path(__file__).resolve().parent.parent)
+    profile_dir = Path(tempfile.mkdtemp(prefix="openems-bench-"))
+    # only the example processes run in benchmark mode, not the caller
+    env = {BENCH_ENV: "1", NRTS_ENV: str(nrts), COARSEN_ENV: str(coarsen),
+           PROFILE_DIR_ENV: str(profile_dir), "OPENEMS_CACHE": "0", "OPENEMS_RUN_MODE": "headless"}
+
+    results = {}
+    for name in examples:
+        job = Job(name=name, script=examples_dir / name / f"{name}.py", env=env)
+        run_jobs([job], total_threads=threads, max_parallel=1, cwd=examples_dir, log_dir=log_dir)
+        res = {"ok": job.ok, "returncode": job.returncode, "wall_time": job.wall_time}
+        report = profile_dir / f"{name}.json"
+        if report.exists():
+            with open(report) as fh:
+                res.update(summarize(json.load(fh)))
+        results[name] = res
+
+    return {
+        "label": label or socket.gethostname(),
+        "system": system_info(),
+        "settings": {"nrts": nrts, "coarsen": coarsen, "threads": threads or os.cpu_count()},
+        "results": results,
+    }
+
+
+def compare(base, new, threshold=0.1):
+    """
+    Compare two baselines, returns a list of (example, metric, base, new,
+    relative change, regression flag). A change worse than `threshold`
+    (relative) counts as regression.
+    """
+    rows = []
+    for name in sorted(set(base["results"]) | set(new["results"])):
+        b = base["results"].get(name, {})
+        n = new["results"].get(name, {})
+        for metric, higher_is_better in METRICS.items():
+            if metric not in b or metric not in n or not b[metric]:
+                continue
+            change = (n[metric] - b[metric]) / b[metric]
+            worse = -change if higher_is_better else change
+            rows.append((name, metric, b[metric], n[metric], change, worse > threshold))
+        if b.get("ok") and not n.get("ok", False):
+            rows.append((name, "ok", True, n.get("ok", False), 0.0, True))
+    return rows
+
+
+def format_results(baseline):
+    lines = [f"{baseline['label']}: {baseline['system'].get('os', baseline['system']['platform'])}, "
+             f"NrTS={baseline['settings']['nrts']}, coarsen={baseline['settings']['coarsen']}"]
+    lines.append(f"{'example':<26} {'status':<7} {'cells':>10} {'MCells/s':>9} {'setup (s)':>10} {'run (s)':>9} {'post (s)':>9}")
+    for name, r in baseline["results"].items():
+        def fmt(key, spec):
+            return format(r[key], spec) if r.get(key) is not None else "-"
+        lines.append(f"{name:<26} {'ok' if r['ok'] else 'FAILED':<7} {fmt('cells', '>10d'):>10} "
+                     f"{fmt('mcells_per_s', '.1f'):>9} {fmt('setup_time', '.2f'):>10} "
+                     f"{fmt('run_time', '.2f'):>9} {fmt('postproc_time', '.2f'):>9}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="simtools bench", description="Benchmark reduced example models")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    run = sub.add_parser("run", help="run the benchmark and write a baseline")
+    run.add_argument("examples", nargs="*", default=EXAMPLES)
+    run.add_argument("--nrts", type=int, default=DEFAULT_NRTS, help="timesteps per model")
+    run.add_argument("--coarsen", type=int, default=DEFAULT_COARSEN, help="keep every N-th mesh line")
+    run.add_argument("--threads", type=int, default=None, help="engine threads (default: all cores)")
+    run.add_argument("--label", default=None, help="name of the build, e.g. the image tag")
+    run.add_argument("--logs", type=Path, default=None, help="write example output to DIR/<example>.log")
+    run.add_argument("--out", type=Path, default=Path("bench.json"))
+    cmp_ = sub.add_parser("compare", help="compare two baselines")
+    cmp_.add_argument("base", type=Path)
+    cmp_.add_argument("new", type=Path)
+    cmp_.add_argument("--threshold", type=float, default=0.1, help="relative change counted as regression")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "run":
+        baseline = run_benchmark(args.examples, args.nrts, args.coarsen, args.threads, args.label, log_dir=args.logs)
+        with open(args.out, "w") as fh:
+            json.dump(baseline, fh, indent=1)
+        print()
+        print(format_results(baseline))
+        return 0 if all(r["ok"] for r in baseline["results"].values()) else 1
+
+    with open(args.base) as fh:
+        base = json.load(fh)
+    with open(args.new) as fh:
+        new = json.load(fh)
+    if base["settings"]["nrts"] != new["settings"]["nrts"] or base["settings"]["coarsen"] != new["settings"]["coarsen"]:
+        print("warning: baselines were taken with different reduction settings", file=sys.stderr)
+    rows = compare(base, new, args.threshold)
+    print(f"{base['label']} -> {new['label']}")
+    print(f"{'example':<26} {'metric':<14} {'base':>10} {'new':>10} {'change':>8}")
+    for name, metric, b, n, change, regression in rows:
+        if metric == "ok":
+            print(f"{name:<26} {'ok':<14} {'ok':>10} {'FAILED':>10} {'':>8}  REGRESSION")
+            continue
+        flag = "  REGRESSION" if regression else ""
+        print(f"{name:<26} {metric:<14} {b:>10.2f} {n:>10.2f} {change:>+8.1%}{flag}")
+    regressions = sum(r[5] for r in rows)
+    print(f"{regressions} regression(s) beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
@@ -0,0 +1,310 @@
+"""
+ Content-addressed cache for FDTD results.
+
+ The cache key is the SHA-256 of the written CSX geometry file together with
+ the complete openEMS setup (FDTD settings, excitation, boundaries and CSX)
+ as written by FDTD.Write2XML. A finished run is copied into the cache store
+ and the simulation directory gets a marker holding the key and the list of
+ result files, so an unchanged model re-uses its results instead of running
+ the engine again. The cache doubles the disk space of the results and is
+ therefore opt-in (OPENEMS_CACHE=1).
+
+ Usage from the command line (run from the examples directory):
+   python3 -m simtools cache list
+   python3 -m simtools cache invalidate [--all] [--path SIM_PATH] [KEY ...]
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import argparse
+from pathlib import Path
+
+CACHE_DIR_ENV = "OPENEMS_CACHE_DIR"
+CACHE_SIZE_ENV = "OPENEMS_CACHE_MAX_BYTES"
+CACHE_ENABLE_ENV = "OPENEMS_CACHE"
+
+MARKER = ".simcache.json"
+ENTRY = "entry.json"
+RESULTS = "results"
+
+DEFAULT_MAX_BYTES = 20 * 1024**3
+
+
+def default_cache_dir():
+    return Path(os.environ.get(CACHE_DIR_ENV, Path.home() / ".cache" / "openems-examples"))
+
+
+def cache_enabled():
+    """ The cache is opt-in: OPENEMS_CACHE=1 """
+    return os.environ.get(CACHE_ENABLE_ENV, "0").lower() not in ("", "0", "false", "no", "off")
+
+
+def dir_size(path):
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+
+
+def manifest(path):
+    """ {relative path: size} of the result files below `path` (without the marker) """
+    path = Path(path)
+    return {str(f.relative_to(path)): f.stat().st_size for f in path.rglob("*")
+            if f.is_file() and f.name != MARKER}
+
+
+def check_manifest(path, files):
+    """ True if all files of a manifest exist below `path` with their recorded size """
+    if files is None:
+        return False
+    path = Path(path)
+    try:
+        return all((path / fn).stat().st_size == size for fn, size in files.items())
+    except OSError:
+        return False
+
+
+def fdtd_setup_xml(FDTD):
+    """Return the full openEMS setup (FDTD + CSX) as XML bytes."""
+    fd, fn = tempfile.mkstemp(suffix=".xml")
+    os.close(fd)
+    try:
+        FDTD.Write2XML(fn)
+        with open(fn, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(fn)
+
+
+def simulation_key(FDTD, geometry_file=None, extra=None):
+    """Hash of the geometry file, the openEMS setup and optional extra settings."""
+    h = hashlib.sha256()
+    if geometry_file is not None and os.path.exists(geometry_file):
+        with open(geometry_file, "rb") as f:
+            h.update(f.read())
+    h.update(fdtd_setup_xml(FDTD))
+    if extra is not None:
+        h.update(json.dumps(extra, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def read_marker(sim_path):
+    try:
+        with open(Path(sim_path) / MARKER) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_marker(sim_path, key, name=None):
+    with open(Path(sim_path) / MARKER, "w") as f:
+        json.dump({"key": key, "name": name, "time": time.time(), "files": manifest(sim_path)}, f, indent=1)
+
+
+class ResultCache:
+    """
+    On-disk LRU store of simulation result directories.
+
+    Entries live in `root/<key>/results` together with an `entry.json`
+    recording name, size, last use and the file manifest. The store is
+    trimmed to `max_bytes` by evicting the least recently used entries.
+    Entries are written into a hidden temporary directory and renamed into
+    place, so concurrent runs of the same model never see a partial entry.
+    """
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = Path(root) if root is not None else default_cache_dir()
+        if max_bytes is None:
+            max_bytes = int(os.environ.get(CACHE_SIZE_ENV, DEFAULT_MAX_BYTES))
+        self.max_bytes = max_bytes
+
+    def entry_path(self, key):
+        return self.root / key
+
+    def entries(self):
+        """All entries, least recently used first."""
+        out = []
+        if not self.root.exists():
+            return out
+        for d in self.root.iterdir():
+            if d.name.startswith("."):
+                continue    # entry being written
+            try:
+                with open(d / ENTRY) as f:
+                    info = json.load(f)
+            except (OSError, ValueError):
+                continue
+            info["key"] = d.name
+            out.append(info)
+        return sorted(out, key=lambda e: e.get("last_used", 0))
+
+    def _touch(self, key):
+        fn = self.entry_path(key) / ENTRY
+        with open(fn) as f:
+            info = json.load(f)
+        info["last_used"] = time.time()
+        with open(fn, "w") as f:
+            json.dump(info, f, indent=1)
+
+    def contains(self, key):
+        return (self.entry_path(key) / ENTRY).exists()
+
+    def valid(self, key):
+        """ True if the entry of `key` is complete (all files of its manifest present) """
+        try:
+            with open(self.entry_path(key) / ENTRY) as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return check_manifest(self.entry_path(key) / RESULTS, info.get("files"))
+
+    def store(self, key, sim_path, name=None):
+        """Copy a finished results directory into the cache."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        dst = self.entry_path(key)
+        tmp = Path(tempfile.mkdtemp(prefix=f".{key[:12]}-", dir=self.root))
+        try:
+            shutil.copytree(sim_path, tmp / RESULTS, ignore=shutil.ignore_patterns(MARKER))
+            info = {"name": name, "created": time.time(), "last_used": time.time(),
+                    "size": dir_size(tmp / RESULTS), "source": str(sim_path), "files": manifest(tmp / RESULTS)}
+            with open(tmp / ENTRY, "w") as f:
+                json.dump(info, f, indent=1)
+            if dst.exists() and not self.valid(key):
+                shutil.rmtree(dst, ignore_errors=True)
+            try:
+                os.rename(tmp, dst)
+            except OSError:
+                pass    # stored concurrently by another run of the same model
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.evict()
+
+    def restore(self, key, sim_path):
+        """
+        Replace `sim_path` with the cached results of `key`. Only a missing or
+        empty directory or one holding results of an earlier run (with a
+        marker) is replaced; returns False if the entry is incomplete or
+        sim_path holds other files.
+        """
+        sim_path = Path(sim_path)
+        if not self.valid(key):
+            return False
+        if sim_path.exists() and any(sim_path.iterdir()) and read_marker(sim_path) is None:
+            print(f"{sim_path} contains files not written by a cached run, not restoring into it")
+            return False
+        sim_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(prefix=f".{sim_path.name}-", dir=sim_path.parent))
+        try:
+            shutil.copytree(self.entry_path(key) / RESULTS, tmp / RESULTS)
+            old = sim_path.with_name(tmp.name + "-old")
+            if sim_path.exists():
+                os.rename(sim_path, old)
+            os.rename(tmp / RESULTS, sim_path)
+            shutil.rmtree(old, ignore_errors=True)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        self._touch(key)
+        return True
+
+    def evict(self, max_bytes=None):
+        """Remove least recently used entries until the store fits `max_bytes`."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(e.get("size", 0) for e in entries)
+        removed = []
+        while entries and total > max_bytes:
+            e = entries.pop(0)
+            shutil.rmtree(self.entry_path(e["key"]), ignore_errors=True)
+            total -= e.get("size", 0)
+            removed.append(e["key"])
+        return removed
+
+    def invalidate(self, keys=None, sim_path=None):
+        """
+        Drop cache entries.
+
+        With neither `keys` nor `sim_path` all entries are removed. With
+        `sim_path` the entry belonging to that directory is removed and its
+        marker deleted, so the next run re-simulates.
+        """
+        if sim_path is not None:
+            keys = list(keys or [])
+            marker = read_marker(sim_path)
+            if marker is not None:
+                keys.append(marker["key"])
+            try:
+                os.remove(Path(sim_path) / MARKER)
+            except FileNotFoundError:
+                pass
+        elif keys is None:
+            keys = [e["key"] for e in self.entries()]
+        for key in keys:
+            shutil.rmtree(self.entry_path(key), ignore_errors=True)
+        return keys
+
+    def run(self, FDTD, sim, extra=None, pre_run=None, post_run=None, **run_kw):
+        """
+        Run `FDTD` for the Simulation `sim` unless an identical run is cached.
+        `pre_run(run_kw)` is called right before an actual engine run and may
+        change its arguments, `post_run` after it, before the results are
+        stored.
+
+        Returns True if cached results were used.
+        """
+        key = simulation_key(FDTD, sim.geometry_file, extra)
+        sim_path = Path(sim.sim_path)
+
+        marker = read_marker(sim_path)
+        if marker is not None and marker.get("key") == key and check_manifest(sim_path, marker.get("files")):
+            if self.contains(key):
+                self._touch(key)
+            print(f"{sim.name}: results in {sim_path} are up to date, skipping FDTD run")
+            return True
+
+        if self.contains(key):
+            print(f"{sim.name}: restoring cached results {key[:12]}")
+            if self.restore(key, sim_path):
+                write_marker(sim_path, key, sim.name)
+                return True
+            print(f"{sim.name}: cached results {key[:12]} not usable, running the engine")
+
+        if pre_run is not None:
+            pre_run(run_kw)
+        FDTD.Run(str(sim_path), **run_kw)
+        if post_run is not None:
+            post_run()
+        self.store(key, sim_path, sim.name)
+        write_marker(sim_path, key, sim.name)
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="simtools cache", description="Manage the openEMS example result cache")
+    parser.add_argument("--root", type=Path, default=None, help="cache directory")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list", help="list cache entries")
+    inv = sub.add_parser("invalidate", help="remove cache entries")
+    inv.add_argument("keys", nargs="*", help="entry keys (or unique prefixes)")
+    inv.add_argument("--all", action="store_true", help="remove all entries")
+    inv.add_argument("--path", type=Path, default=None, help="invalidate the results in this simulation directory")
+    trim = sub.add_parser("trim", help="evict entries down to a size")
+    trim.add_argument("max_bytes", type=int)
+    args = parser.parse_args(argv)
+
+    cache = ResultCache(args.root)
+    if args.cmd == "list":
+        for e in cache.entries():
+            used = time.strftime("%Y-%m-%d %H:%M", time.localtime(e.get("last_used", 0)))
+            print(f"{e['key'][:12]}  {e.get('size', 0)/1e6:10.1f} MB  {used}  {e.get('name')}")
+    elif args.cmd == "invalidate":
+        if not (args.all or args.keys or args.path):
+            parser.error("give KEY, --path or --all")
+        if args.all:
+            keys = [e["key"] for e in cache.entries()]
+        else:
+            keys = [e["key"] for e in cache.entries() if any(e["key"].startswith(k) for k in args.keys)]
+        removed = cache.invalidate(keys, args.path)
+        print(f"removed {len(removed)} entries")
+    elif args.cmd == "trim":
+        print(f"removed {len(cache.evict(args.max_bytes))} entries")
@@ -0,0 +1,69 @@
+"""
+ Vectorized zero crossings and local slopes of sampled curves.
+
+ All functions take curves as arrays (..., nf) over a common abscissa (nf,),
+ e.g. one row per design of a sweep, and work on all rows at once. Crossings
+ are located to sub-sample accuracy by linear interpolation between the two
+ samples around the sign change; slopes are least-squares fits over a few
+ samples around it, which is less noise sensitive than a two-point
+ difference.
+"""
+
+import numpy as np
+
+
+def _changes(y, rising):
+    neg = np.signbit(y)
+    change = neg[..., :-1] != neg[..., 1:]
+    if rising is True:
+        change &= neg[..., :-1]
+    elif rising is False:
+        change &= ~neg[..., :-1]
+    return change
+
+
+def _interp(x, y, i):
+    y0 = np.take_along_axis(y, i[..., None], -1)[..., 0]
+    y1 = np.take_along_axis(y, i[..., None] + 1, -1)[..., 0]
+    return x[i] - y0*(x[i+1] - x[i])/(y1 - y0)
+
+
+def zero_crossings(x, y, rising=None):
+    """
+    All zero crossings of y (..., n): (row index tuple, sample index i of the
+    interval [x_i, x_i+1], interpolated x). `rising` selects negative-to-positive
+    (True) or positive-to-negative (False) crossings only.
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    *rows, i = np.nonzero(_changes(y, rising))
+    rows = tuple(rows)
+    y0, y1 = y[rows + (i,)], y[rows + (i+1,)]
+    return rows, i, x[i] - y0*(x[i+1] - x[i])/(y1 - y0)
+
+
+def first_crossing(x, y, rising=None):
+    """ First zero crossing of every row: (interpolated x, interval index), NaN and -1 where there is none """
+    x, y = np.asarray(x), np.asarray(y)
+    change = _changes(y, rising)
+    found = change.any(-1)
+    i = np.argmax(change, -1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x0 = _interp(x, y, i)
+    return np.where(found, x0, np.nan), np.where(found, i, -1)
+
+
+def local_slope(x, y, i, half_width=3):
+    """
+    Least-squares slope dy/dx of every row of y (..., n) over the
+    2*half_width samples around the interval [x_i, x_i+1]; NaN where i < 0.
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    i = np.asarray(i)
+    win = np.clip(np.maximum(i, 0)[..., None] + np.arange(1 - half_width, half_width + 1), 0, len(x) - 1)
+    xs = x[win]
+    ys = np.take_along_axis(y, win, -1)
+    dx = xs - xs.mean(-1, keepdims=True)
+    dy = ys - ys.mean(-1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = (dx*dy).sum(-1) / (dx*dx).sum(-1)
+    return np.where(i >= 0, slope, np.nan)
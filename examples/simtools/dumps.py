@@ -0,0 +1,392 @@
+"""
+ Field dump presets and HDF5 post-processing of the dump files.
+
+ add_dump() creates a CSX dump box from a named preset (field, time or
+ frequency domain, file type, spatial sub-sampling, interpolation). openEMS
+ writes HDF5 dumps uncompressed and at its own time interval, so chunking,
+ compression and time decimation are applied afterwards by repack(), which
+ rewrites `<name>.h5` with h5py. Simulation.add_dump() registers the preset
+ and repacks right after the engine run, before the results are cached.
+
+   sim.add_dump(CSX, 'Et', *roi(start, stop, 'plane-z'), preset='decimated')
+
+ Presets can be overridden per run with OPENEMS_DUMP_PRESET, which is how
+ 'python3 -m simtools dumps bench' compares them on a real model.
+
+ FieldDump reads a time domain HDF5 dump lazily as a (time, x, y, z,
+ component) array: uncompressed datasets are memory-mapped, compressed ones
+ are read chunk-wise through h5py, so a plane or a single timestep only
+ reads the bytes it needs:
+
+   with open_dump(sim_path, 'Et') as Et:
+       Ez = Et[:, :, :, k, 2]      # z-component in the plane z = z[k]
+"""
+
+import os
+import json
+import argparse
+import tempfile
+from pathlib import Path
+from dataclasses import dataclass, replace, asdict
+
+import numpy as np
+
+from .scheduler import Job, run_jobs
+from .benchmark import PROFILE_DIR_ENV
+
+PRESET_ENV = "OPENEMS_DUMP_PRESET"
+
+FIELDS = {"E": 0, "H": 1, "J": 2, "rotH": 3}
+INTERPOLATION = {"none": 0, "node": 1, "cell": 2}
+FILE_TYPES = {"vtk": 0, "hdf5": 1}
+
+
+@dataclass(frozen=True)
+class DumpPreset:
+    field: str = "E"
+    domain: str = "time"              # 'time' or 'freq'
+    file_type: str = "hdf5"
+    interpolation: str = "node"
+    sub_sampling: tuple = None        # keep every n-th mesh line per direction
+    opt_resolution: tuple = None      # or resample to this resolution (drawing units)
+    frequencies: tuple = None         # frequency domain dumps
+    time_decimation: int = 1          # keep every n-th time dump (repack)
+    compression: str = None           # 'gzip', 'lzf' or None (repack)
+    compression_level: int = 4
+
+    @property
+    def dump_type(self):
+        return FIELDS[self.field] + (10 if self.domain == "freq" else 0)
+
+    @property
+    def needs_repack(self):
+        return self.file_type == "hdf5" and (self.compression is not None or self.time_decimation > 1)
+
+
+PRESETS = {
+    # the CSX default, one VTK file per timestep
+    "vtk": DumpPreset(file_type="vtk"),
+    # HDF5 as written by openEMS
+    "raw": DumpPreset(),
+    # chunked and compressed HDF5
+    "compressed": DumpPreset(compression="gzip"),
+    # compressed, every 4th time dump
+    "decimated": DumpPreset(compression="gzip", time_decimation=4),
+    # compressed, every 2nd mesh line
+    "subsampled": DumpPreset(compression="gzip", sub_sampling=(2, 2, 2)),
+    # frequency domain only, pass the frequencies to add_dump()
+    "freq": DumpPreset(domain="freq", compression="gzip"),
+}
+
+
+def get_preset(preset="compressed", **overrides):
+    """ Preset by name (or DumpPreset) with fields replaced; OPENEMS_DUMP_PRESET takes precedence """
+    preset = os.environ.get(PRESET_ENV) or preset
+    if isinstance(preset, str):
+        try:
+            preset = PRESETS[preset]
+        except KeyError:
+            raise ValueError(f"unknown dump preset {preset!r}, use one of {', '.join(PRESETS)}")
+    overrides = {k: v for k, v in overrides.items() if v is not None}
+    if "frequencies" in overrides and preset.domain != "freq":
+        overrides.setdefault("domain", "freq")
+    return replace(preset, **overrides)
+
+
+def roi(start, stop, kind="volume", position=None):
+    """
+    Region of interest inside the box start/stop: the whole 'volume' or a
+    'plane-x', 'plane-y' or 'plane-z' cut at `position` (default: center).
+    """
+    start, stop = list(start), list(stop)
+    if kind == "volume":
+        return start, stop
+    try:
+        n = "xyz".index(kind[-1]) if kind.startswith("plane-") else None
+    except ValueError:
+        n = None
+    if n is None:
+        raise ValueError(f"unknown region {kind!r}, use 'volume' or 'plane-x/y/z'")
+    pos = (start[n] + stop[n]) / 2 if position is None else position
+    start[n] = stop[n] = pos
+    return start, stop
+
+
+def add_dump(CSX, name, start, stop, preset="compressed", priority=0, **overrides):
+    """ Add a dump box using a preset, returns (dump property, effective preset) """
+    p = get_preset(preset, **overrides)
+    kw = dict(dump_type=p.dump_type, dump_mode=INTERPOLATION[p.interpolation], file_type=FILE_TYPES[p.file_type])
+    if p.sub_sampling is not None:
+        kw["sub_sampling"] = list(p.sub_sampling)
+    if p.opt_resolution is not None:
+        kw["opt_resolution"] = list(p.opt_resolution)
+    if p.domain == "freq":
+        if not p.frequencies:
+            raise ValueError("frequency domain dumps need frequencies")
+        kw["frequency"] = list(p.frequencies)
+    dump = CSX.AddDump(name, **kw)
+    dump.AddBox(start, stop, priority=priority)
+    return dump, p
+
+
+def dump_files(sim_path, name):
+    """ Files written for dump `name` (one .h5 or a series of VTK files) """
+    sim_path = Path(sim_path)
+    return sorted(p for p in sim_path.glob(f"{name}*") if p.suffix in (".h5", ".vtr", ".vts", ".vtk")
+                  and (p.stem == name or p.stem.startswith(name + "_")))
+
+
+def _copy_attrs(src, dst):
+    for k, v in src.attrs.items():
+        dst.attrs[k] = v
+
+
+def repack(fn, preset):
+    """
+    Rewrite an openEMS HDF5 dump with chunking/compression and keep only every
+    `time_decimation`-th time dump. Returns (size before, size after) in bytes.
+    """
+    import h5py
+
+    fn = Path(fn)
+    before = fn.stat().st_size
+    tmp = fn.with_name(fn.name + ".tmp")
+    comp = dict(compression=preset.compression, chunks=True)
+    if preset.compression == "gzip":
+        comp.update(compression_opts=preset.compression_level, shuffle=True)
+    elif preset.compression is None:
+        comp = {}
+
+    with h5py.File(fn, "r") as src, h5py.File(tmp, "w") as dst:
+        _copy_attrs(src, dst)
+
+        def visit(name, obj):
+            if isinstance(obj, h5py.Group):
+                _copy_attrs(obj, dst.require_group(name))
+        src.visititems(visit)
+
+        def copy(name, obj):
+            if not isinstance(obj, h5py.Dataset):
+                return
+            parent = name.rsplit("/", 1)[0]
+            if parent.endswith("FieldData/TD") and keep_td is not None and name not in keep_td:
+                return
+            kw = comp if obj.ndim > 1 else {}
+            ds = dst.create_dataset(name, data=obj[()], **kw)
+            _copy_attrs(obj, ds)
+
+        keep_td = None
+        if preset.time_decimation > 1 and "FieldData/TD" in src:
+            td = src["FieldData/TD"]
+            steps = sorted(td.keys(), key=lambda k: int(k) if k.isdigit() else k)
+            keep_td = {f"FieldData/TD/{k}" for k in steps[::preset.time_decimation]}
+        src.visititems(copy)
+
+    os.replace(tmp, fn)
+    return before, fn.stat().st_size
+
+
+def repack_all(sim_path, presets, verbose=True):
+    """ Repack the HDF5 dumps of {name: preset}, returns {name: (before, after)} """
+    sizes = {}
+    for name, preset in presets.items():
+        fn = Path(sim_path) / f"{name}.h5"
+        if not preset.needs_repack or not fn.exists():
+            continue
+        sizes[name] = repack(fn, preset)
+        if verbose:
+            before, after = sizes[name]
+            print(f"dump {name}: {before/1024**2:.1f} MB -> {after/1024**2:.1f} MB")
+    return sizes
+
+
+def dump_sizes(sim_path, names):
+    """ Total size in bytes of the files of each dump """
+    return {name: sum(p.stat().st_size for p in dump_files(sim_path, name)) for name in names}
+
+
+def _step_key(name):
+    return (0, int(name), "") if name.isdigit() else (1, 0, name)
+
+
+# names of the /Mesh datasets by MeshType (0: cartesian, 1: cylindrical)
+MESH_AXES = {0: ("x", "y", "z"), 1: ("rho", "alpha", "z")}
+
+
+class FieldDump:
+    """
+    Lazily indexed time domain field dump, shape (nt, nx, ny, nz, 3).
+
+    Spatial and component indices are ints or slices; the time index may
+    also be a list of steps. openEMS stores each timestep as a (3, nz, ny, nx)
+    dataset in /FieldData/TD, the mesh lines in /Mesh (x, y, z or, for a
+    cylindrical mesh, rho, alpha, z; `coord_system` and `axes` tell which).
+    """
+
+    def __init__(self, fn):
+        import h5py
+
+        self.fn = Path(fn)
+        self._h5 = h5py.File(self.fn, "r")
+        mesh = self._h5["Mesh"]
+        self.mesh_type = int(np.ravel(mesh.attrs.get("MeshType", [0]))[0])
+        self.axes = MESH_AXES.get(self.mesh_type)
+        if self.axes is None or any(n not in mesh for n in self.axes):
+            self.axes = next((a for a in MESH_AXES.values() if all(n in mesh for n in a)), None)
+            if self.axes is None:
+                self._h5.close()
+                raise ValueError(f"{fn}: unknown mesh datasets {sorted(mesh)}")
+        self.coord_system = 1 if self.axes == MESH_AXES[1] else 0
+        self.lines = [np.asarray(mesh[n]) for n in self.axes]
+        td = self._h5.get("FieldData/TD")
+        self.steps = sorted(td.keys(), key=_step_key) if td is not None else []
+        self._td = td
+        self.time = np.array([float(np.ravel(td[s].attrs.get("time", [np.nan]))[0]) for s in self.steps])
+        self._maps = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._maps.clear()
+        self._h5.close()
+
+    @property
+    def shape(self):
+        return (len(self.steps), *(len(l) for l in self.lines), 3)
+
+    def __len__(self):
+        return len(self.steps)
+
+    @property
+    def frequencies(self):
+        """ Frequencies of a frequency domain dump """
+        fd = self._h5.get("FieldData/FD")
+        if fd is None:
+            return np.array([])
+        names = sorted({k.rsplit("_", 1)[0] for k in fd}, key=lambda k: int(k[1:]))
+        return np.array([float(np.ravel(fd[f"{n}_real"].attrs["frequency"])[0]) for n in names])
+
+    def frequency_field(self, n):
+        """ Complex field (nx, ny, nz, 3) at the n-th frequency of a frequency domain dump """
+        fd = self._h5["FieldData/FD"]
+        return (np.asarray(fd[f"f{n}_real"]) + 1j*np.asarray(fd[f"f{n}_imag"])).T
+
+    def _dataset(self, i):
+        """ Memory map of timestep i if stored contiguously, else the h5py dataset """
+        name = self.steps[i]
+        if name not in self._maps:
+            ds = self._td[name]
+            offset = ds.id.get_offset() if ds.chunks is None and ds.compression is None else None
+            if offset is not None:
+                self._maps[name] = np.memmap(self.fn, dtype=ds.dtype, mode="r", offset=offset, shape=ds.shape)
+            else:
+                self._maps[name] = ds
+        return self._maps[name]
+
+    def timestep(self, i, key=()):
+        """ Field (x, y, z, component) of timestep i, indexed by `key` before reading """
+        key = key if isinstance(key, tuple) else (key,)
+        if len(key) > 4 or any(not isinstance(k, (int, np.integer, slice)) for k in key):
+            raise IndexError("spatial indices must be ints or slices")
+        key = key + (slice(None),) * (4 - len(key))
+        # stored as (component, z, y, x): reverse the key, then the axes
+        return np.asarray(self._dataset(i)[key[::-1]]).T
+
+    def __getitem__(self, key):
+        key = key if isinstance(key, tuple) else (key,)
+        t, rest = key[0], key[1:]
+        if isinstance(t, (int, np.integer)):
+            return self.timestep(range(len(self))[t], rest)
+        idx = range(len(self))[t] if isinstance(t, slice) else np.asarray(t, dtype=int)
+        return np.stack([self.timestep(i, rest) for i in idx])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.timestep(i)
+
+
+def open_dump(sim_path, name):
+    """ FieldDump of the HDF5 dump `name` in sim_path """
+    fn = Path(sim_path) / f"{name}.h5"
+    if not fn.exists():
+        if dump_files(sim_path, name):
+            raise ValueError(f"dump {name!r} is not HDF5, use an HDF5 preset to read it lazily")
+        raise FileNotFoundError(fn)
+    return FieldDump(fn)
+
+
+def benchmark(script, presets, threads=None, log_dir=None):
+    """
+    Run an example once per preset (headless, no cache) and collect engine
+    time, repack time and dump size from its profiling report.
+    """
+    results = {}
+    profile_dir = Path(tempfile.mkdtemp(prefix="openems-dumps-"))
+    script = Path(script).resolve()
+    for preset in presets:
+        env = {PRESET_ENV: preset, PROFILE_DIR_ENV: str(profile_dir / preset),
+               "OPENEMS_CACHE": "0", "OPENEMS_RUN_MODE": "headless"}
+        job = Job(name=f"{script.stem}-{preset}", script=script, env=env)
+        run_jobs([job], total_threads=threads, max_parallel=1, cwd=script.parent, log_dir=log_dir)
+        res = {"ok": job.ok, "wall_time": job.wall_time}
+        reports = list((profile_dir / preset).glob("*.json"))
+        if reports:
+            with open(reports[0]) as fh:
+                rep = json.load(fh)
+            phases = {p["name"]: p["wall_time"] for p in rep["phases"]}
+            # the repack runs inside the FDTD.Run phase
+            res["repack_time"] = rep["info"].get("dump_repack_time", 0.0)
+            if "FDTD.Run" in phases:
+                res["run_time"] = phases["FDTD.Run"] - res["repack_time"]
+            res["dump_bytes"] = sum(rep["info"].get("dump_bytes", {}).values())
+        results[preset] = res
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="simtools dumps", description="Field dump presets")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("presets", help="list the presets")
+    rp = sub.add_parser("repack", help="compress and decimate HDF5 dump files")
+    rp.add_argument("files", nargs="+", type=Path)
+    rp.add_argument("--preset", default="compressed")
+    rp.add_argument("--time-decimation", type=int, default=None)
+    bench = sub.add_parser("bench", help="compare presets on an example that uses add_dump")
+    bench.add_argument("script", type=Path)
+    bench.add_argument("--presets", nargs="+", default=["vtk", "raw", "compressed", "decimated", "subsampled"])
+    bench.add_argument("--threads", type=int, default=None, help="engine threads (default: all cores)")
+    bench.add_argument("--logs", type=Path, default=None, help="write the output of each run to DIR/<example>-<preset>.log")
+    bench.add_argument("--json", type=Path, default=None, help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "presets":
+        for name, p in PRESETS.items():
+            print(f"{name:<12} {asdict(p)}")
+        return 0
+
+    if args.cmd == "repack":
+        preset = get_preset(args.preset, time_decimation=args.time_decimation)
+        for fn in args.files:
+            before, after = repack(fn, preset)
+            print(f"{fn}: {before/1024**2:.1f} MB -> {after/1024**2:.1f} MB")
+        return 0
+
+    results = benchmark(args.script, args.presets, args.threads, args.logs)
+    base = results.get(args.presets[0], {})
+    print(f"{'preset':<12} {'status':<7} {'run (s)':>9} {'repack (s)':>11} {'size (MB)':>10} {'size':>7} {'MB/s':>8}")
+    for name, r in results.items():
+        size = r.get("dump_bytes")
+        rel = f"{size/base['dump_bytes']:.0%}" if size and base.get("dump_bytes") else "-"
+        t = (r.get("run_time") or 0) + (r.get("repack_time") or 0)
+        rate = f"{size/1024**2/t:.1f}" if size and t else "-"
+        run = f"{r['run_time']:.2f}" if r.get("run_time") is not None else "-"
+        print(f"{name:<12} {'ok' if r['ok'] else 'FAILED':<7} {run:>9} {r.get('repack_time', 0):>11.2f} "
+              f"{(size or 0)/1024**2:>10.1f} {rel:>7} {rate:>8}")
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=1)
+    return 0 if all(r["ok"] for r in results.values()) else 1
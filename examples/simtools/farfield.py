@@ -0,0 +1,182 @@
+"""
+ Cache for NF2FF far-field calculations.
+
+ openEMS caches a far-field result only by its output file name, so a
+ changed angular grid, center or frequency either recomputes or silently
+ returns a stale file. FarFieldCache keys every result on
+
+   - the simulation result (cache key of the run or a fingerprint of the
+     recorded nf2ff box dumps),
+   - the nf2ff box name, radius and phase center,
+   - the frequencies and the theta/phi grid.
+
+ A request is served from any cached result of the same simulation, box,
+ radius and center whose frequencies and angles contain the requested ones,
+ e.g. a phi=0 cut is sliced out of a full 3D pattern. Note that Prad and
+ Dmax of such a subset are those integrated over the larger grid.
+"""
+
+import os
+import json
+import time
+import hashlib
+from pathlib import Path
+
+import numpy as np
+
+from .cache import read_marker
+
+FIELDS = ("E_theta", "E_phi", "E_norm", "E_cprh", "E_cplh", "P_rad")
+INDEX = "index.json"
+
+
+class FarField:
+    """ Far-field result with the attributes of openEMS.nf2ff.nf2ff_results """
+
+    def __init__(self, **data):
+        for k, v in data.items():
+            setattr(self, k, v)
+
+    @classmethod
+    def from_nf2ff(cls, res):
+        data = {k: np.atleast_1d(np.asarray(getattr(res, k))) for k in ("freq", "theta", "phi", "r", "Dmax", "Prad")}
+        for k in FIELDS:
+            data[k] = np.asarray(getattr(res, k))
+        return cls(**data)
+
+    def subset(self, fi, ti, pi):
+        data = {"freq": self.freq[fi], "theta": self.theta[ti], "phi": self.phi[pi], "r": self.r,
+                "Dmax": self.Dmax[fi], "Prad": self.Prad[fi]}
+        for k in FIELDS:
+            data[k] = getattr(self, k)[np.ix_(fi, ti, pi)]
+        return FarField(**data)
+
+    def save(self, fn):
+        np.savez(fn, **{k: getattr(self, k) for k in ("freq", "theta", "phi", "r", "Dmax", "Prad") + FIELDS})
+
+    @classmethod
+    def load(cls, fn):
+        with np.load(fn) as d:
+            return cls(**{k: d[k] for k in d.files})
+
+
+def result_fingerprint(sim_path, box_name="nf2ff"):
+    """ Identify the simulation result a far-field is computed from """
+    h = hashlib.sha256()
+    marker = read_marker(sim_path)
+    if marker is not None:
+        h.update(marker["key"].encode())
+    for fn in sorted(Path(sim_path).glob(f"{box_name}_[EH]_*.h5")):
+        st = fn.stat()
+        h.update(f"{fn.name}:{st.st_size}:{st.st_mtime_ns}".encode())
+    return h.hexdigest()
+
+
+def _indices(requested, available, atol=1e-9):
+    """ Index of every requested value in `available`, or None if one is missing """
+    available = np.asarray(available, dtype=float)
+    idx = []
+    for v in np.atleast_1d(np.asarray(requested, dtype=float)):
+        hit = np.flatnonzero(np.isclose(available, v, rtol=1e-12, atol=atol))
+        if not len(hit):
+            return None
+        idx.append(hit[0])
+    return np.array(idx, dtype=int)
+
+
+class FarFieldCache:
+    """
+    Far-field results of one nf2ff box of one simulation directory.
+
+    Entries are stored as .npz files in `sim_path/nf2ff_cache`; the least
+    recently used entries are evicted once there are more than `max_entries`.
+    """
+
+    def __init__(self, nf2ff, sim_path, max_entries=16, cache_dir=None):
+        self.nf2ff = nf2ff
+        self.sim_path = Path(sim_path)
+        self.box_name = getattr(nf2ff, "name", "nf2ff")
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else self.sim_path / "nf2ff_cache"
+        self.max_entries = max_entries
+
+    def _load_index(self):
+        try:
+            with open(self.cache_dir / INDEX) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self, index):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.cache_dir / INDEX, "w") as fh:
+            json.dump(index, fh, indent=1)
+
+    def _evict(self, index):
+        entries = sorted(index.items(), key=lambda kv: kv[1]["last_used"])
+        while len(entries) > self.max_entries:
+            key, _ = entries.pop(0)
+            del index[key]
+            try:
+                os.remove(self.cache_dir / f"{key}.npz")
+            except FileNotFoundError:
+                pass
+
+    def _find(self, index, base, freq, theta, phi):
+        for key, e in index.items():
+            if e["base"] != base:
+                continue
+            fi = _indices(freq, e["freq"], atol=1e-3)
+            ti = _indices(theta, e["theta"])
+            pi = _indices(phi, e["phi"])
+            if fi is not None and ti is not None and pi is not None:
+                return key, fi, ti, pi
+        return None
+
+    def calc(self, freq, theta, phi, center=[0, 0, 0], radius=1, verbose=0):
+        """ Same arguments as nf2ff.CalcNF2FF, returns a FarField """
+        freq = np.atleast_1d(np.asarray(freq, dtype=float))
+        theta = np.atleast_1d(np.asarray(theta, dtype=float))
+        phi = np.atleast_1d(np.asarray(phi, dtype=float))
+        center = [float(c) for c in center]
+
+        base = hashlib.sha256(json.dumps([result_fingerprint(self.sim_path, self.box_name),
+                                          self.box_name, float(radius), center]).encode()).hexdigest()
+        index = self._load_index()
+
+        found = self._find(index, base, freq, theta, phi)
+        if found is not None:
+            key, fi, ti, pi = found
+            if os.path.exists(self.cache_dir / f"{key}.npz"):
+                index[key]["last_used"] = time.time()
+                self._save_index(index)
+                if verbose:
+                    print(f"nf2ff: using cached far-field {key[:12]}")
+                return FarField.load(self.cache_dir / f"{key}.npz").subset(fi, ti, pi)
+            del index[key]
+
+        key = hashlib.sha256(json.dumps([base, freq.tolist(), theta.tolist(), phi.tolist()]).encode()).hexdigest()
+        outfile = f"{self.box_name}_{key[:12]}.h5"
+        res = self.nf2ff.CalcNF2FF(str(self.sim_path), freq, theta, phi, radius=radius, center=center,
+                                   outfile=outfile, read_cached=False, verbose=verbose)
+        ff = FarField.from_nf2ff(res)
+        try:
+            os.remove(self.sim_path / outfile)
+        except FileNotFoundError:
+            pass
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        ff.save(self.cache_dir / f"{key}.npz")
+        index[key] = {"base": base, "freq": freq.tolist(), "theta": theta.tolist(), "phi": phi.tolist(),
+                      "center": center, "radius": float(radius), "last_used": time.time()}
+        self._evict(index)
+        self._save_index(index)
+        return ff
+
+    def clear(self):
+        """ Remove all cached far-fields of this simulation """
+        for key in self._load_index():
+            try:
+                os.remove(self.cache_dir / f"{key}.npz")
+            except FileNotFoundError:
+                pass
+        self._save_index({})
@@ -0,0 +1,360 @@
+"""
+ Job queue and headless worker for running examples on many containers.
+
+ A job is an example script (relative to the examples directory) with
+ command line arguments, environment variables and a thread count. Jobs are
+ submitted to a queue shared by all workers:
+
+   spool directory   a directory on a shared filesystem (NFS, bind mount).
+                     Jobs are files in incoming/; a worker claims one by
+                     renaming it into running/, which is atomic, so every
+                     job is taken by exactly one worker.
+   redis://...       a Redis (or compatible) server, needs the redis module.
+
+ A worker copies the example directory into a scratch directory, without
+ earlier results and simulation data (the job's exclude patterns, default
+ SCRATCH_EXCLUDE), runs the script there (headless unless the job says
+ otherwise), copies the example directory with its results and the log to
+ <shared>/<job id>/ and records the outcome in the job status (queued,
+ running, done or failed, host, worker, exit code, wall time). Scripts must
+ lie inside the examples directory, jobs pointing elsewhere fail.
+
+ Workers are named after their host (or OPENEMS_WORKER, needed for several
+ workers per host). On start a worker re-queues the jobs its name still has
+ running whose worker process is gone according to the status (another
+ host, or a pid that is no longer alive), i.e. those of a killed container.
+
+ Usage (run from the examples directory, OPENEMS_QUEUE sets the default queue):
+   python3 -m simtools queue submit --queue /farm/spool RCS_Sphere/RCS_Sphere.py
+   python3 -m simtools queue submit --env OPENEMS_BENCH=1 Rect_Waveguide/Rect_Waveguide.py --mode headless
+   python3 -m simtools queue submit --exclude __pycache__ tdr_line_discont/scikit_tdr_from_s2p.py
+   python3 -m simtools queue worker --queue /farm/spool --shared /farm/results --threads 8
+   python3 -m simtools queue status --queue /farm/spool
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import signal
+import socket
+import argparse
+from pathlib import Path
+
+from .scheduler import Job, _run_job
+from .runmode import MODE_ENV
+
+QUEUE_ENV = "OPENEMS_QUEUE"
+SHARED_ENV = "OPENEMS_SHARED"
+WORKER_ENV = "OPENEMS_WORKER"
+
+# not copied into the scratch directory: results and simulation data of earlier runs
+SCRATCH_EXCLUDE = ("results*", "data", "__pycache__")
+
+
+def new_job(script, args=(), env=None, threads=None, job_id=None, exclude=None):
+    """ Job description as stored in the queue """
+    job = {
+        "id": _check_id(job_id or time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:8]),
+        "script": str(script),
+        "args": [str(a) for a in args],
+        "env": {k: str(v) for k, v in (env or {}).items()},
+        "threads": threads,
+        "submitted": time.time(),
+    }
+    if exclude is not None:
+        job["exclude"] = list(exclude)
+    return job
+
+
+def _check_id(job_id):
+    if not job_id or os.sep in job_id or (os.altsep and os.altsep in job_id) or job_id in (".", ".."):
+        raise ValueError(f"invalid job id {job_id!r}")
+    return job_id
+
+
+def _abandoned(status):
+    """ Whether the worker process recorded in the status of a running job is gone """
+    pid = status.get("pid")
+    if status.get("host") != socket.gethostname() or not pid or pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def _write_json(fn, data):
+    tmp = fn.with_name(f".{fn.name}.{os.getpid()}.tmp")
+    with open(tmp, "w") as fh:
+        json.dump(data, fh, indent=1)
+    os.replace(tmp, fn)
+
+
+class Spool:
+    """ Queue in a directory: incoming/, running/, done/, failed/ and status/ """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        for d in ("incoming", "running", "done", "failed", "status"):
+            (self.root / d).mkdir(parents=True, exist_ok=True)
+
+    def _path(self, state, job_id):
+        return self.root / state / f"{job_id}.json"
+
+    def submit(self, job):
+        self.set_status(job["id"], state="queued", script=job["script"], submitted=job["submitted"])
+        # written under a hidden name first, workers only pick up complete files
+        _write_json(self._path("incoming", job["id"]), job)
+        return job["id"]
+
+    def claim(self, worker):
+        """ Take the oldest queued job, or None if there is none """
+        queued = []
+        for fn in self.root.glob("incoming/*.json"):
+            try:
+                queued.append((fn.stat().st_mtime, fn))
+            except FileNotFoundError:
+                pass
+        for _, fn in sorted(queued):
+            target = self._path("running", fn.stem)
+            try:
+                os.rename(fn, target)
+            except FileNotFoundError:
+                continue    # claimed by another worker
+            with open(target) as fh:
+                job = json.load(fh)
+            self.set_status(job["id"], state="running", worker=worker, host=socket.gethostname(),
+                            pid=os.getpid(), started=time.time())
+            return job
+        return None
+
+    def finish(self, job, state, **info):
+        os.replace(self._path("running", job["id"]), self._path(state, job["id"]))
+        self.set_status(job["id"], state=state, finished=time.time(), **info)
+
+    def recover(self, worker):
+        """ Re-queue jobs left running by `worker` whose process is gone (e.g. after the container was killed) """
+        jobs = []
+        for fn in self.root.glob("running/*.json"):
+            status = self.status(fn.stem)
+            if status.get("worker") == worker and _abandoned(status):
+                os.replace(fn, self._path("incoming", fn.stem))
+                self.set_status(fn.stem, state="queued", worker=None, pid=None)
+                jobs.append(fn.stem)
+        return jobs
+
+    def set_status(self, job_id, **fields):
+        fn = self._path("status", job_id)
+        status = self.status(job_id)
+        status.update(fields, id=job_id, updated=time.time())
+        _write_json(fn, status)
+
+    def status(self, job_id):
+        try:
+            with open(self._path("status", job_id)) as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return {}
+
+    def all_status(self):
+        return [self.status(fn.stem) for fn in sorted(self.root.glob("status/*.json"))]
+
+
+class RedisQueue:
+    """ Queue in Redis lists: <prefix>:incoming, <prefix>:running:<worker> and a JSON status per job """
+
+    def __init__(self, url, prefix="openems"):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("the redis module is required for redis:// queues (pip install redis)") from None
+        self.db = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+
+    def _key(self, *parts):
+        return ":".join((self.prefix,) + parts)
+
+    def submit(self, job):
+        self.set_status(job["id"], state="queued", script=job["script"], submitted=job["submitted"])
+        self.db.lpush(self._key("incoming"), json.dumps(job))
+        return job["id"]
+
+    def claim(self, worker):
+        data = self.db.lmove(self._key("incoming"), self._key("running", worker), "RIGHT", "LEFT")
+        if data is None:
+            return None
+        job = json.loads(data)
+        job["_raw"] = data
+        self.set_status(job["id"], state="running", worker=worker, host=socket.gethostname(), pid=os.getpid(),
+                        started=time.time())
+        return job
+
+    def finish(self, job, state, **info):
+        self.db.lrem(self._key("running", self.status(job["id"])["worker"]), 1, job["_raw"])
+        self.set_status(job["id"], state=state, finished=time.time(), **info)
+
+    def recover(self, worker):
+        jobs = []
+        running = self._key("running", worker)
+        for data in self.db.lrange(running, 0, -1):
+            job_id = json.loads(data)["id"]
+            if not _abandoned(self.status(job_id)) or not self.db.lrem(running, 1, data):
+                continue
+            self.db.rpush(self._key("incoming"), data)
+            self.set_status(job_id, state="queued", worker=None, pid=None)
+            jobs.append(job_id)
+        return jobs
+
+    def set_status(self, job_id, **fields):
+        status = self.status(job_id)
+        status.update(fields, id=job_id, updated=time.time())
+        self.db.set(self._key("status", job_id), json.dumps(status))
+        self.db.sadd(self._key("jobs"), job_id)
+
+    def status(self, job_id):
+        data = self.db.get(self._key("status", job_id))
+        return json.loads(data) if data else {}
+
+    def all_status(self):
+        return [self.status(job_id) for job_id in sorted(self.db.smembers(self._key("jobs")))]
+
+
+def open_queue(url=None):
+    """ Queue from a spool directory or a redis:// URL (default: OPENEMS_QUEUE) """
+    url = url or os.environ.get(QUEUE_ENV)
+    if not url:
+        raise ValueError(f"no queue given (--queue or {QUEUE_ENV})")
+    if str(url).startswith(("redis://", "rediss://", "unix://")):
+        return RedisQueue(url)
+    return Spool(url)
+
+
+def run_job(job, examples_dir, shared_dir, scratch_dir, threads):
+    """
+    Run one job in a scratch copy of its example directory (without the
+    files matching the job's exclude patterns) and upload the directory
+    with results and log to shared_dir/<job id>. Returns the final state
+    and the status fields.
+    """
+    examples_dir = Path(examples_dir).resolve()
+    script = (examples_dir / job["script"]).resolve()
+    if examples_dir not in script.parents:
+        raise ValueError(f"script {job['script']!r} is not inside the examples directory {examples_dir}")
+    work = Path(scratch_dir) / _check_id(job["id"])
+    if work.exists():
+        shutil.rmtree(work)
+    work.mkdir(parents=True)
+    if script.exists():
+        shutil.copytree(script.parent, work / script.parent.name,
+                        ignore=shutil.ignore_patterns(*job.get("exclude", SCRATCH_EXCLUDE)))
+
+    env = {MODE_ENV: "headless", "PYTHONPATH": os.pathsep.join(
+        p for p in (str(examples_dir), os.environ.get("PYTHONPATH")) if p)}
+    env.update(job.get("env", {}))
+    run = Job(name=job["id"], script=work / script.parent.name / script.name, args=job.get("args", []),
+              threads=job.get("threads") or threads, env=env)
+    _run_job(run, cwd=run.script.parent if script.exists() else work, log_dir=work)
+
+    dest = Path(shared_dir) / job["id"]
+    shutil.copytree(work, dest, dirs_exist_ok=True)
+    shutil.rmtree(work, ignore_errors=True)
+    state = "done" if run.ok else "failed"
+    return state, {"returncode": run.returncode, "wall_time": run.wall_time, "threads": run.threads,
+                   "results": str(dest)}
+
+
+def run_worker(queue, examples_dir, shared_dir, scratch_dir=None, threads=None, name=None,
+               poll=5.0, drain=False, max_jobs=None):
+    """
+    Process jobs from `queue` until it is empty (drain) or the worker gets
+    SIGTERM/SIGINT, which ends it after the current job.
+    """
+    name = name or os.environ.get(WORKER_ENV) or socket.gethostname()
+    threads = threads or os.cpu_count() or 1
+    scratch_dir = Path(scratch_dir or Path(shared_dir) / ".scratch" / name)
+    stop = []
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop.append(True))
+
+    recovered = queue.recover(name)
+    if recovered:
+        print(f"{name}: re-queued {len(recovered)} interrupted jobs")
+    print(f"{name}: waiting for jobs, {threads} threads, results to {shared_dir}")
+    count = 0
+    while not stop and (max_jobs is None or count < max_jobs):
+        job = queue.claim(name)
+        if job is None:
+            if drain:
+                break
+            time.sleep(poll)
+            continue
+        print(f"{name}: running {job['id']} ({job['script']})")
+        try:
+            state, info = run_job(job, examples_dir, shared_dir, scratch_dir, threads)
+        except Exception as e:
+            state, info = "failed", {"error": f"{type(e).__name__}: {e}"}
+        queue.finish(job, state, **info)
+        print(f"{name}: {job['id']} {state} after {info.get('wall_time', 0):.1f} s")
+        count += 1
+    return count
+
+
+def _parse_env(items):
+    env = {}
+    for item in items:
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise SystemExit(f"--env expects KEY=VALUE, got {item!r}")
+        env[key] = value
+    return env
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="simtools queue", description="Job queue for headless example runs")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--queue", default=None, help=f"spool directory or redis:// URL (default: {QUEUE_ENV})")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sm = sub.add_parser("submit", parents=[common], help="queue an example script")
+    sm.add_argument("script", help="script path relative to the examples directory")
+    sm.add_argument("args", nargs=argparse.REMAINDER, help="arguments passed to the script")
+    sm.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="environment of the job")
+    sm.add_argument("--threads", type=int, default=None, help="engine threads (default: the worker's)")
+    sm.add_argument("--id", default=None, help="job id (default: time stamp and random suffix)")
+    sm.add_argument("--exclude", action="append", default=None, metavar="PATTERN",
+                    help=f"files not copied to the worker's scratch directory (default: {' '.join(SCRATCH_EXCLUDE)})")
+    wk = sub.add_parser("worker", parents=[common], help="process queued jobs")
+    wk.add_argument("--shared", default=os.environ.get(SHARED_ENV), help=f"result directory (default: {SHARED_ENV})")
+    wk.add_argument("--scratch", default=None, help="local working directory (default: below --shared)")
+    wk.add_argument("--examples", default=Path(__file__).resolve().parent.parent, help="examples directory")
+    wk.add_argument("--threads", type=int, default=None, help="engine threads per job (default: all cores)")
+    wk.add_argument("--name", default=None, help=f"worker name (default: {WORKER_ENV} or the host name)")
+    wk.add_argument("--poll", type=float, default=5.0, help="seconds between polls of an empty queue")
+    wk.add_argument("--drain", action="store_true", help="exit when the queue is empty")
+    st = sub.add_parser("status", parents=[common], help="list jobs")
+    st.add_argument("ids", nargs="*", help="job ids (default: all)")
+    args = parser.parse_args(argv)
+    queue = open_queue(args.queue)
+
+    if args.cmd == "submit":
+        job = new_job(args.script, args.args, _parse_env(args.env), args.threads, args.id, args.exclude)
+        print(queue.submit(job))
+        return 0
+
+    if args.cmd == "worker":
+        if not args.shared:
+            parser.error(f"no result directory (--shared or {SHARED_ENV})")
+        run_worker(queue, args.examples, args.shared, args.scratch, args.threads, args.name,
+                   args.poll, args.drain)
+        return 0
+
+    jobs = [queue.status(i) for i in args.ids] if args.ids else queue.all_status()
+    for s in jobs:
+        wall = f"{s['wall_time']:.1f} s" if s.get("wall_time") is not None else ""
+        print(f"{s.get('id', '?'):<26} {s.get('state', 'unknown'):<8} {s.get('worker') or '':<20} "
+              f"{s.get('returncode', ''):>4} {wall:>10}  {s.get('script', '')}")
+    return 0 if all(s.get("state") != "failed" for s in jobs) else 1
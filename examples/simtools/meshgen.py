@@ -0,0 +1,309 @@
+"""
+ Automatic graded mesh with a cell budget.
+
+ The mesh is derived from boxes instead of hand-placed lines:
+
+   metal        edges are meshed with the thirds rule (one line h/3 inside,
+                one 2h/3 outside the metal), zero-thickness sides get one line
+   dielectric   faces are mesh lines, inside the resolution is
+                lambda_min / (cells_per_wavelength * sqrt(epsilon)) and at
+                least `dielectric_cells` cells across every dimension
+   fixed        faces are mesh lines (ports, lumped elements)
+
+ The gaps between these lines are filled with cells growing by at most
+ `ratio` up to the local resolution. If the result exceeds the cell budget,
+ all resolutions are coarsened together (down to min_cells_per_wavelength)
+ until it fits.
+
+ MeshGenerator.from_csx() collects the boxes from the primitives of a CSX
+ model and apply() replaces the lines of its grid, reporting the cells
+ saved against the mesh that was there before:
+
+   gen = MeshGenerator.from_csx(CSX, f_max=f0+fc, unit=1e-3)
+   print(gen.apply(CSX.GetGrid(), budget=200e3))
+
+ In cylindrical coordinates (coord_system=1) the angular resolution is the
+ length resolution divided by the largest radius of the domain.
+
+ The patch antenna examples switch to the generated mesh with
+ OPENEMS_AUTO_MESH=1.
+"""
+
+import os
+import warnings
+from math import ceil, sqrt
+
+import numpy as np
+
+from .model_info import cell_count
+
+C0 = 299792458.0
+
+AUTO_MESH_ENV = "OPENEMS_AUTO_MESH"
+
+
+def auto_mesh(default=False):
+    """ Whether an example uses the generated mesh: OPENEMS_AUTO_MESH=1/0, else `default` """
+    value = os.environ.get(AUTO_MESH_ENV)
+    if value is None or value == "":
+        return default
+    return value.lower() not in ("0", "false", "no", "off")
+
+
+def dedup_lines(lines, tol):
+    """ Sorted lines without those closer than `tol` to their predecessor """
+    lines = np.sort(np.asarray(lines, dtype=float).ravel())
+    if len(lines) < 2:
+        return lines
+    return lines[np.concatenate([[True], np.diff(lines) > tol])]
+
+
+def periodic_mesh_hint(cell_hint, offsets, axis=0, tol=0.0):
+    """
+    Mesh hint [x, y, z] of a periodic structure from the hint of one cell:
+    the lines along `axis` are repeated at every offset, all directions are
+    sorted and merged within `tol`. Returns (hint, line counts before and
+    after merging).
+    """
+    offsets = np.asarray(offsets, dtype=float)
+    hint, raw = [], 0
+    for n, lines in enumerate(cell_hint):
+        lines = np.asarray(lines if lines is not None else [], dtype=float).ravel()
+        if n == axis:
+            lines = (offsets[:, None] + lines[None, :]).ravel()
+        else:
+            lines = np.tile(lines, len(offsets))
+        raw += len(lines)
+        hint.append(dedup_lines(lines, tol))
+    return hint, {"cells": len(offsets), "lines": raw, "unique": sum(len(l) for l in hint)}
+
+
+def _fill_gap(a, b, dl, dr, res, ratio, samples=512):
+    """
+    Lines strictly between a and b. The target cell size grows linearly
+    (i.e. geometrically per cell, by `ratio`) from dl at a and dr at b and is
+    capped at res; the lines equidistribute the integral of 1/size.
+    """
+    x = np.linspace(a, b, samples)
+    h = np.minimum.reduce([np.full_like(x, res), min(dl, res) + (ratio - 1)*(x - a),
+                           min(dr, res) + (ratio - 1)*(b - x)])
+    cum = np.concatenate([[0.0], np.cumsum(np.diff(x) * (1/h[1:] + 1/h[:-1]) / 2)])
+    n = ceil(cum[-1] - 1e-6)
+    if n <= 1:
+        return []
+    return list(np.interp(np.arange(1, n) * cum[-1] / n, cum, x))
+
+
+def smooth_lines(fixed, res_at, ratio=1.4):
+    """
+    Fill the gaps between the sorted `fixed` lines; `res_at(a, b)` is the
+    maximum cell size allowed within [a, b].
+    """
+    fixed = np.asarray(fixed, dtype=float)
+    out = [fixed[0]]
+    for i in range(len(fixed) - 1):
+        a, b = fixed[i], fixed[i+1]
+        res = res_at(a, b)
+        dl = out[-1] - out[-2] if len(out) > 1 else res
+        dr = min(fixed[i+2] - fixed[i+1], res_at(fixed[i+1], fixed[i+2])) if i + 2 < len(fixed) else res
+        out.extend(_fill_gap(a, b, dl, dr, res, ratio))
+        out.append(b)
+    return np.array(out)
+
+
+class MeshReport:
+    """ Result of a mesh generation, optionally compared to a reference mesh """
+
+    def __init__(self, lines, scale, cells_per_wavelength, budget, reference=None):
+        self.lines = lines
+        self.cells = cell_count(lines)
+        self.scale = scale
+        self.cells_per_wavelength = cells_per_wavelength / scale
+        self.budget = budget
+        self.reference_cells = cell_count(reference) if reference is not None else None
+
+    @property
+    def cells_saved(self):
+        if self.reference_cells is None:
+            return None
+        return self.reference_cells - self.cells
+
+    def as_dict(self):
+        return {"mesh_lines": [len(l) for l in self.lines], "cells": self.cells, "budget": self.budget,
+                "cells_per_wavelength": self.cells_per_wavelength, "reference_cells": self.reference_cells,
+                "cells_saved": self.cells_saved}
+
+    def __str__(self):
+        n = " x ".join(str(len(l) - 1) for l in self.lines)
+        s = f"auto mesh {n} = {self.cells/1e3:.1f} kCells at {self.cells_per_wavelength:.1f} cells/lambda"
+        if self.budget:
+            s += f" (budget {self.budget/1e3:.1f} kCells)"
+        if self.reference_cells:
+            s += (f", {self.cells_saved/1e3:+.1f} kCells saved vs. "
+                  f"{self.reference_cells/1e3:.1f} kCells ({self.cells_saved/self.reference_cells:.0%})")
+        return s
+
+
+class MeshGenerator:
+    def __init__(self, f_max, unit=1e-3, cells_per_wavelength=20, ratio=1.4, metal_edge_res=None,
+                 min_cells_per_wavelength=10, dielectric_cells=4, coord_system=0):
+        self.f_max = f_max
+        self.unit = unit
+        self.cells_per_wavelength = cells_per_wavelength
+        self.min_cells_per_wavelength = min_cells_per_wavelength
+        self.ratio = ratio
+        self.metal_edge_res = metal_edge_res
+        self.dielectric_cells = dielectric_cells
+        self.coord_system = coord_system
+        self.metals = []
+        self.dielectrics = []
+        self.fixed = []
+        self.domain = None
+
+    @staticmethod
+    def _box(start, stop):
+        start, stop = np.asarray(start, dtype=float), np.asarray(stop, dtype=float)
+        return np.minimum(start, stop), np.maximum(start, stop)
+
+    def add_metal(self, start, stop, thirds=True):
+        self.metals.append((*self._box(start, stop), thirds))
+
+    def add_dielectric(self, start, stop, epsilon):
+        self.dielectrics.append((*self._box(start, stop), float(epsilon)))
+
+    def add_fixed(self, start, stop):
+        self.fixed.append(self._box(start, stop))
+
+    def set_domain(self, start, stop):
+        self.domain = self._box(start, stop)
+
+    @classmethod
+    def from_csx(cls, CSX, f_max, domain=None, **kw):
+        """
+        Generator for the primitives of a CSX model: metals, materials and
+        lumped elements/excitations (ports). The domain defaults to the extent
+        of the lines already in the grid.
+        """
+        gen = cls(f_max, **kw)
+        for prop in CSX.GetAllProperties():
+            kind = prop.GetTypeString().lower()
+            boxes = [prim.GetBoundBox() for prim in prop.GetPrimitives()]
+            for start, stop in boxes:
+                if "metal" in kind:
+                    gen.add_metal(start, stop)
+                elif "material" in kind:
+                    eps = np.max(np.atleast_1d(prop.GetMaterialProperty("epsilon")))
+                    gen.add_dielectric(start, stop, eps)
+                elif "lumped" in kind or "excitation" in kind:
+                    gen.add_fixed(start, stop)
+        if domain is None:
+            grid = CSX.GetGrid()
+            lines = [np.asarray(grid.GetLines(n)) for n in range(3)]
+            if all(len(l) for l in lines):
+                domain = ([l.min() for l in lines], [l.max() for l in lines])
+        if domain is not None:
+            gen.set_domain(*domain)
+        return gen
+
+    def _extent(self):
+        if self.domain is not None:
+            return self.domain
+        boxes = [b[:2] for b in self.metals + self.dielectrics] + self.fixed
+        if not boxes:
+            raise ValueError("no primitives and no domain to mesh")
+        return np.min([b[0] for b in boxes], axis=0), np.max([b[1] for b in boxes], axis=0)
+
+    def _axis_scale(self, n):
+        """ Length per coordinate unit along axis n (radius for the angle of a cylindrical mesh) """
+        if self.coord_system == 1 and n == 1:
+            return max(abs(self._extent()[1][0]), abs(self._extent()[0][0]))
+        return 1.0
+
+    def resolution(self, scale=1.0):
+        """ Air resolution in drawing units """
+        return C0 / self.f_max / self.unit / self.cells_per_wavelength * scale
+
+    def axis_lines(self, n, scale=1.0):
+        """ Mesh lines along axis n with all resolutions multiplied by `scale` """
+        k = self._axis_scale(n)
+        air = self.resolution(scale) / k
+        edge = (self.metal_edge_res * scale if self.metal_edge_res else self.resolution(scale) / 2) / k
+        lo, hi = self._extent()
+        lo, hi = lo[n], hi[n]
+
+        fixed = [lo, hi]
+        regions = []
+        for start, stop, eps in self.dielectrics:
+            fixed += [start[n], stop[n]]
+            if stop[n] > start[n]:
+                res = min(air / sqrt(eps), (stop[n] - start[n]) / self.dielectric_cells)
+                regions.append((start[n], stop[n], res))
+        for start, stop in self.fixed:
+            fixed += [start[n], stop[n]]
+        edges, thirds_lines = [], []
+        for start, stop, thirds in self.metals:
+            if stop[n] == start[n] or not thirds:
+                fixed += [start[n], stop[n]]
+            else:
+                # thirds rule, the metal is between start and stop
+                edges += [start[n], stop[n]]
+                thirds_lines += [start[n] - 2*edge/3, stop[n] + 2*edge/3]
+                if stop[n] - start[n] > edge:
+                    thirds_lines += [start[n] + edge/3, stop[n] - edge/3]
+                else:
+                    # the inner thirds lines would cross, one line in the middle instead
+                    thirds_lines.append((start[n] + stop[n]) / 2)
+        # no other lines right at a metal edge
+        if edges:
+            fixed = [x for x in fixed if np.min(np.abs(np.subtract(edges, x))) >= edge]
+
+        # the domain bounds always stay, lines closer to them are dropped
+        tol = edge / 10
+        inner = [x for x in fixed + thirds_lines if lo + tol < x < hi - tol]
+        fixed = dedup_lines([lo, hi] + inner, tol=tol)
+
+        def res_at(a, b):
+            res = [r for s, e, r in regions if s < b and e > a]
+            return min(res + [air])
+
+        return smooth_lines(fixed, res_at, self.ratio)
+
+    def lines(self, scale=1.0):
+        return [self.axis_lines(n, scale) for n in range(3)]
+
+    def generate(self, budget=None, reference=None):
+        """
+        Lines [x, y, z] and MeshReport for the finest mesh within `budget`
+        cells (if given), compared to the `reference` lines (if given).
+        """
+        max_scale = self.cells_per_wavelength / self.min_cells_per_wavelength
+        lines, scale = self.lines(), 1.0
+        if budget and cell_count(lines) > budget:
+            coarse = self.lines(max_scale)
+            if cell_count(coarse) > budget:
+                warnings.warn(f"mesh needs {cell_count(coarse)} cells at {self.min_cells_per_wavelength} "
+                              f"cells/lambda, more than the budget of {budget:.0f}", RuntimeWarning, stacklevel=2)
+                lines, scale = coarse, max_scale
+            else:
+                lo, hi = 1.0, max_scale
+                lines, scale = coarse, max_scale
+                for _ in range(20):
+                    mid = (lo + hi) / 2
+                    trial = self.lines(mid)
+                    if cell_count(trial) <= budget:
+                        lines, scale, hi = trial, mid, mid
+                    else:
+                        lo = mid
+                    if hi - lo < 1e-3:
+                        break
+        return lines, MeshReport(lines, scale, self.cells_per_wavelength, budget, reference)
+
+    def apply(self, grid, budget=None):
+        """ Replace the lines of a CSX grid, reporting the saving against its previous lines """
+        reference = [np.asarray(grid.GetLines(n)) for n in range(3)]
+        if not all(len(l) > 2 for l in reference):
+            reference = None
+        lines, report = self.generate(budget, reference)
+        for n in range(3):
+            grid.SetLines(n, lines[n])
+        return report
@@ -0,0 +1,59 @@
+"""
+ Read mesh and FDTD settings back from written openEMS/CSX XML files.
+"""
+
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+
+def _root(xml):
+    if isinstance(xml, (bytes, bytearray)):
+        return ET.fromstring(xml)
+    return ET.parse(str(xml)).getroot()
+
+
+def read_grid(xml):
+    """
+    Mesh lines of the RectilinearGrid in a CSX/openEMS XML file (or bytes).
+
+    Returns (lines, delta_unit, coord_system) with `lines` a list of three
+    sorted arrays in drawing units.
+    """
+    grid = _root(xml).find(".//RectilinearGrid")
+    if grid is None:
+        raise ValueError("no RectilinearGrid found")
+    lines = []
+    for tag in ("XLines", "YLines", "ZLines"):
+        el = grid.find(tag)
+        text = el.text if el is not None and el.text else ""
+        lines.append(np.unique(np.array([float(v) for v in text.replace(",", " ").split()])))
+    return lines, float(grid.get("DeltaUnit", 1)), int(grid.get("CoordSystem", 0))
+
+
+def cell_count(lines):
+    """ Number of FDTD cells of a mesh given by its lines """
+    n = 1
+    for l in lines:
+        n *= max(len(l) - 1, 1)
+    return n
+
+
+def read_fdtd(xml):
+    """ Attributes of the <FDTD> element (as strings) of an openEMS XML file, or {} """
+    el = _root(xml).find(".//FDTD")
+    return dict(el.attrib) if el is not None else {}
+
+
+def read_excitation(xml):
+    """ Attributes of the <Excitation> element of the FDTD setup, or {} """
+    el = _root(xml).find(".//FDTD/Excitation")
+    return dict(el.attrib) if el is not None else {}
+
+
+def max_timesteps(xml):
+    """ NumberOfTimesteps configured for the engine, or None """
+    try:
+        return int(float(read_fdtd(xml)["NumberOfTimesteps"]))
+    except (KeyError, ValueError):
+        return None
@@ -0,0 +1,184 @@
+"""
+ Multi-rank engine runs with the MPI build of openEMS.
+
+ openEMS compiled with WITH_MPI=TRUE (builder/Dockerfile-MPI) splits the mesh
+ into boxes, one per MPI rank, as configured by an <MPI> element inside
+ <FDTD> of the model XML:
+
+   <FDTD ...><MPI SplitN_X="2" SplitN_Y="2"/></FDTD>
+
+ and is started with mpirun and the MPI engine:
+
+   mpirun -n 4 openEMS model.xml --engine=MPI
+
+ split() chooses the number of boxes per direction for N ranks so that the
+ interfaces exchanged every timestep are smallest, set_split() writes it to
+ the XML and run() launches the engine in the simulation directory. On a
+ single box the ranks are local processes, the same image scales to several
+ nodes with an mpirun hostfile (--mpirun-args "--hostfile hosts").
+
+   python3 -m simtools mpi run RCS_Sphere/scaling/RCS_Sphere_Scaling.xml -n 4
+   python3 -m simtools mpi scaling model.xml --ranks 1 2 4 8 --out scaling.json
+"""
+
+import os
+import json
+import time
+import shlex
+import shutil
+import argparse
+import itertools
+import subprocess
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from . import model_info
+
+MPIRUN_ENV = "OPENEMS_MPIRUN"
+OPENEMS_ENV = "OPENEMS_BIN"
+
+# fewest mesh lines per box and direction
+MIN_LINES = 8
+
+
+def split(n_ranks, lines):
+    """
+    Boxes per direction (nx, ny, nz) with nx*ny*nz = n_ranks and the smallest
+    total interface area in cells; None if the mesh is too small.
+    """
+    counts = [len(l) for l in lines]
+    best = None
+    for nx, ny in itertools.product(range(1, n_ranks + 1), repeat=2):
+        if n_ranks % (nx*ny):
+            continue
+        parts = (nx, ny, n_ranks // (nx*ny))
+        if any(p > 1 and c // p < MIN_LINES for p, c in zip(parts, counts)):
+            continue
+        area = sum((p - 1) * counts[(n+1) % 3] * counts[(n+2) % 3] for n, p in enumerate(parts))
+        if best is None or area < best[0]:
+            best = (area, parts)
+    return best and best[1]
+
+
+def set_split(xml, parts, out=None):
+    """ Write the MPI split (boxes per direction) into the FDTD settings of an openEMS XML file """
+    tree = ET.parse(xml)
+    fdtd = tree.getroot().find(".//FDTD")
+    if fdtd is None:
+        raise ValueError(f"{xml}: no FDTD settings")
+    for el in fdtd.findall("MPI"):
+        fdtd.remove(el)
+    mpi = ET.SubElement(fdtd, "MPI")
+    for axis, p in zip("XYZ", parts):
+        if p > 1:
+            mpi.set(f"SplitN_{axis}", str(p))
+    tree.write(out or xml)
+
+
+def command(xml, n_ranks, mpirun=None, mpirun_args=(), engine_args=()):
+    mpirun = shlex.split(mpirun or os.environ.get(MPIRUN_ENV, "mpirun"))
+    openems = os.environ.get(OPENEMS_ENV, "openEMS")
+    return (mpirun + ["-n", str(n_ranks)] + list(mpirun_args)
+            + [openems, str(xml), "--engine=MPI"] + list(engine_args))
+
+
+def run(xml, n_ranks, sim_path=None, parts=None, mpirun=None, mpirun_args=(), engine_args=(), log=None):
+    """
+    Run the model `xml` on `n_ranks` MPI ranks in `sim_path` (default: the
+    directory of the XML file). Returns the wall time in seconds.
+    """
+    xml = Path(xml).resolve()
+    sim_path = Path(sim_path or xml.parent)
+    sim_path.mkdir(parents=True, exist_ok=True)
+    if parts is None:
+        lines, _, _ = model_info.read_grid(xml)
+        parts = split(n_ranks, lines)
+        if parts is None:
+            raise ValueError(f"mesh {' x '.join(str(len(l)) for l in lines)} is too small for {n_ranks} ranks")
+    elif parts[0]*parts[1]*parts[2] != n_ranks:
+        raise ValueError(f"split {parts} does not match {n_ranks} ranks")
+    model = sim_path / xml.name
+    set_split(xml, parts, model)
+
+    cmd = command(model.name, n_ranks, mpirun, mpirun_args, engine_args)
+    print(f"{' '.join(cmd)}   (split {' x '.join(map(str, parts))})")
+    start = time.perf_counter()
+    if log is None:
+        subprocess.run(cmd, cwd=sim_path, check=True)
+    else:
+        with open(log, "w") as fh:
+            subprocess.run(cmd, cwd=sim_path, check=True, stdout=fh, stderr=subprocess.STDOUT)
+    return time.perf_counter() - start
+
+
+def scaling(xml, ranks, work_dir=None, mpirun=None, mpirun_args=()):
+    """
+    Run the model with every rank count in `ranks` and return the wall times
+    with speedup and parallel efficiency relative to the smallest count.
+    """
+    xml = Path(xml).resolve()
+    work_dir = Path(work_dir or xml.parent / "scaling")
+    lines, _, _ = model_info.read_grid(xml)
+    results = []
+    for n in sorted(ranks):
+        sim_path = work_dir / f"ranks_{n}"
+        if sim_path.exists():
+            shutil.rmtree(sim_path)
+        parts = split(n, lines)
+        if parts is None:
+            print(f"skipping {n} ranks, the mesh is too small")
+            continue
+        wall = run(xml, n, sim_path, parts, mpirun, mpirun_args, log=work_dir / f"ranks_{n}.log")
+        results.append({"ranks": n, "split": list(parts), "wall_time": wall})
+    if not results:
+        raise ValueError("the mesh is too small for all rank counts")
+    base = results[0]
+    for r in results:
+        r["speedup"] = base["wall_time"] / r["wall_time"]
+        r["efficiency"] = r["speedup"] * base["ranks"] / r["ranks"]
+    return {"model": str(xml), "cells": model_info.cell_count(lines),
+            "max_timesteps": model_info.max_timesteps(xml), "results": results}
+
+
+def format_scaling(res):
+    lines = [f"{res['model']}: {res['cells']/1e6:.2f} MCells, {res['max_timesteps']} timesteps",
+             f"{'ranks':>5} {'split':>9} {'wall (s)':>9} {'speedup':>8} {'efficiency':>10}"]
+    for r in res["results"]:
+        lines.append(f"{r['ranks']:>5} {'x'.join(map(str, r['split'])):>9} {r['wall_time']:>9.1f} "
+                     f"{r['speedup']:>8.2f} {r['efficiency']:>10.0%}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="simtools mpi", description="Run openEMS models on MPI ranks")
+    parser.add_argument("--mpirun", default=None, help=f"mpirun command (default: {MPIRUN_ENV} or mpirun)")
+    parser.add_argument("--mpirun-args", default="", help="extra mpirun arguments, e.g. '--hostfile hosts'")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    rn = sub.add_parser("run", help="run a model XML on N ranks")
+    rn.add_argument("xml", type=Path)
+    rn.add_argument("-n", "--ranks", type=int, default=os.cpu_count())
+    rn.add_argument("--split", default=None, help="boxes per direction, e.g. 2,2,1 (default: automatic)")
+    rn.add_argument("--sim-path", type=Path, default=None, help="simulation directory (default: that of the XML)")
+    sc = sub.add_parser("scaling", help="measure the speedup over the number of ranks")
+    sc.add_argument("xml", type=Path)
+    sc.add_argument("--ranks", type=int, nargs="+", default=[1, 2, 4])
+    sc.add_argument("--work-dir", type=Path, default=None)
+    sc.add_argument("--out", type=Path, default=None, help="write the results as JSON")
+    sc.add_argument("--min-efficiency", type=float, default=0.0,
+                    help="exit non-zero if the efficiency at the most ranks is lower")
+    args = parser.parse_args(argv)
+    mpirun_args = shlex.split(args.mpirun_args)
+
+    if args.cmd == "run":
+        parts = tuple(int(p) for p in args.split.split(",")) if args.split else None
+        wall = run(args.xml, args.ranks, args.sim_path, parts, args.mpirun, mpirun_args)
+        print(f"finished in {wall:.1f} s")
+        return 0
+
+    res = scaling(args.xml, args.ranks, args.work_dir, args.mpirun, mpirun_args)
+    print(format_scaling(res))
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(res, fh, indent=1)
+    last = res["results"][-1]
+    return 0 if len(res["results"]) < 2 or last["efficiency"] >= args.min_efficiency else 1
@@ -0,0 +1,194 @@
+"""
+ Network parameters on stacked (nfreq, N, N) arrays.
+
+ Network.from_ports() collects the port results of one excitation after
+ CalcPort (S-matrix column, input impedance and power of the driven port)
+ in one pass, Network.from_excitations() merges the runs of several driven
+ ports. Z, Y and, for two-ports, ABCD follow from the S-matrix, which needs
+ every port excited (or a two-port completed as symmetric):
+
+   for p in ports:
+       p.CalcPort(sim_path, f, ref_impedance=50)
+   net = Network.from_ports(ports)
+   s11, s21 = net.S[:, 0, 0], net.S[:, 1, 0]
+
+   net = Network.from_excitations({1: ports_1, 2: ports_2})
+   Z = net.Z
+
+ The reference impedance Z0 may be a scalar or one value per frequency
+ (e.g. the Z_ref of an MSL port). ABCD matrices of cascaded sections
+ multiply, which is used to de-embed a periodic cell from two runs that
+ differ by one cell:
+
+   T_N   = F_in @ C^N     @ F_out
+   T_N+1 = F_in @ C^(N+1) @ F_out   ->   T_N+1 @ inv(T_N) = F_in @ C @ inv(F_in)
+
+ The result is similar to the cell matrix C, so its trace (the Bloch phase)
+ is exact whatever the feeds are; its elements equal those of C as far as
+ the port de-embedding leaves F_in close to the identity.
+"""
+
+import numpy as np
+
+
+def two_port(s11, s21, s12=None, s22=None):
+    """ Stack S-parameter traces into (nfreq, 2, 2); a missing s12/s22 assumes a reciprocal, symmetric network """
+    s11, s21 = np.asarray(s11), np.asarray(s21)
+    s12 = s21 if s12 is None else np.asarray(s12)
+    s22 = s11 if s22 is None else np.asarray(s22)
+    return np.stack([np.stack([s11, s12], -1), np.stack([s21, s22], -1)], -2)
+
+
+def s2abcd(S, Z0=50):
+    """ ABCD matrices of two-port S-parameters """
+    S = np.asarray(S, dtype=complex)
+    Z0 = np.asarray(Z0)
+    s11, s12, s21, s22 = S[..., 0, 0], S[..., 0, 1], S[..., 1, 0], S[..., 1, 1]
+    d = 2*s21
+    T = np.empty_like(S)
+    T[..., 0, 0] = ((1+s11)*(1-s22) + s12*s21) / d
+    T[..., 0, 1] = Z0 * ((1+s11)*(1+s22) - s12*s21) / d
+    T[..., 1, 0] = ((1-s11)*(1-s22) - s12*s21) / d / Z0
+    T[..., 1, 1] = ((1-s11)*(1+s22) + s12*s21) / d
+    return T
+
+
+def abcd2s(T, Z0=50):
+    """ S-parameters of two-port ABCD matrices """
+    T = np.asarray(T, dtype=complex)
+    Z0 = np.asarray(Z0)
+    A, B, C, D = T[..., 0, 0], T[..., 0, 1], T[..., 1, 0], T[..., 1, 1]
+    den = A + B/Z0 + C*Z0 + D
+    S = np.empty_like(T)
+    S[..., 0, 0] = (A + B/Z0 - C*Z0 - D) / den
+    S[..., 0, 1] = 2*(A*D - B*C) / den
+    S[..., 1, 0] = 2 / den
+    S[..., 1, 1] = (-A + B/Z0 - C*Z0 + D) / den
+    return S
+
+
+def deembed_cell(T_short, T_long):
+    """ ABCD matrix of one cell from runs with N and N+1 cells (see module doc) """
+    return np.asarray(T_long) @ np.linalg.inv(T_short)
+
+
+def bloch_phase(T):
+    """ Bloch phase gamma*p = alpha*p + j*beta*p of a cell from cosh(gamma*p) = (A+D)/2, alpha, beta >= 0 """
+    gp = np.arccosh((T[..., 0, 0] + T[..., 1, 1]) / 2 + 0j)
+    return np.abs(gp.real) + 1j*np.abs(gp.imag)
+
+
+def db(x):
+    """ 20*log10(|x|) """
+    return 20*np.log10(np.abs(x))
+
+
+def _ref(z_ref, nf, N):
+    """ Reference impedances as (nfreq, N) from a scalar, (nfreq,) or (nfreq or 1, N) """
+    z = np.asarray(z_ref, dtype=complex)
+    if z.ndim == 1:
+        z = z[:, None]
+    return np.broadcast_to(z, (nf, N))
+
+
+def s2z(S, z_ref=50):
+    """ Impedance matrices of S-parameters with real reference impedances """
+    S = np.asarray(S, dtype=complex)
+    nf, N = S.shape[0], S.shape[-1]
+    r = np.sqrt(_ref(z_ref, nf, N))
+    I = np.eye(N)
+    return r[:, :, None] * np.linalg.solve(I - S, I + S) * r[:, None, :]
+
+
+def s2y(S, z_ref=50):
+    """ Admittance matrices of S-parameters with real reference impedances """
+    S = np.asarray(S, dtype=complex)
+    nf, N = S.shape[0], S.shape[-1]
+    r = 1/np.sqrt(_ref(z_ref, nf, N))
+    I = np.eye(N)
+    return r[:, :, None] * np.linalg.solve(I + S, I - S) * r[:, None, :]
+
+
+def z2s(Z, z_ref=50):
+    """ S-parameters of impedance matrices with real reference impedances """
+    Z = np.asarray(Z, dtype=complex)
+    nf, N = Z.shape[0], Z.shape[-1]
+    r = 1/np.sqrt(_ref(z_ref, nf, N))
+    Zn = r[:, :, None] * Z * r[:, None, :]
+    I = np.eye(N)
+    return np.linalg.solve((Zn + I).swapaxes(-1, -2), (Zn - I).swapaxes(-1, -2)).swapaxes(-1, -2)
+
+
+class Network:
+    """ S-matrices (nfreq, N, N) with port quantities, columns of ports not excited are NaN """
+
+    def __init__(self, S, z_ref=50, Z_in=None, P_in=None):
+        self.S = np.asarray(S, dtype=complex)
+        self.z_ref = z_ref
+        self.Z_in = Z_in    # uf_tot/if_tot of every driven port (nfreq, N)
+        self.P_in = P_in    # real power into every driven port (nfreq, N)
+
+    @classmethod
+    def from_ports(cls, ports, excite=1, symmetric=False):
+        """
+        Network of the ports of one run after CalcPort, `excite` is the
+        number (1-based) of the driven port. With `symmetric` a two-port is
+        completed as reciprocal and symmetric (S12 = S21, S22 = S11).
+        """
+        return cls.from_excitations({excite: ports}, symmetric)
+
+    @classmethod
+    def from_excitations(cls, excitations, symmetric=False):
+        """
+        Network of several runs after CalcPort, `excitations` maps the number
+        (1-based) of the driven port to the list of all ports of that run.
+        Every run fills the S-matrix column and the input impedance and
+        power of its driven port. With `symmetric` a two-port with one
+        excitation is completed as reciprocal and symmetric.
+        """
+        first = next(iter(excitations.values()))
+        nf, N = len(first[0].uf_inc), len(first)
+        S = np.full((nf, N, N), np.nan, dtype=complex)
+        Z_in = np.full((nf, N), np.nan, dtype=complex)
+        P_in = np.full((nf, N), np.nan)
+        for excite, ports in excitations.items():
+            j = excite - 1
+            u_inc = ports[j].uf_inc
+            for i, p in enumerate(ports):
+                S[:, i, j] = p.uf_ref / u_inc
+            u_tot, i_tot = ports[j].uf_tot, ports[j].if_tot
+            Z_in[:, j] = u_tot / i_tot
+            P_in[:, j] = 0.5*np.real(u_tot*np.conj(i_tot))
+        if symmetric:
+            if N != 2 or len(excitations) != 1:
+                raise ValueError("only two-ports with one excitation can be completed as symmetric")
+            j = next(iter(excitations)) - 1
+            S = two_port(S[:, j, j], S[:, 1-j, j])
+        z_ref = np.stack([np.broadcast_to(p.Z_ref, (nf,)) for p in first], -1)
+        return cls(S, z_ref, Z_in=Z_in, P_in=P_in)
+
+    def _complete(self):
+        missing = [j + 1 for j in range(self.S.shape[-1]) if np.isnan(self.S[:, :, j]).any()]
+        if missing:
+            raise ValueError(f"the S-matrix has no column for port(s) {missing}: excite every port "
+                             "(Network.from_excitations) or complete a two-port as symmetric")
+        return self.S
+
+    @property
+    def Z(self):
+        return s2z(self._complete(), self.z_ref)
+
+    @property
+    def Y(self):
+        return s2y(self._complete(), self.z_ref)
+
+    @property
+    def ABCD(self):
+        if self.S.shape[-1] != 2:
+            raise ValueError("ABCD parameters are defined for two-ports only")
+        z = _ref(self.z_ref, len(self.S), 2)
+        return s2abcd(self._complete(), z[:, 0])
+
+    def db(self, i, j):
+        """ |S_ij| in dB, 1-based port numbers """
+        return db(self.S[:, i-1, j-1])
@@ -0,0 +1,78 @@
+"""
+ N-port characterization: one independent openEMS model per excited port.
+
+ Every excited port gets its own openEMS instance in which only that port
+ is driven. The models are built once by the calling script; the runs for
+ all excited ports are executed in forked worker processes which inherit
+ the built models, each with its share of the engine threads, and the
+ parent post-processes the ports of the same models afterwards.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .network import Network
+from .scheduler import fork_context, num_threads, thread_budget
+
+
+# models of the running run_excitations(), inherited by the forked workers
+_models = {}
+
+
+def _init_worker(models):
+    _models.update(models)
+
+
+def _run_excitation(exciteport, threads, run_kw):
+    FDTD, sim_path = _models[exciteport]
+    FDTD.Run(str(sim_path), numThreads=threads, **run_kw)
+    return exciteport
+
+
+def run_excitations(models, total_threads=None, max_parallel=None, **run_kw):
+    """
+    Run the built models `{exciteport: (FDTD, sim_path)}`, in parallel worker
+    processes unless max_parallel is 1.
+
+    The engine threads (default: OPENEMS_NUM_THREADS or all cores) are split
+    evenly across the workers.
+    """
+    models = dict(models)
+    total_threads = total_threads or num_threads() or os.cpu_count() or 1
+    workers, threads = thread_budget(total_threads, list(models), max_parallel)
+    print(f"running {len(models)} port excitations on {workers} workers with {threads} threads each")
+
+    if workers == 1:
+        _models.update(models)
+        try:
+            for p in models:
+                _run_excitation(p, threads, run_kw)
+        finally:
+            _models.clear()
+        return
+
+    # the models are handed to the workers at fork time, they are not picklable
+    with ProcessPoolExecutor(max_workers=workers, mp_context=fork_context(),
+                             initializer=_init_worker, initargs=(models,)) as pool:
+        futures = [pool.submit(_run_excitation, p, threads, run_kw) for p in models]
+        for fut in futures:
+            print(f"excitation of port {fut.result()} finished")
+
+
+def calc_network(excitations, freq, ref_impedance=50, **calc_kw):
+    """
+    Network of a set of single-port excitations (see Network.from_excitations).
+
+    `excitations` maps the excited port number (1-based) to the `(ports,
+    sim_path)` of that run, where `ports` lists all N ports of the model.
+    Columns of ports that were not excited are NaN.
+    """
+    for ports, sim_path in excitations.values():
+        for p in ports:
+            p.CalcPort(str(sim_path), freq, ref_impedance=ref_impedance, **calc_kw)
+    return Network.from_excitations({n: ports for n, (ports, _) in excitations.items()})
+
+
+def s_matrix(excitations, freq, ref_impedance=50, **calc_kw):
+    """ S-matrix (nfreq, N, N) of a set of single-port excitations, see calc_network """
+    return calc_network(excitations, freq, ref_impedance, **calc_kw).S
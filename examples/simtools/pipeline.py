@@ -0,0 +1,109 @@
+"""
+ Incremental post-processing stages stored next to the simulation results.
+
+ Each stage (port calculation, nf2ff, plots, ...) is a function whose inputs
+ are hashed together with its source code and the hash of the previous
+ stage. The first stage builds on the FDTD result key (see cache.py), so a
+ new engine run makes all later stages stale. A completed stage leaves a
+ marker in `sim_path/stages/index.json` and its returned dict of arrays in
+ `sim_path/stages/<name>.npz`; re-running a script loads up-to-date stages
+ and resumes at the first stale one.
+"""
+
+import json
+import time
+import inspect
+import hashlib
+from pathlib import Path
+
+import numpy as np
+
+STAGE_DIR = "stages"
+INDEX = "index.json"
+
+
+def _update(h, obj):
+    if isinstance(obj, np.ndarray):
+        h.update(f"nd{obj.dtype}{obj.shape}".encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        h.update(b"dict")
+        for k in sorted(obj, key=str):
+            _update(h, str(k))
+            _update(h, obj[k])
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"seq{len(obj)}".encode())
+        for v in obj:
+            _update(h, v)
+    elif isinstance(obj, bytes):
+        h.update(obj)
+    else:
+        h.update(repr(obj).encode())
+
+
+def input_hash(*objs):
+    """ SHA-256 over numpy arrays, containers and values with a stable repr """
+    h = hashlib.sha256()
+    for obj in objs:
+        _update(h, obj)
+    return h.hexdigest()
+
+
+def source_hash(func):
+    """ Hash of the source code of `func` (falls back to its bytecode) """
+    try:
+        return input_hash(inspect.getsource(func))
+    except (OSError, TypeError):
+        return input_hash(func.__code__.co_code, func.__code__.co_consts)
+
+
+class StageStore:
+    """ Stage markers and results of one simulation directory """
+
+    def __init__(self, sim_path):
+        self.path = Path(sim_path) / STAGE_DIR
+
+    def index(self):
+        try:
+            with open(self.path / INDEX) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self, index):
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp = self.path / (INDEX + ".tmp")
+        with open(tmp, "w") as fh:
+            json.dump(index, fh, indent=1)
+        tmp.replace(self.path / INDEX)
+
+    def is_current(self, name, key, outputs=()):
+        entry = self.index().get(name)
+        if entry is None or entry["key"] != key:
+            return False
+        if entry["has_result"] and not (self.path / f"{name}.npz").exists():
+            return False
+        return all(Path(p).exists() for p in outputs)
+
+    def load(self, name):
+        """ Stored result dict of a stage, or None if it returned nothing """
+        if not self.index()[name]["has_result"]:
+            return None
+        with np.load(self.path / f"{name}.npz", allow_pickle=False) as data:
+            return {k: (v.item() if v.ndim == 0 else v) for k, v in data.items()}
+
+    def save(self, name, key, result):
+        if result is not None and not isinstance(result, dict):
+            raise TypeError(f"stage {name!r} has to return a dict of arrays or None")
+        self.path.mkdir(parents=True, exist_ok=True)
+        if result is not None:
+            tmp = self.path / f"{name}.tmp.npz"
+            np.savez(tmp, **{k: np.asarray(v) for k, v in result.items()})
+            tmp.replace(self.path / f"{name}.npz")
+        index = self.index()
+        index[name] = {"key": key, "has_result": result is not None, "time": time.time()}
+        self._write_index(index)
+
+    def clear(self):
+        """ Mark all stages as stale """
+        self._write_index({})
@@ -0,0 +1,233 @@
+"""
+ Pre-flight estimate of mesh size, engine memory and runtime.
+
+ Before FDTD.Run the complete setup is written to XML and read back, which
+ gives the mesh lines, the timestep limit and the excitation. From that:
+
+   cells     product of the number of mesh cells per direction
+   dt        Courant limit of the smallest cell (times TimeStepFactor)
+   memory    cells * bytes per cell (field and operator arrays) + overhead
+   runtime   cells * timesteps / calibrated throughput (MCells/s)
+
+ With an end criteria the number of timesteps is not known in advance; it
+ is estimated as RINGDOWN_FACTOR excitation lengths (capped by NrTS).
+
+ The throughput defaults to DEFAULT_MCELLS_PER_S and can be calibrated from
+ a benchmark baseline (python3 -m simtools preflight calibrate bench.json).
+ OPENEMS_PREFLIGHT selects what happens when a job does not fit the node:
+ 'warn' (default), 'strict' (raise PreflightError) or 'off'.
+ OPENEMS_MAX_RUNTIME (seconds) adds a runtime limit.
+"""
+
+import os
+import sys
+import json
+import argparse
+import warnings
+from math import ceil, pi, sqrt
+from pathlib import Path
+
+import numpy as np
+
+from . import model_info
+from .cache import default_cache_dir
+
+C0 = 299792458.0
+
+MODE_ENV = "OPENEMS_PREFLIGHT"
+MAX_RUNTIME_ENV = "OPENEMS_MAX_RUNTIME"
+CALIBRATION_ENV = "OPENEMS_THROUGHPUT_FILE"
+
+# E/H fields plus the four operator coefficient arrays, 3 components each,
+# single precision, with some headroom for material and boundary data
+BYTES_PER_CELL = 100
+BASE_MEMORY = 200 * 1024**2
+DEFAULT_MCELLS_PER_S = 50.0
+RINGDOWN_FACTOR = 10
+
+
+class PreflightError(RuntimeError):
+    pass
+
+
+class Estimate:
+    """ Predicted size and cost of one engine run """
+
+    def __init__(self, lines, delta_unit, coord_system, dt, max_timesteps, excitation_timesteps,
+                 end_criteria, mcells_per_s, bytes_per_cell=BYTES_PER_CELL):
+        self.lines = lines
+        self.delta_unit = delta_unit
+        self.coord_system = coord_system
+        self.cells = model_info.cell_count(lines)
+        self.dt = dt
+        self.max_timesteps = max_timesteps
+        self.excitation_timesteps = excitation_timesteps
+        self.end_criteria = end_criteria
+        self.mcells_per_s = mcells_per_s
+        self.memory = BASE_MEMORY + self.cells * bytes_per_cell
+
+    @property
+    def timesteps(self):
+        """ Expected number of timesteps, None if unknown """
+        if self.end_criteria and self.excitation_timesteps:
+            n = RINGDOWN_FACTOR * self.excitation_timesteps
+            return min(n, self.max_timesteps) if self.max_timesteps else n
+        return self.max_timesteps
+
+    @property
+    def runtime(self):
+        """ Expected engine runtime in seconds """
+        if not self.timesteps:
+            return None
+        return self.cells * self.timesteps / (self.mcells_per_s * 1e6)
+
+    def as_dict(self):
+        return {
+            "mesh_lines": [len(l) for l in self.lines],
+            "cells": self.cells,
+            "dt": self.dt,
+            "max_timesteps": self.max_timesteps,
+            "excitation_timesteps": self.excitation_timesteps,
+            "timesteps": self.timesteps,
+            "memory_mb": self.memory / 1024**2,
+            "mcells_per_s": self.mcells_per_s,
+            "runtime": self.runtime,
+        }
+
+    def __str__(self):
+        n = " x ".join(str(len(l) - 1) for l in self.lines)
+        s = (f"mesh {n} = {self.cells/1e6:.2f} MCells, dt = {self.dt*1e12:.3f} ps, "
+             f"memory ~ {self.memory/1024**2:.0f} MB")
+        if self.runtime is not None:
+            s += f", runtime ~ {self.runtime:.0f} s for {self.timesteps} timesteps at {self.mcells_per_s:.0f} MCells/s"
+        return s
+
+
+def courant_dt(lines, delta_unit, coord_system=0, factor=1.0):
+    """ Courant limit of the timestep for the smallest cell of a rectilinear or cylindrical mesh """
+    d = [np.min(np.diff(l)) * delta_unit if len(l) > 1 else np.inf for l in lines]
+    if coord_system == 1:
+        # the angular cell width scales with the radius
+        r = lines[0][lines[0] > 0]
+        d[1] = (np.min(np.diff(lines[1])) * np.min(r) * delta_unit) if len(r) and len(lines[1]) > 1 else np.inf
+    inv = sum(1/x**2 for x in d if np.isfinite(x))
+    return factor / (C0 * sqrt(inv))
+
+
+def excitation_timesteps(xml, dt):
+    """ Length of the excitation signal in timesteps, None for continuous signals """
+    exc = model_info.read_excitation(xml)
+    if exc.get("Type", "0") != "0":
+        return None
+    # openEMS truncates the Gaussian pulse at 9 sigma on both sides
+    fc = float(exc["fc"])
+    return int(ceil(2*9/(2*pi*fc) / dt))
+
+
+def load_throughput(fn=None):
+    """ Calibrated engine throughput in MCells/s (default if not calibrated) """
+    fn = Path(fn or os.environ.get(CALIBRATION_ENV) or default_cache_dir() / "throughput.json")
+    try:
+        with open(fn) as fh:
+            return float(json.load(fh)["mcells_per_s"])
+    except (OSError, KeyError, ValueError):
+        return DEFAULT_MCELLS_PER_S
+
+
+def calibrate(baseline, fn=None):
+    """ Store the median throughput of a benchmark baseline as calibration """
+    rates = [r["mcells_per_s"] for r in baseline["results"].values() if r.get("mcells_per_s")]
+    if not rates:
+        raise ValueError("baseline contains no throughput results")
+    fn = Path(fn or os.environ.get(CALIBRATION_ENV) or default_cache_dir() / "throughput.json")
+    fn.parent.mkdir(parents=True, exist_ok=True)
+    value = float(np.median(rates))
+    with open(fn, "w") as fh:
+        json.dump({"mcells_per_s": value, "label": baseline.get("label"), "samples": len(rates)}, fh, indent=1)
+    return value
+
+
+def available_memory():
+    """ Memory available to this process in bytes (cgroup limit or MemAvailable) """
+    avail = None
+    try:
+        with open("/proc/meminfo") as fh:
+            for line in fh:
+                if line.startswith("MemAvailable:"):
+                    avail = int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        limit = Path("/sys/fs/cgroup/memory.max").read_text().strip()
+        usage = int(Path("/sys/fs/cgroup/memory.current").read_text())
+        if limit != "max":
+            free = int(limit) - usage
+            avail = free if avail is None else min(avail, free)
+    except (OSError, ValueError):
+        pass
+    return avail
+
+
+def estimate(xml, mcells_per_s=None):
+    """ Estimate for a written openEMS setup (file name or XML bytes) """
+    lines, delta_unit, coord_system = model_info.read_grid(xml)
+    fdtd = model_info.read_fdtd(xml)
+    dt = courant_dt(lines, delta_unit, coord_system, float(fdtd.get("TimeStepFactor", 1)))
+    try:
+        exc_ts = excitation_timesteps(xml, dt)
+    except (KeyError, ValueError):
+        exc_ts = None
+    return Estimate(lines, delta_unit, coord_system, dt, model_info.max_timesteps(xml), exc_ts,
+                    float(fdtd.get("endCriteria", 0)), mcells_per_s or load_throughput())
+
+
+def check(est, mode=None, memory=None, max_runtime=None):
+    """
+    Compare an estimate with the node. Returns a list of problems; depending on
+    `mode` (default OPENEMS_PREFLIGHT) these are raised or issued as warnings.
+    """
+    mode = (mode or os.environ.get(MODE_ENV, "warn")).lower()
+    if mode == "off":
+        return []
+    memory = available_memory() if memory is None else memory
+    if max_runtime is None and os.environ.get(MAX_RUNTIME_ENV):
+        max_runtime = float(os.environ[MAX_RUNTIME_ENV])
+
+    problems = []
+    if memory is not None and est.memory > memory:
+        problems.append(f"needs ~{est.memory/1024**2:.0f} MB but only {memory/1024**2:.0f} MB are available")
+    if max_runtime is not None and est.runtime is not None and est.runtime > max_runtime:
+        problems.append(f"expected to run {est.runtime:.0f} s, more than the limit of {max_runtime:.0f} s")
+    if problems:
+        msg = f"pre-flight: {est}: " + "; ".join(problems)
+        if mode == "strict":
+            raise PreflightError(msg)
+        warnings.warn(msg, RuntimeWarning, stacklevel=3)
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="simtools preflight", description="Estimate size and cost of openEMS models")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    est = sub.add_parser("estimate", help="estimate written model XML files")
+    est.add_argument("files", nargs="+", type=Path)
+    est.add_argument("--throughput", type=float, default=None, help="MCells/s (default: calibrated value)")
+    cal = sub.add_parser("calibrate", help="calibrate the throughput from a benchmark baseline")
+    cal.add_argument("baseline", type=Path)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "calibrate":
+        with open(args.baseline) as fh:
+            value = calibrate(json.load(fh))
+        print(f"calibrated throughput: {value:.1f} MCells/s")
+        return 0
+
+    status = 0
+    for fn in args.files:
+        e = estimate(fn, args.throughput)
+        print(f"{fn}: {e}")
+        memory = available_memory()
+        if memory is not None and e.memory > memory:
+            print(f"  does not fit: {memory/1024**2:.0f} MB available", file=sys.stderr)
+            status = 1
+    return status
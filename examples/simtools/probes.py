@@ -0,0 +1,269 @@
+"""
+ Streaming access to openEMS time-domain probe files (ut*, it*, port_ut_*, ...).
+
+ Probe files are text files with '%' header lines followed by one
+ "time value" row per sample. With high oversampling and long runs they get
+ large, so instead of loading a whole trace this module
+
+   - yields the trace in chunks (iter_probe),
+   - converts it once to a binary .npy file which is memory-mapped
+     (probe_memmap),
+   - accumulates the DFT at the requested frequencies chunk by chunk
+     (DFTAccumulator), using the same scaling as openEMS' DFT_time2freq.
+
+ StreamingLumpedPort computes the voltage/current/wave quantities of a
+ lumped port like LumpedPort.CalcPort without materializing the traces.
+
+ ProbeTraces keeps the memory-mapped probes of a simulation for repeated
+ DFTs at new frequencies, e.g. the refinement rounds of an adaptive sweep;
+ ProbePort evaluates the ports of a model from it instead of re-reading
+ the probe files on every CalcPort.
+"""
+
+import os
+import itertools
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_CHUNK = 65536
+
+
+def read_probe_header(fn):
+    """ Header lines (without the leading '%') of a probe file """
+    header = []
+    with open(fn) as fh:
+        for line in fh:
+            if not line.startswith("%"):
+                break
+            header.append(line[1:].strip())
+    return header
+
+
+def iter_probe(fn, chunk_size=DEFAULT_CHUNK, t_max=None):
+    """
+    Yield (t, val) arrays of at most `chunk_size` samples.
+
+    Reading stops after the first sample beyond `t_max`, if given.
+    """
+    with open(fn) as fh:
+        first = None
+        for line in fh:
+            if not line.startswith("%"):
+                first = line
+                break
+        if first is None:
+            return
+        lines = itertools.chain([first], fh)
+        while True:
+            block = list(itertools.islice(lines, chunk_size))
+            if not block:
+                return
+            data = np.array(" ".join(block).split(), dtype=float).reshape(len(block), -1)
+            t, val = data[:, 0], data[:, 1]
+            if t_max is not None and t[-1] > t_max:
+                n = np.searchsorted(t, t_max, side="right")
+                yield t[:n+1], val[:n+1]
+                return
+            yield t, val
+
+
+def probe_memmap(fn, chunk_size=DEFAULT_CHUNK):
+    """
+    Memory-mapped (nsamples, 2) array of a probe file.
+
+    The text file is converted once to `<fn>.npy` (streamed chunk by chunk);
+    the conversion is redone when the probe file is newer than the .npy file.
+    """
+    fn = Path(fn)
+    npy = fn.with_name(fn.name + ".npy")
+    if not npy.exists() or npy.stat().st_mtime < fn.stat().st_mtime:
+        nrows = 0
+        with open(fn) as fh:
+            nrows = sum(1 for line in fh if not line.startswith("%") and line.strip())
+        tmp = npy.with_name(npy.name + ".tmp")
+        out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float64, shape=(nrows, 2))
+        pos = 0
+        for t, val in iter_probe(fn, chunk_size):
+            out[pos:pos+len(t), 0] = t
+            out[pos:pos+len(t), 1] = val
+            pos += len(t)
+        out.flush()
+        del out
+        os.replace(tmp, npy)
+    return np.load(npy, mmap_mode="r")
+
+
+class DFTAccumulator:
+    """
+    Incremental DFT of a uniformly sampled signal at the frequencies `freq`.
+
+    Call update(t, val) for consecutive chunks and result() at the end; the
+    result matches openEMS.utilities.DFT_time2freq for the full trace.
+    """
+
+    def __init__(self, freq, signal_type="pulse", block_elements=4_000_000):
+        self.freq = np.atleast_1d(np.asarray(freq, dtype=float))
+        self.signal_type = signal_type
+        self.acc = np.zeros(len(self.freq), dtype=complex)
+        self.dt = None
+        self.count = 0
+        # limit the size of the (freq x samples) phase matrix per step
+        self.block = max(1, block_elements // max(1, len(self.freq)))
+
+    def update(self, t, val):
+        if self.dt is None and len(t) > 1:
+            self.dt = t[1] - t[0]
+        w = -2j*np.pi*self.freq
+        for k in range(0, len(t), self.block):
+            tb = t[k:k+self.block]
+            self.acc += np.exp(np.outer(w, tb)) @ val[k:k+self.block]
+        self.count += len(t)
+
+    def result(self):
+        if self.signal_type == "pulse":
+            return 2 * self.acc * self.dt
+        if self.signal_type == "periodic":
+            return 2 * self.acc / self.count
+        raise ValueError(f"unknown signal type {self.signal_type!r}")
+
+
+def probe_dft(fn, freq, signal_type="pulse", chunk_size=DEFAULT_CHUNK):
+    """ DFT of a probe file at `freq` without loading the whole trace """
+    dft = DFTAccumulator(freq, signal_type)
+    for t, val in iter_probe(fn, chunk_size):
+        dft.update(t, val)
+    return dft.result()
+
+
+def _set_waves(port):
+    """ Incident/reflected waves and powers from uf_tot, if_tot and Z_ref, as in openEMS' Port.CalcPort """
+    Z = port.Z_ref
+    port.uf_inc = 0.5*(port.uf_tot + port.if_tot*Z)
+    port.if_inc = 0.5*(port.if_tot + port.uf_tot/Z)
+    port.uf_ref = port.uf_tot - port.uf_inc
+    port.if_ref = port.if_inc - port.if_tot
+
+    port.P_inc = 0.5*np.real(port.uf_inc*np.conj(port.if_inc))
+    port.P_ref = 0.5*np.real(port.uf_ref*np.conj(port.if_ref))
+    port.P_acc = 0.5*np.real(port.uf_tot*np.conj(port.if_tot))
+
+
+class ProbeTraces:
+    """
+    Probe files of one simulation directory, each converted once to a
+    memory-mapped array (probe_memmap) and kept for later DFTs.
+    """
+
+    def __init__(self, sim_path, chunk_size=DEFAULT_CHUNK):
+        self.sim_path = Path(sim_path)
+        self.chunk_size = chunk_size
+        self._traces = {}
+
+    def trace(self, fn):
+        """ (nsamples, 2) array of time and value of probe file `fn` """
+        if fn not in self._traces:
+            self._traces[fn] = probe_memmap(self.sim_path / fn, self.chunk_size)
+        return self._traces[fn]
+
+    def dft(self, fn, freq, signal_type="pulse"):
+        """ DFT of probe `fn` at `freq`, see DFTAccumulator """
+        data = self.trace(fn)
+        dft = DFTAccumulator(freq, signal_type)
+        for k in range(0, len(data), self.chunk_size):
+            block = np.asarray(data[k:k+self.chunk_size])
+            dft.update(block[:, 0], block[:, 1])
+        return dft.result()
+
+
+class ProbePort:
+    """
+    Port post-processing from the probe DFTs of a ProbeTraces.
+
+    The port voltage and current are weighted sums of probe files, given as
+    {file name: weight}. of() takes them from an openEMS lumped or
+    microstrip port. CalcPort sets the same attributes as the openEMS port
+    for a fixed reference impedance and without reference plane shift (the
+    microstrip line impedance and propagation constant are not extracted).
+    """
+
+    def __init__(self, traces, u_probes, i_probes, Z_ref=50):
+        self.traces = traces
+        self.u_probes = dict(u_probes)
+        self.i_probes = dict(i_probes)
+        self.Z_ref = Z_ref
+
+    @classmethod
+    def of(cls, port, traces):
+        """ ProbePort reading the probes of the openEMS port `port` """
+        U, I = list(port.U_filenames), list(port.I_filenames)
+        if len(U) == 3 and len(I) == 2:
+            # microstrip port: voltage at the middle probe, current averaged to its position
+            u_probes, i_probes = {U[1]: 1.0}, {I[0]: 0.5, I[1]: 0.5}
+        else:
+            u_probes, i_probes = dict.fromkeys(U, 1.0), dict.fromkeys(I, 1.0)
+        return cls(traces, u_probes, i_probes, getattr(port, "Z_ref", None) or 50)
+
+    def CalcPort(self, sim_path, freq, ref_impedance=None, signal_type="pulse"):
+        """ Drop-in for the CalcPort of the port, `sim_path` has to be that of the traces """
+        if Path(sim_path).resolve() != self.traces.sim_path.resolve():
+            raise ValueError(f"{sim_path} is not the directory of the probe traces {self.traces.sim_path}")
+        if ref_impedance is not None:
+            self.Z_ref = ref_impedance
+        self.freq = np.atleast_1d(np.asarray(freq, dtype=float))
+        self.uf_tot = sum(w*self.traces.dft(fn, self.freq, signal_type) for fn, w in self.u_probes.items())
+        self.if_tot = sum(w*self.traces.dft(fn, self.freq, signal_type) for fn, w in self.i_probes.items())
+        _set_waves(self)
+
+
+class StreamingLumpedPort:
+    """
+    Lumped port post-processing from the port_ut_N/port_it_N probes.
+
+    calc() sets the same attributes as openEMS' LumpedPort.CalcPort
+    (uf_tot, if_tot, uf_inc, uf_ref, if_inc, if_ref, P_inc, P_ref, P_acc)
+    so the object can be used in place of a port for S-parameter extraction.
+    """
+
+    def __init__(self, sim_path, number, Z_ref=50, prefix="port"):
+        self.sim_path = Path(sim_path)
+        self.number = number
+        self.Z_ref = Z_ref
+        self.U_filename = self.sim_path / f"{prefix}_ut_{number}"
+        self.I_filename = self.sim_path / f"{prefix}_it_{number}"
+
+    def CalcPort(self, sim_path, freq, ref_impedance=None, signal_type="pulse", chunk_size=DEFAULT_CHUNK):
+        """ Drop-in for LumpedPort.CalcPort """
+        self.sim_path = Path(sim_path)
+        self.U_filename = self.sim_path / self.U_filename.name
+        self.I_filename = self.sim_path / self.I_filename.name
+        if ref_impedance is not None:
+            self.Z_ref = ref_impedance
+        self.calc(freq, signal_type, chunk_size)
+
+    def calc(self, freq, signal_type="pulse", chunk_size=DEFAULT_CHUNK):
+        self.freq = np.atleast_1d(np.asarray(freq, dtype=float))
+        self.uf_tot = probe_dft(self.U_filename, self.freq, signal_type, chunk_size)
+        self.if_tot = probe_dft(self.I_filename, self.freq, signal_type, chunk_size)
+        _set_waves(self)
+
+    def iter_waves(self, chunk_size=DEFAULT_CHUNK, t_max=None):
+        """
+        Yield (t, u, i, u_inc, u_ref) chunks of the time-domain port signals.
+
+        Voltage and current probes have the same number of samples, the
+        time axis of the voltage probe is returned.
+        """
+        for (t, u), (_, i) in zip(iter_probe(self.U_filename, chunk_size, t_max),
+                                  iter_probe(self.I_filename, chunk_size, t_max)):
+            n = min(len(u), len(i))
+            t, u, i = t[:n], u[:n], i[:n]
+            u_inc = 0.5*(u + i*self.Z_ref)
+            yield t, u, i, u_inc, u - u_inc
+
+    def read_waves(self, t_max=None, chunk_size=DEFAULT_CHUNK):
+        """ Concatenated iter_waves output, limit the memory with `t_max` """
+        chunks = list(self.iter_waves(chunk_size, t_max))
+        if not chunks:
+            return tuple(np.array([]) for _ in range(5))
+        return tuple(np.concatenate(c) for c in zip(*chunks))
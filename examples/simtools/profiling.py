@@ -0,0 +1,205 @@
+"""
+ Per-phase timing and memory instrumentation for the example scripts.
+
+ A Profiler records wall time and resident memory for named phases, either
+ as a context manager
+
+   with prof.phase('nf2ff'):
+       ...
+
+ or sequentially, where each checkpoint ends the previous phase:
+
+   prof.checkpoint('geometry')
+   ...
+   prof.checkpoint('mesh')
+
+ Every phase records the resident set size at its start and end, the change
+ over the phase and the peak of the process up to its end. The peak is the
+ maximum since the process started (getrusage), it only attributes memory
+ to the phase where it first rises.
+
+ Reports are written as JSON and can be aggregated across runs:
+   python3 -m simtools profile summarize */results/profile.json
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import resource
+import argparse
+import functools
+from contextlib import contextmanager
+
+REPORT = "profile.json"
+
+
+def peak_rss_mb():
+    """ Peak resident set size of this process (and finished children) in MB """
+    self_ = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    scale = 1 / 1024**2 if sys.platform == "darwin" else 1 / 1024
+    return max(self_, children) * scale
+
+
+def rss_mb():
+    """ Current resident set size in MB (Linux only, else None) """
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024**2
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Profiler:
+    def __init__(self, name):
+        self.name = name
+        self.phases = []
+        self.info = {}
+        self.start_time = time.time()
+        self._t0 = time.perf_counter()
+        self._open = None
+
+    def _begin(self, name):
+        return {"name": name, "start": time.perf_counter() - self._t0, "rss_start_mb": rss_mb()}
+
+    def _end(self, rec):
+        rec["wall_time"] = time.perf_counter() - self._t0 - rec["start"]
+        rec["rss_end_mb"] = rss_mb()
+        if rec["rss_start_mb"] is not None and rec["rss_end_mb"] is not None:
+            rec["rss_delta_mb"] = rec["rss_end_mb"] - rec["rss_start_mb"]
+        rec["cumulative_peak_rss_mb"] = peak_rss_mb()
+        self.phases.append(rec)
+        return rec
+
+    @contextmanager
+    def phase(self, name):
+        """ Record the enclosed block as phase `name` """
+        self.stop()
+        rec = self._begin(name)
+        try:
+            yield rec
+        finally:
+            self._end(rec)
+
+    def timed(self, name=None):
+        """ Decorator recording every call of a function as a phase """
+        def deco(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kw):
+                with self.phase(name or func.__name__):
+                    return func(*args, **kw)
+            return wrapper
+        return deco
+
+    def checkpoint(self, name):
+        """ End the running sequential phase (if any) and start phase `name` """
+        self.stop()
+        self._open = self._begin(name)
+
+    def stop(self):
+        """ End the running sequential phase """
+        if self._open is not None:
+            rec, self._open = self._open, None
+            self._end(rec)
+
+    def set(self, **info):
+        """ Attach run information, e.g. mesh cells or timesteps """
+        self.info.update(info)
+
+    def report(self):
+        self.stop()
+        return {
+            "name": self.name,
+            "host": socket.gethostname(),
+            "start_time": self.start_time,
+            "total_wall_time": time.perf_counter() - self._t0,
+            "peak_rss_mb": peak_rss_mb(),
+            "info": self.info,
+            "phases": self.phases,
+        }
+
+    def write(self, fn):
+        rep = self.report()
+        os.makedirs(os.path.dirname(os.path.abspath(fn)), exist_ok=True)
+        with open(fn, "w") as fh:
+            json.dump(rep, fh, indent=1)
+        return rep
+
+    def print_summary(self):
+        rep = self.report()
+        print(format_report(rep))
+
+
+def phase_peak(p):
+    """ Process peak RSS at the end of phase record `p` (also of reports written before the rename) """
+    return p.get("cumulative_peak_rss_mb", p.get("peak_rss_mb", 0.0))
+
+
+def format_report(rep):
+    lines = [f"{rep['name']}: {rep['total_wall_time']:.2f} s, peak RSS {rep['peak_rss_mb']:.0f} MB"]
+    for k, v in rep["info"].items():
+        lines.append(f"  {k}: {v}")
+    for p in rep["phases"]:
+        delta = p.get("rss_delta_mb")
+        delta = f"{delta:+8.0f} MB" if delta is not None else f"{'-':>8}   "
+        lines.append(f"  {p['name']:<20} {p['wall_time']:10.3f} s  RSS {delta}  peak so far {phase_peak(p):8.0f} MB")
+    return "\n".join(lines)
+
+
+def load_reports(files):
+    reports = []
+    for fn in files:
+        with open(fn) as fh:
+            reports.append(json.load(fh))
+    return reports
+
+
+def aggregate(reports):
+    """
+    Combine reports into {(name, phase): stats} with count, mean, min and max
+    wall time and the largest process peak RSS reached by the end of the
+    phase. The phase 'total' covers whole runs.
+    """
+    samples = {}
+    for rep in reports:
+        # phases recorded several times in one run are summed up
+        run = {"total": (rep["total_wall_time"], rep["peak_rss_mb"])}
+        for p in rep["phases"]:
+            wall, rss = run.get(p["name"], (0.0, 0.0))
+            run[p["name"]] = (wall + p["wall_time"], max(rss, phase_peak(p)))
+        for phase, vals in run.items():
+            samples.setdefault((rep["name"], phase), []).append(vals)
+    stats = {}
+    for key, vals in samples.items():
+        walls = [w for w, _ in vals]
+        stats[key] = {"count": len(vals), "mean": sum(walls)/len(walls), "min": min(walls),
+                      "max": max(walls), "cumulative_peak_rss_mb": max(r for _, r in vals)}
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="simtools profile", description="Inspect per-phase profiling reports")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    show = sub.add_parser("show", help="print reports")
+    show.add_argument("files", nargs="+")
+    summ = sub.add_parser("summarize", help="aggregate reports over runs")
+    summ.add_argument("files", nargs="+")
+    summ.add_argument("--json", default=None, help="also write the aggregate to this file")
+    args = parser.parse_args(argv)
+
+    reports = load_reports(args.files)
+    if args.cmd == "show":
+        for rep in reports:
+            print(format_report(rep))
+        return 0
+
+    stats = aggregate(reports)
+    print(f"{'example':<28} {'phase':<20} {'runs':>4} {'mean (s)':>10} {'min (s)':>10} {'max (s)':>10} {'peak so far MB':>14}")
+    for (name, phase), s in sorted(stats.items()):
+        print(f"{name:<28} {phase:<20} {s['count']:>4} {s['mean']:>10.3f} {s['min']:>10.3f} {s['max']:>10.3f} {s['cumulative_peak_rss_mb']:>14.0f}")
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump([{"name": n, "phase": p, **s} for (n, p), s in sorted(stats.items())], fh, indent=1)
+    return 0
@@ -0,0 +1,95 @@
+"""
+ Radar cross section post-processing for plane wave scattering models.
+
+ calc_rcs evaluates the requested frequencies and observation angles in one
+ NF2FF pass (through FarFieldCache, so repeated evaluations are served from
+ disk) and computes the RCS for the whole (freq, theta, phi) array at once:
+
+   RCS = 4*pi * P_rad / S_inc,    S_inc = 0.5*|E_inc|^2/Z0
+
+ where |E_inc| is taken from the plane wave excitation probe ('et').
+
+ The NF2FF cost grows with nfreq x ntheta x phi, so request only what is
+ used: a bistatic cut at one frequency, and calc_monostatic for the
+ backscatter direction over frequency.
+"""
+
+from math import pi
+
+import numpy as np
+
+from .farfield import FarFieldCache
+
+
+class RCSResult:
+    """ RCS array of shape (nfreq, ntheta, nphi) with its grid (angles in deg) """
+
+    def __init__(self, freq, theta, phi, rcs, S_inc, farfield):
+        self.freq = freq
+        self.theta = theta
+        self.phi = phi
+        self.rcs = rcs
+        self.S_inc = S_inc
+        self.farfield = farfield
+
+    def at_freq(self, f):
+        """ Bistatic RCS (ntheta, nphi) at the grid frequency closest to `f` """
+        return self.rcs[np.argmin(np.abs(self.freq - f))]
+
+    def monostatic(self, k_dir):
+        """
+        Backscattered RCS over frequency for a plane wave travelling along
+        `k_dir`, taken at the grid angle closest to the direction -k_dir.
+        """
+        theta_b, phi_b = backscatter_angles(k_dir)
+        ti = np.argmin(np.abs(self.theta - theta_b))
+        dphi = (self.phi - phi_b + 180) % 360 - 180
+        pi_ = np.argmin(np.abs(dphi))
+        return self.rcs[:, ti, pi_]
+
+
+def backscatter_angles(k_dir):
+    """ (theta, phi) in degrees of the direction opposite to `k_dir` """
+    k = -np.asarray(k_dir, dtype=float)
+    k = k / np.linalg.norm(k)
+    theta = np.rad2deg(np.arccos(np.clip(k[2], -1, 1)))
+    phi = np.rad2deg(np.arctan2(k[1], k[0]))
+    return theta, phi
+
+
+def incident_power_density(sim_path, freq, E_dir, probe='et'):
+    """ Power density of the incident plane wave over frequency, from the excitation probe """
+    from openEMS.ports import UI_data
+    from openEMS.physical_constants import Z0
+
+    ef = UI_data(probe, str(sim_path), freq)
+    return 0.5*np.linalg.norm(E_dir)**2/Z0 * np.abs(np.asarray(ef.ui_f_val[0]))**2
+
+
+def calc_rcs(nf2ff, sim_path, freq, theta, phi, E_dir, center=[0, 0, 0], probe='et', farfield=None, verbose=0):
+    """
+    Bistatic RCS for all `freq` x `theta` x `phi` (angles in degrees) from one NF2FF pass.
+
+    Pass a FarFieldCache as `farfield` to share it with other post-processing.
+    """
+    freq = np.atleast_1d(np.asarray(freq, dtype=float))
+    theta = np.atleast_1d(np.asarray(theta, dtype=float))
+    phi = np.atleast_1d(np.asarray(phi, dtype=float))
+    if farfield is None:
+        farfield = FarFieldCache(nf2ff, sim_path)
+
+    ff = farfield.calc(freq, theta, phi, center=center, verbose=verbose)
+    S_inc = incident_power_density(sim_path, freq, E_dir, probe)
+    rcs = 4*pi * np.asarray(ff.P_rad) / S_inc[:, None, None]
+    return RCSResult(freq, theta, phi, rcs, S_inc, ff)
+
+
+def calc_monostatic(nf2ff, sim_path, freq, k_dir, E_dir, center=[0, 0, 0], probe='et', farfield=None, verbose=0):
+    """
+    Backscattered RCS over `freq` for a plane wave travelling along `k_dir`,
+    from an NF2FF pass in the direction -k_dir only.
+    """
+    theta, phi = backscatter_angles(k_dir)
+    res = calc_rcs(nf2ff, sim_path, freq, theta, phi, E_dir, center=center, probe=probe,
+                   farfield=farfield, verbose=verbose)
+    return res.rcs[:, 0, 0]
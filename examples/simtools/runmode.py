@@ -0,0 +1,147 @@
+"""
+ Run mode switch honored by all example scripts.
+
+   preview      write the model and open it in AppCSXCAD, nothing else
+   simulate     run the engine, post-process and plot (default)
+   postprocess  post-process and plot existing results, no engine run
+   headless     run the engine and post-process, no plots and no GUI
+
+ The mode is taken from a `--mode MODE` command line argument or from
+ OPENEMS_RUN_MODE; sys.argv is only read, scripts with their own argument
+ parser see the option unchanged. matplotlib is only imported once a plot
+ is actually made, with the non-interactive Agg backend when there is no
+ display (select_backend()); in headless mode plotting calls are ignored
+ and matplotlib is never imported.
+"""
+
+import os
+import sys
+
+MODE_ENV = "OPENEMS_RUN_MODE"
+MODES = ("preview", "simulate", "postprocess", "headless")
+DEFAULT_MODE = "simulate"
+
+_mode = None
+
+
+def _checked(mode):
+    if mode not in MODES:
+        raise ValueError(f"unknown run mode {mode!r}, use one of {', '.join(MODES)}")
+    return mode
+
+
+def mode_argument(argv=None):
+    """ Value of a `--mode MODE` or `--mode=MODE` argument in argv (default: sys.argv), or None """
+    args = list(sys.argv if argv is None else argv)[1:]
+    for i, arg in enumerate(args):
+        if arg == "--mode" and i + 1 < len(args):
+            return args[i+1]
+        if arg.startswith("--mode="):
+            return arg.split("=", 1)[1]
+    return None
+
+
+def mode():
+    """ The run mode of this process """
+    global _mode
+    if _mode is None:
+        _mode = _checked(mode_argument() or os.environ.get(MODE_ENV) or DEFAULT_MODE)
+    return _mode
+
+
+def set_mode(value):
+    global _mode
+    _mode = _checked(value)
+
+
+def run_engine():
+    """ Whether FDTD.Run is to be called """
+    return mode() in ("simulate", "headless")
+
+
+def postprocess():
+    """ Whether results are to be evaluated """
+    return mode() != "preview"
+
+
+def plots():
+    """ Whether figures are to be created """
+    return mode() in ("simulate", "postprocess")
+
+
+def interactive():
+    """ Whether plot windows and AppCSXCAD may be opened """
+    if mode() == "headless":
+        return False
+    return sys.platform in ("win32", "darwin") or bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def select_backend():
+    """
+    Configure the matplotlib backend for this run mode without importing
+    pyplot: Agg if no plot windows can be opened. Call it before importing
+    modules that import pyplot themselves (e.g. skrf). Returns False in
+    modes without plots, where matplotlib is left alone.
+    """
+    if not plots():
+        return False
+    import matplotlib
+    if not interactive():
+        matplotlib.use("Agg")
+    return True
+
+
+class _NullPlot:
+    """ Stand-in for pyplot and its figures/axes that ignores every call """
+
+    def __getattr__(self, name):
+        return self
+
+    def __call__(self, *args, **kw):
+        return self
+
+    def __iter__(self):
+        return iter(())
+
+    def __getitem__(self, key):
+        return self
+
+
+class _LazyPyplot:
+    """ matplotlib.pyplot, imported on first use """
+
+    def __init__(self):
+        self._plt = None
+
+    def _load(self):
+        if self._plt is None:
+            if not select_backend():
+                self._plt = _NullPlot()
+            else:
+                from matplotlib import pyplot
+                self._plt = pyplot
+        return self._plt
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+
+def pyplot():
+    """ Lazily imported pyplot; a no-op stand-in in modes without plots """
+    return _LazyPyplot()
+
+
+def show():
+    """ Show open figures if plot windows are possible, never blocks in batch runs """
+    if plots() and interactive():
+        from matplotlib import pyplot
+        pyplot.show()
+
+
+def preview(xml_file):
+    """ Open a model file in AppCSXCAD (only in preview mode) """
+    if mode() != "preview":
+        return False
+    from CSXCAD import AppCSXCAD_BIN
+    os.system(AppCSXCAD_BIN + ' "{}"'.format(xml_file))
+    return True
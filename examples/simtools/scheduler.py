@@ -0,0 +1,131 @@
+"""
+ Simple job scheduler for running several openEMS example scripts at once.
+
+ Each job runs in its own Python process. The scheduler hands every job a
+ thread budget through the OPENEMS_NUM_THREADS environment variable so that
+ the total number of engine threads never exceeds the machine.
+"""
+
+import os
+import sys
+import time
+import subprocess
+import multiprocessing
+from pathlib import Path
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+
+THREADS_ENV = "OPENEMS_NUM_THREADS"
+
+
+def num_threads(default=0):
+    """Engine thread count for FDTD.Run(numThreads=...), 0 lets openEMS decide."""
+    try:
+        return int(os.environ.get(THREADS_ENV, default))
+    except ValueError:
+        return default
+
+
+def fork_context():
+    """
+    Multiprocessing context for worker pools running model builder functions.
+
+    fork keeps functions defined in the calling __main__ script usable in the
+    workers without re-importing (and re-running) the script.
+    """
+    if sys.platform != "win32":
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+@dataclass
+class Job:
+    name: str
+    script: Path
+    args: list = field(default_factory=list)
+    threads: int = 1
+    env: dict = field(default_factory=dict)
+    returncode: int = None
+    wall_time: float = 0.0
+    log_file: Path = None
+
+    @property
+    def ok(self):
+        return self.returncode == 0
+
+
+def thread_budget(total_threads, jobs, max_parallel=None):
+    """
+    Split `total_threads` across `jobs`.
+
+    Returns (number of parallel workers, threads per job) such that
+    workers * threads <= total_threads.
+    """
+    total_threads = max(1, total_threads)
+    workers = max(1, min(len(jobs), max_parallel or total_threads, total_threads))
+    return workers, max(1, total_threads // workers)
+
+
+def _run_job(job, cwd, log_dir):
+    env = dict(os.environ)
+    env.update({k: str(v) for k, v in job.env.items()})
+    env[THREADS_ENV] = str(job.threads)
+    cmd = [sys.executable, str(job.script)] + [str(a) for a in job.args]
+
+    start = time.perf_counter()
+    if not job.script.exists():
+        job.returncode = 127
+        job.wall_time = 0.0
+        return job
+
+    if log_dir is None:
+        job.returncode = subprocess.call(cmd, cwd=cwd, env=env)
+    else:
+        job.log_file = Path(log_dir) / f"{job.name}.log"
+        with open(job.log_file, "w") as log:
+            job.returncode = subprocess.call(cmd, cwd=cwd, env=env,
+                                             stdout=log, stderr=subprocess.STDOUT)
+    job.wall_time = time.perf_counter() - start
+    return job
+
+
+def run_jobs(jobs, total_threads=None, max_parallel=None, cwd=None, log_dir=None, verbose=True):
+    """Run all jobs and return them with return code and wall time filled in."""
+    total_threads = total_threads or os.cpu_count() or 1
+    workers, threads = thread_budget(total_threads, jobs, max_parallel)
+    for job in jobs:
+        job.threads = threads
+    if log_dir is not None:
+        os.makedirs(log_dir, exist_ok=True)
+
+    if verbose:
+        print(f"running {len(jobs)} jobs on {workers} workers with {threads} threads each")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_job, job, cwd, log_dir) for job in jobs]
+        for fut in futures:
+            job = fut.result()
+            if verbose:
+                print(f"  {job.name}: exit {job.returncode} after {job.wall_time:.1f} s")
+    return jobs
+
+
+def summary_table(jobs):
+    """Format a plain-text summary of all jobs."""
+    width = max([len(j.name) for j in jobs] + [len("example")])
+    lines = [f"{'example':<{width}}  {'status':<8} {'exit':>5} {'threads':>7} {'wall (s)':>10}"]
+    lines.append("-" * len(lines[0]))
+    for j in jobs:
+        if j.returncode is None:
+            # never started, e.g. the run was interrupted
+            lines.append(f"{j.name:<{width}}  {'not run':<8} {'-':>5} {j.threads:>7} {'-':>10}")
+            continue
+        if j.returncode == 127 and not j.script.exists():
+            status = "missing"
+        else:
+            status = "ok" if j.ok else "FAILED"
+        lines.append(f"{j.name:<{width}}  {status:<8} {j.returncode:>5} {j.threads:>7} {j.wall_time:>10.1f}")
+    lines.append("-" * len(lines[0]))
+    lines.append(f"{sum(j.ok for j in jobs)}/{len(jobs)} succeeded, "
+                 f"total job time {sum(j.wall_time for j in jobs):.1f} s")
+    return "\n".join(lines)
@@ -0,0 +1,200 @@
+"""
+ Simulation bookkeeping shared by the example scripts.
+"""
+
+import os
+import time
+from pathlib import Path
+from dataclasses import dataclass, field, asdict
+
+from .cache import ResultCache, cache_enabled, fdtd_setup_xml, simulation_key, read_marker, write_marker
+from .scheduler import num_threads
+from .profiling import Profiler, REPORT
+from . import model_info, benchmark, preflight, runmode, pipeline, dumps, autotune
+
+
+@dataclass
+class Simulation:
+    name: str
+    geometry_file: Path
+    sim_path: Path
+    profiler: Profiler = field(default=None, init=False, repr=False, compare=False)
+    # hash of the last completed stage, the FDTD result key after run()
+    upstream: str = field(default=None, init=False, repr=False, compare=False)
+    # field dumps added with add_dump(), {name: DumpPreset}
+    dump_presets: dict = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.profiler = Profiler(self.name)
+
+    def phase(self, name):
+        """ Context manager recording the enclosed block as profiling phase `name` """
+        return self.profiler.phase(name)
+
+    def checkpoint(self, name):
+        """ Start profiling phase `name`, ending the previous sequential phase """
+        self.profiler.checkpoint(name)
+
+    def run(self, FDTD, use_cache=None, cache=None, **run_kw):
+        """
+        Run the FDTD engine into `sim_path`.
+
+        If enabled (argument or OPENEMS_CACHE=1), results of an identical
+        model are re-used from the result cache. Write the geometry file with
+        CSX.Write2XML before calling this, it is part of the cache key.
+        Returns True if the engine run was skipped.
+
+        The model size and cost are estimated first, see simtools.preflight
+        (raises PreflightError in strict mode if it does not fit the node).
+
+        The run mode (simtools.runmode) is honored: in preview mode the
+        geometry is opened in AppCSXCAD and the script ends here, in
+        postprocess mode the engine is not run and True is returned.
+        """
+        mode = runmode.mode()
+        self.profiler.set(mode=mode)
+        if mode == "preview":
+            runmode.preview(self.geometry_file)
+            raise SystemExit(0)
+        if not runmode.run_engine():
+            marker = read_marker(self.sim_path)
+            if marker is None:
+                print(f"{self.name}: no results in {self.sim_path} to post-process")
+            self.upstream = marker and marker.get("key")
+            return True
+        tune = "numThreads" not in run_kw
+        run_kw.setdefault("numThreads", num_threads())
+        if use_cache is None:
+            use_cache = cache_enabled()
+        bench = benchmark.settings()
+        if bench:
+            benchmark.reduce_model(FDTD, **bench)
+            self.profiler.set(bench=bench)
+            tune = False
+        with self.phase("preflight"):
+            xml = fdtd_setup_xml(FDTD)
+            self.record_model(xml)
+            self.preflight(xml)
+
+        def pre_run(kw):
+            # calibration bursts are not part of the FDTD.Run phase
+            if tune:
+                self.checkpoint("autotune")
+                kw["numThreads"] = run_kw["numThreads"] = self._tune_threads(FDTD, xml, run_kw["numThreads"])
+            self.checkpoint("FDTD.Run")
+
+        try:
+            if not use_cache:
+                pre_run(run_kw)
+                FDTD.Run(str(self.sim_path), **run_kw)
+                self._repack_dumps()
+                write_marker(self.sim_path, simulation_key(FDTD, self.geometry_file), self.name)
+                hit = False
+            else:
+                if cache is None:
+                    cache = ResultCache()
+                self.checkpoint("cache")
+                hit = cache.run(FDTD, self, pre_run=pre_run, post_run=self._repack_dumps, **run_kw)
+        finally:
+            self.profiler.stop()
+        self.profiler.set(threads=run_kw["numThreads"], cache_hit=hit)
+        if self.dump_presets:
+            self.profiler.set(dump_bytes=dumps.dump_sizes(self.sim_path, self.dump_presets))
+        self.upstream = read_marker(self.sim_path)["key"]
+        return hit
+
+    def _tune_threads(self, FDTD, xml, threads):
+        """ Thread count from simtools.autotune, `threads` (0: all cores) caps it """
+        try:
+            cells = model_info.cell_count(model_info.read_grid(xml)[0])
+        except ValueError:
+            return threads
+        t0 = time.perf_counter()
+        tuned = autotune.tuned_threads(FDTD, cells, threads or None)
+        if tuned is None:
+            return threads
+        self.profiler.set(autotune_threads=tuned, autotune_time=time.perf_counter() - t0)
+        return tuned
+
+    def add_dump(self, CSX, name, start, stop, preset="compressed", **kw):
+        """
+        Add a field dump box from a preset (see simtools.dumps); HDF5 dumps
+        are compressed and decimated as configured right after the engine run.
+        """
+        dump, p = dumps.add_dump(CSX, name, start, stop, preset, **kw)
+        self.dump_presets[name] = p
+        self.profiler.set(dump_presets={k: asdict(v) for k, v in self.dump_presets.items()})
+        return dump
+
+    def _repack_dumps(self):
+        if not self.dump_presets:
+            return
+        t0 = time.perf_counter()
+        dumps.repack_all(self.sim_path, self.dump_presets)
+        self.profiler.set(dump_repack_time=time.perf_counter() - t0)
+
+    def stage(self, name, func, *args, outputs=(), **kw):
+        """
+        Run the post-processing stage `name` as func(*args, **kw) and return
+        its result (a dict of arrays/scalars, or None).
+
+        If the stage was completed before with the same inputs, source code
+        and upstream stages, and all `outputs` files exist, the stored result
+        is returned instead. Pass model objects such as ports through the
+        closure, they are covered by the FDTD result key.
+        """
+        key = pipeline.input_hash(self.upstream, name, pipeline.source_hash(func), args, kw)
+        store = pipeline.StageStore(self.sim_path)
+        if store.is_current(name, key, outputs):
+            print(f"{self.name}: stage {name} is up to date")
+            result = store.load(name)
+        else:
+            with self.phase(name):
+                result = func(*args, **kw)
+            store.save(name, key, result)
+        self.upstream = key
+        return result
+
+    def record_model(self, xml=None):
+        """
+        Add mesh cell count and the timestep limit of the written setup (XML
+        bytes, default: the geometry file) to the profiling report.
+        """
+        if xml is not None:
+            self.profiler.set(max_timesteps=model_info.max_timesteps(xml))
+        elif os.path.exists(self.geometry_file):
+            xml = self.geometry_file
+        else:
+            return
+        try:
+            lines, _, _ = model_info.read_grid(xml)
+        except ValueError:
+            return
+        self.profiler.set(mesh_lines=[len(l) for l in lines], mesh_cells=model_info.cell_count(lines))
+
+    def preflight(self, xml, mode=None):
+        """ Estimate memory and runtime of the setup and check them against the node """
+        mode = mode or os.environ.get(preflight.MODE_ENV, "warn")
+        if mode.lower() == "off":
+            return None
+        try:
+            est = preflight.estimate(xml)
+        except ValueError:
+            return None
+        print(f"{self.name}: {est}")
+        self.profiler.set(preflight=est.as_dict())
+        preflight.check(est, mode)
+        return est
+
+    def write_report(self, fn=None, verbose=True):
+        """
+        Write the profiling report as JSON, by default to `sim_path/profile.json`
+        or `$OPENEMS_PROFILE_DIR/<name>.json` if that is set.
+        """
+        if fn is None:
+            profile_dir = os.environ.get(benchmark.PROFILE_DIR_ENV)
+            fn = Path(profile_dir) / f"{self.name}.json" if profile_dir else Path(self.sim_path) / REPORT
+        self.profiler.write(fn)
+        if verbose:
+            self.profiler.print_summary()
+        return fn
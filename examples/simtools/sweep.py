@@ -0,0 +1,118 @@
+"""
+ Parameter sweeps over model constructor arguments.
+
+ A sweep is a list of parameter dicts (from `grid` or `latin_hypercube`).
+ `run_sweep` evaluates a model function for every point in a pool of worker
+ processes and collects the returned values into a columnar table, i.e. a
+ dict mapping column names to numpy arrays.
+"""
+
+import os
+import csv
+import time
+import random
+import itertools
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .scheduler import fork_context, num_threads, thread_budget
+
+
+def grid(**values):
+    """Full factorial grid, e.g. grid(GLB=[1500, 1950], SL=[7000, 7800])."""
+    names = list(values)
+    return [dict(zip(names, combo)) for combo in itertools.product(*values.values())]
+
+
+def latin_hypercube(n, seed=None, **ranges):
+    """
+    `n` points of a Latin hypercube, ranges given as name=(min, max).
+
+    Every parameter range is split into `n` equal strata and each stratum is
+    sampled exactly once.
+    """
+    rng = random.Random(seed)
+    columns = {}
+    for name, (lo, hi) in ranges.items():
+        strata = [(k + rng.random()) / n for k in range(n)]
+        rng.shuffle(strata)
+        columns[name] = [lo + u*(hi - lo) for u in strata]
+    return [{name: columns[name][k] for name in ranges} for k in range(n)]
+
+
+def _evaluate(func, index, params, threads):
+    start = time.perf_counter()
+    try:
+        result = func(index, params, threads)
+        error = ""
+    except Exception:
+        result = {}
+        error = traceback.format_exc(limit=3).strip().splitlines()[-1]
+    return index, result, error, time.perf_counter() - start
+
+
+def run_sweep(func, points, total_threads=None, max_parallel=None):
+    """
+    Evaluate `func(index, params, threads)` for every parameter dict in `points`.
+
+    `func` must return a dict of scalar results; it is executed in worker
+    processes which share the engine threads (default: OPENEMS_NUM_THREADS or
+    all cores). Failed points are kept in the table with NaN results and the
+    error message in the 'error' column.
+    """
+    total_threads = total_threads or num_threads() or os.cpu_count() or 1
+    workers, threads = thread_budget(total_threads, points, max_parallel)
+    print(f"sweeping {len(points)} points on {workers} workers with {threads} threads each")
+
+    results = [None] * len(points)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=fork_context()) as pool:
+        futures = [pool.submit(_evaluate, func, k, p, threads) for k, p in enumerate(points)]
+        for fut in futures:
+            index, result, error, wall_time = fut.result()
+            results[index] = (result, error, wall_time)
+            print(f"  point {index}: {'ok' if not error else error} ({wall_time:.1f} s)")
+
+    return to_table(points, results)
+
+
+def to_table(points, results):
+    """Combine parameter dicts and (result, error, wall_time) tuples into columns."""
+    param_names = list(dict.fromkeys(k for p in points for k in p))
+    result_names = list(dict.fromkeys(k for r, _, _ in results for k in r))
+
+    table = {"index": np.arange(len(points))}
+    for name in param_names:
+        table[name] = np.array([p.get(name, np.nan) for p in points], dtype=float)
+    for name in result_names:
+        table[name] = np.array([r.get(name, np.nan) for r, _, _ in results], dtype=float)
+    table["wall_time"] = np.array([t for _, _, t in results])
+    table["error"] = np.array([e for _, e, _ in results], dtype=object)
+    return table
+
+
+def write_table(table, filename):
+    """Write a columnar table as CSV (one row per sweep point)."""
+    names = list(table)
+    with open(filename, "w", newline="") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(names)
+        for row in zip(*(table[n] for n in names)):
+            writer.writerow(row)
+
+
+def read_table(filename):
+    """Read a table written by write_table, numeric columns as float arrays."""
+    with open(filename, newline="") as fh:
+        reader = csv.reader(fh)
+        names = next(reader)
+        rows = list(reader)
+    table = {}
+    for k, name in enumerate(names):
+        col = [r[k] for r in rows]
+        try:
+            table[name] = np.array(col, dtype=float)
+        except ValueError:
+            table[name] = np.array(col, dtype=object)
+    return table
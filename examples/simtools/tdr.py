@@ -0,0 +1,121 @@
+"""
+ Time domain reflectometry from frequency domain port data.
+
+ Takes reflection coefficients on a uniform frequency grid (e.g.
+ port.uf_ref/port.uf_inc after CalcPort) and computes windowed impulse and
+ step responses and the impedance profile with one inverse real FFT. The
+ last axis is frequency, all leading axes (ports, designs, ...) are handled
+ in the same batched FFT.
+"""
+
+import numpy as np
+
+WINDOWS = {
+    "rect": np.ones,
+    "none": np.ones,
+    "hamming": np.hamming,
+    "hann": np.hanning,
+    "hanning": np.hanning,
+    "blackman": np.blackman,
+}
+
+
+class TDRResult:
+    """ Time axis, impulse and step responses and impedance profile """
+
+    def __init__(self, t, impulse, step, Z):
+        self.t = t
+        self.impulse = impulse
+        self.step = step
+        self.Z = Z
+
+
+def reflection(port):
+    """ Reflection coefficient of a port after CalcPort """
+    return port.uf_ref / port.uf_inc
+
+
+def half_window(n, window="hamming", beta=6.0):
+    """ One-sided window of length `n`, maximal at DC and decaying to the highest frequency """
+    if window == "kaiser":
+        w = np.kaiser(2*n - 1, beta)
+    else:
+        try:
+            w = WINDOWS[window](2*n - 1)
+        except KeyError:
+            raise ValueError(f"unknown window {window!r}, use one of {sorted(WINDOWS) + ['kaiser']}")
+    return w[n-1:]
+
+
+def extrapolate_to_dc(f, s):
+    """
+    Extend data on a uniform grid down to DC.
+
+    Missing points below f[0] are linearly extrapolated from the first two
+    points; the DC value is made real. Returns (f, s) starting at 0 Hz.
+    """
+    f = np.asarray(f, dtype=float)
+    s = np.asarray(s)
+    df = f[1] - f[0]
+    if np.isclose(f[0], 0, atol=df*1e-6):
+        s = s.copy()
+        s[..., 0] = s[..., 0].real
+        return f, s
+    n_low = int(round(f[0]/df))
+    if not np.isclose(n_low*df, f[0], rtol=1e-6):
+        raise ValueError("the frequency grid has to be uniform and contain f=0 on its raster")
+    f_low = np.arange(n_low) * df
+    slope = (s[..., 1] - s[..., 0]) / df
+    s_low = s[..., :1] + slope[..., None] * (f_low - f[0])
+    s_low[..., 0] = s_low[..., 0].real
+    return np.concatenate([f_low, f]), np.concatenate([s_low, s], axis=-1)
+
+
+def tdr(f, s, Z0=50, window="hamming", pad=4, dc=True, beta=6.0):
+    """
+    Impulse/step response and impedance profile of reflection coefficients `s`.
+
+    f:       uniform frequency grid (Hz), shape (nf,)
+    s:       reflection coefficients, shape (..., nf)
+    Z0:      reference impedance, scalar or broadcastable to s[..., 0]
+    window:  one-sided window applied before the transform
+    pad:     zero padding factor, interpolates the time axis
+    dc:      extrapolate the data down to DC first (needed if f[0] > 0)
+
+    The time axis covers 0 <= t < 1/(2*df).
+    """
+    f = np.asarray(f, dtype=float)
+    s = np.asarray(s, dtype=complex)
+    if dc:
+        f, s = extrapolate_to_dc(f, s)
+    nf = len(f)
+    df = f[1] - f[0]
+
+    spec = s * half_window(nf, window, beta)
+    n_t = 2*(nf - 1)*pad
+    # impulse samples are h(t)*dt, so the step response settles at s(f=0)
+    impulse = np.fft.irfft(spec, n=n_t, axis=-1)
+    # the window spreads the impulse symmetrically around t=0 and the
+    # negative times wrap to the end of the period: integrate from -T/2
+    # and return the causal half 0 <= t < T/2
+    half = n_t // 2
+    step = np.cumsum(np.roll(impulse, half, axis=-1), axis=-1)[..., half:]
+    impulse = impulse[..., :half]
+    t = np.arange(half) / (n_t*df)
+
+    Z0 = np.asarray(Z0, dtype=float)[..., None] if np.ndim(Z0) else Z0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        Z = Z0 * (1 + step) / (1 - step)
+    return TDRResult(t, impulse, step, Z)
+
+
+def tdr_ports(f, ports, Z0=None, **kw):
+    """
+    TDR of a list of ports after CalcPort, stacked along the first axis.
+
+    The reference impedance defaults to each port's Z_ref.
+    """
+    s = np.stack([reflection(p) for p in ports])
+    if Z0 is None:
+        Z0 = np.array([np.real(np.mean(p.Z_ref)) for p in ports])
+    return tdr(f, s, Z0, **kw)
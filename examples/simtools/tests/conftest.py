@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the examples directory, which holds the simtools package
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
@@ -0,0 +1,54 @@
+import numpy as np
+
+from simtools.adaptive import adaptive_sweep, use_adaptive, ADAPTIVE_ENV
+
+
+def notch(f, f0=3e9, q=50):
+    # exact zero at f0
+    x = f/f0 - f0/f
+    return (1j*q*x / (1 + 1j*q*x))[:, None]
+
+
+def test_exact_zero_terminates():
+    calls = []
+
+    def func(f):
+        calls.append(len(f))
+        return notch(f)
+
+    sweep = adaptive_sweep(func, 1e9, 5e9, max_points=801)
+    assert len(sweep.f) < 801
+    assert len(np.unique(sweep.f)) == len(sweep.f)
+    assert np.all(np.diff(sweep.f) > 0)
+    assert sum(calls) == len(sweep.f)
+    # refined around the notch
+    assert np.min(np.abs(sweep.f - 3e9)) < 1e-3 * 4e9
+
+
+def test_samples_match_function():
+    sweep = adaptive_sweep(notch, 1e9, 5e9)
+    np.testing.assert_allclose(sweep.H, notch(sweep.f))
+
+
+def test_smooth_response_keeps_initial_grid():
+    sweep = adaptive_sweep(lambda f: np.exp(-1j*f/1e10)[:, None], 1e9, 2e9, n_init=33)
+    np.testing.assert_allclose(sweep.f, np.linspace(1e9, 2e9, 33))
+
+
+def test_point_budget():
+    sweep = adaptive_sweep(notch, 1e9, 5e9, max_points=60)
+    assert len(sweep.f) <= 60
+
+
+def test_model_fits_samples():
+    sweep = adaptive_sweep(notch, 1e9, 5e9)
+    assert sweep.rms_error() < 1e-2
+
+
+def test_use_adaptive(monkeypatch):
+    monkeypatch.delenv(ADAPTIVE_ENV, raising=False)
+    assert use_adaptive() and not use_adaptive(False)
+    monkeypatch.setenv(ADAPTIVE_ENV, "0")
+    assert not use_adaptive(True)
+    monkeypatch.setenv(ADAPTIVE_ENV, "1")
+    assert use_adaptive(False)
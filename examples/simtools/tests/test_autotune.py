@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from simtools import autotune
+from simtools.autotune import ThreadTable, bucket, candidates, engine_speed, burst, calibrate, tuned_threads
+
+
+class FakeFDTD:
+    """ Reports a speed growing with the thread count, like the engine does at the end of a run """
+
+    def SetNumberOfTimeSteps(self, nrts):
+        self.nrts = nrts
+
+    def SetEndCriteria(self, value):
+        self.end_criteria = value
+
+    def Run(self, sim_path, cleanup=False, numThreads=0):
+        assert self.nrts == 10 and self.end_criteria == 0
+        os.write(1, f"Time for 10 iterations with 1000 cells : 0.01 sec\nSpeed: {10*numThreads:.1f} MCells/s \n".encode())
+
+
+def test_bucket():
+    assert bucket(1) == "b0"
+    assert bucket(100e3) == bucket(105e3)
+    assert bucket(100e3) != bucket(150e3)
+    assert bucket(0) == "b0"
+
+
+def test_candidates():
+    assert candidates(1) == [1]
+    assert candidates(8) == [1, 2, 4, 8]
+    assert candidates(6) == [1, 2, 4, 6]
+
+
+def test_engine_speed():
+    out = b"Speed: 12.5 MCells/s\n...\nSpeed:  1.25e2 MCells/s (1e-3 s)\n"
+    assert engine_speed(out) == 125.0
+    assert engine_speed(b"no speed report") is None
+    assert engine_speed(b"Speed: 0 MCells/s") is None
+
+
+def test_burst():
+    wall, speed = burst(FakeFDTD(), 3, 10)
+    assert wall >= 0 and speed == 30.0
+
+
+def test_thread_table(tmp_path):
+    fn = tmp_path / "threads.json"
+    table = ThreadTable(fn)
+    assert table.get(1e5, host="a") is None
+    table.put(1e5, 4, {1: 10.0, 4: 35.0}, host="a")
+    table.put(1e6, 8, {8: 50.0}, host="b")
+    table = ThreadTable(fn)
+    assert table.get(1.05e5, host="a") == 4
+    assert table.get(1e6, host="a") is None
+    assert table.data["a"][bucket(1e5)]["mcells_per_s"] == {"1": 10.0, "4": 35.0}
+    table.clear("a")
+    assert ThreadTable(fn).data == {"b": table.data["b"]}
+
+
+def test_calibrate_prefers_fewest_threads(monkeypatch):
+    rates = {1: 10.0, 2: 19.0, 4: 30.0, 8: 29.0, 16: None}
+    monkeypatch.setattr(autotune, "throughput", lambda FDTD, cells, n, nrts: rates[n])
+    best, measured = calibrate(None, 1e5, 16)
+    assert best == 4
+    assert 16 not in measured
+    monkeypatch.setattr(autotune, "throughput", lambda FDTD, cells, n, nrts: None)
+    with pytest.raises(RuntimeError):
+        calibrate(None, 1e5, 4)
+
+
+def test_tuned_threads_modes(monkeypatch, tmp_path):
+    table = ThreadTable(tmp_path / "threads.json")
+    monkeypatch.setattr(autotune, "calibrate", lambda FDTD, cells, max_threads: (4, {4: 40.0}))
+    monkeypatch.setenv(autotune.AUTOTUNE_ENV, "cached")
+    assert tuned_threads(None, 1e5, 8, table) is None
+    monkeypatch.setenv(autotune.AUTOTUNE_ENV, "calibrate")
+    assert tuned_threads(None, 1e5, 8, table) == 4
+    monkeypatch.setenv(autotune.AUTOTUNE_ENV, "cached")
+    assert tuned_threads(None, 1e5, 8, table) == 4
+    # the thread budget caps the stored count
+    assert tuned_threads(None, 1e5, 2, table) == 2
+    monkeypatch.setenv(autotune.AUTOTUNE_ENV, "off")
+    assert tuned_threads(None, 1e5, 8, table) is None
@@ -0,0 +1,25 @@
+import numpy as np
+
+from simtools.benchmark import coarsen_lines, summarize
+
+
+def test_coarsen_keeps_ends():
+    np.testing.assert_allclose(coarsen_lines(np.arange(10.0), 2), [0, 2, 4, 6, 8, 9])
+    np.testing.assert_allclose(coarsen_lines([2.0, 0.0, 1.0], 1), [0, 1, 2])
+
+
+def test_coarsen_keeps_primitive_faces():
+    lines = np.linspace(0, 10, 11)
+    # a port at 3 and a thin layer between 6.99999 and 7
+    out = coarsen_lines(lines, 2, keep=[3.0, 7.0, 6.99999, 42.0])
+    np.testing.assert_allclose(out, [0, 2, 3, 4, 6, 7, 8, 10])
+
+
+def test_summarize():
+    rep = {"info": {"mesh_cells": 1e6, "max_timesteps": 100, "threads": 4}, "total_wall_time": 5.0,
+           "peak_rss_mb": 100.0,
+           "phases": [{"name": "mesh", "wall_time": 1.0}, {"name": "FDTD.Run", "wall_time": 2.0},
+                      {"name": "CalcPort", "wall_time": 0.5}]}
+    res = summarize(rep)
+    assert res["setup_time"] == 1.0 and res["postproc_time"] == 0.5
+    assert res["mcells_per_s"] == 50.0
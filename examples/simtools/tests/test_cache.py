@@ -0,0 +1,107 @@
+import os
+import json
+import time
+from types import SimpleNamespace
+
+from simtools.cache import ResultCache, simulation_key, manifest, check_manifest, read_marker, MARKER, ENTRY
+
+
+class FakeFDTD:
+    """ Writes a fixed setup and counts engine runs """
+
+    def __init__(self, setup="<openEMS/>"):
+        self.setup = setup
+        self.runs = 0
+
+    def Write2XML(self, fn):
+        with open(fn, "w") as f:
+            f.write(self.setup)
+
+    def Run(self, sim_path, **kw):
+        self.runs += 1
+        os.makedirs(sim_path, exist_ok=True)
+        with open(os.path.join(sim_path, "port_ut_1"), "w") as f:
+            f.write(self.setup * 10)
+
+
+def write_results(path, files):
+    path.mkdir(parents=True, exist_ok=True)
+    for fn, data in files.items():
+        (path / fn).write_bytes(data)
+
+
+def test_key_stability(tmp_path):
+    geo = tmp_path / "geometry.xml"
+    geo.write_text("<CSX/>")
+    key = simulation_key(FakeFDTD(), geo)
+    assert key == simulation_key(FakeFDTD(), geo)
+    assert simulation_key(FakeFDTD(), geo, extra={"a": 1, "b": 2}) == simulation_key(FakeFDTD(), geo, extra={"b": 2, "a": 1})
+    assert key != simulation_key(FakeFDTD("<openEMS NrTS='1'/>"), geo)
+    geo.write_text("<CSX> </CSX>")
+    assert key != simulation_key(FakeFDTD(), geo)
+
+
+def test_manifest(tmp_path):
+    write_results(tmp_path, {"a": b"12", MARKER: b"{}"})
+    write_results(tmp_path / "sub", {"b": b"123"})
+    files = manifest(tmp_path)
+    assert files == {"a": 2, os.path.join("sub", "b"): 3}
+    assert check_manifest(tmp_path, files)
+    (tmp_path / "a").write_bytes(b"1")
+    assert not check_manifest(tmp_path, files)
+    (tmp_path / "a").unlink()
+    assert not check_manifest(tmp_path, files)
+    assert not check_manifest(tmp_path, None)
+
+
+def test_store_restore(tmp_path):
+    cache = ResultCache(tmp_path / "cache")
+    write_results(tmp_path / "sim", {"port_ut_1": b"data"})
+    cache.store("k1", tmp_path / "sim", name="sim")
+    assert cache.valid("k1")
+    assert cache.restore("k1", tmp_path / "out")
+    assert (tmp_path / "out" / "port_ut_1").read_bytes() == b"data"
+    # an incomplete entry is not restored
+    (cache.entry_path("k1") / "results" / "port_ut_1").unlink()
+    assert not cache.valid("k1")
+    assert not cache.restore("k1", tmp_path / "out2")
+    # a directory holding foreign files is not replaced
+    cache.store("k2", tmp_path / "sim")
+    write_results(tmp_path / "mine", {"notes.txt": b"keep"})
+    assert not cache.restore("k2", tmp_path / "mine")
+    assert (tmp_path / "mine" / "notes.txt").exists()
+
+
+def test_lru_trim(tmp_path):
+    cache = ResultCache(tmp_path / "cache", max_bytes=10**6)
+    for n, key in enumerate(("old", "mid", "new")):
+        write_results(tmp_path / key, {"f": bytes(100)})
+        cache.store(key, tmp_path / key)
+        fn = cache.entry_path(key) / ENTRY
+        info = json.loads(fn.read_text())
+        info["last_used"] = time.time() + n
+        fn.write_text(json.dumps(info))
+    assert [e["key"] for e in cache.entries()] == ["old", "mid", "new"]
+    assert cache.evict(250) == ["old"]
+    assert [e["key"] for e in cache.entries()] == ["mid", "new"]
+    assert cache.evict(0) == ["mid", "new"]
+
+
+def test_run_reuses_results(tmp_path):
+    cache = ResultCache(tmp_path / "cache")
+    sim = SimpleNamespace(name="sim", sim_path=tmp_path / "sim", geometry_file=None)
+    FDTD = FakeFDTD()
+    assert not cache.run(FDTD, sim)
+    assert FDTD.runs == 1
+    assert read_marker(sim.sim_path)["files"] == {"port_ut_1": 100}
+    # up to date: neither run nor restore
+    assert cache.run(FDTD, sim)
+    # removed results come back from the cache
+    (sim.sim_path / "port_ut_1").unlink()
+    assert cache.run(FDTD, sim)
+    assert FDTD.runs == 1
+    assert (sim.sim_path / "port_ut_1").exists()
+    # a changed model runs again
+    assert not cache.run(FakeFDTD("<changed/>"), sim)
+    assert cache.invalidate(sim_path=sim.sim_path)
+    assert read_marker(sim.sim_path) is None
@@ -0,0 +1,36 @@
+import numpy as np
+
+from simtools.crossings import zero_crossings, first_crossing, local_slope
+
+
+x = np.linspace(0, 10, 201)
+
+
+def test_first_crossing_per_row():
+    y = np.stack([x - 2.5, 7.25 - x, np.ones_like(x)])
+    x0, i = first_crossing(x, y)
+    np.testing.assert_allclose(x0[:2], [2.5, 7.25])
+    assert np.isnan(x0[2]) and i[2] == -1
+    assert x[i[0]] <= 2.5 <= x[i[0] + 1]
+
+
+def test_direction():
+    y = np.sin(x)
+    x_rise, _ = first_crossing(x, y, rising=True)
+    x_fall, _ = first_crossing(x, y, rising=False)
+    np.testing.assert_allclose(x_rise, 2*np.pi, atol=1e-3)
+    np.testing.assert_allclose(x_fall, np.pi, atol=1e-3)
+
+
+def test_all_crossings():
+    y = np.stack([np.sin(x), np.cos(x)])
+    rows, i, x0 = zero_crossings(x, y)
+    np.testing.assert_allclose(x0[rows[0] == 0], [np.pi, 2*np.pi, 3*np.pi], atol=1e-3)
+    np.testing.assert_allclose(x0[rows[0] == 1], [np.pi/2, 3*np.pi/2, 5*np.pi/2], atol=1e-3)
+
+
+def test_local_slope():
+    y = np.stack([3*x - 1, -0.5*x + 2])
+    _, i = first_crossing(x, y)
+    np.testing.assert_allclose(local_slope(x, y, i), [3, -0.5])
+    assert np.isnan(local_slope(x, y, np.array([-1, 5]))[0])
@@ -0,0 +1,111 @@
+import os
+
+import numpy as np
+import pytest
+
+from simtools.dumps import PRESETS, PRESET_ENV, get_preset, roi, add_dump, dump_files, repack, repack_all, benchmark
+
+
+class FakeDump:
+    def AddBox(self, start, stop, priority=0):
+        self.box = (start, stop, priority)
+
+
+class FakeCSX:
+    def AddDump(self, name, **kw):
+        self.dump = FakeDump()
+        self.name, self.kw = name, kw
+        return self.dump
+
+
+def write_td_dump(fn, nt=8, shape=(10, 12, 14)):
+    """ openEMS style time domain dump with nt steps of (3, nz, ny, nx) """
+    h5py = pytest.importorskip("h5py")
+    nx, ny, nz = shape
+    with h5py.File(fn, "w") as f:
+        mesh = f.create_group("Mesh")
+        mesh.attrs["MeshType"] = 0
+        for n, axis in zip(shape, "xyz"):
+            mesh[axis] = np.arange(n, dtype=float)
+        td = f.create_group("FieldData/TD")
+        for k in range(nt):
+            ds = td.create_dataset(f"{10*k:08d}", data=np.full((3, nz, ny, nx), k, dtype=np.float32))
+            ds.attrs["time"] = [k * 1e-12]
+
+
+def test_get_preset(monkeypatch):
+    monkeypatch.delenv(PRESET_ENV, raising=False)
+    assert get_preset() == PRESETS["compressed"]
+    # unset (None) overrides keep the preset value
+    p = get_preset("decimated", time_decimation=8, compression=None)
+    assert p.time_decimation == 8 and p.compression == "gzip"
+    assert get_preset("raw", frequencies=(1e9,)).domain == "freq"
+    assert not get_preset("vtk").needs_repack and get_preset("decimated").needs_repack
+    monkeypatch.setenv(PRESET_ENV, "vtk")
+    assert get_preset("compressed").file_type == "vtk"
+    monkeypatch.setenv(PRESET_ENV, "nonsense")
+    with pytest.raises(ValueError):
+        get_preset()
+
+
+def test_roi():
+    assert roi([0, 0, 0], [2, 4, 6]) == ([0, 0, 0], [2, 4, 6])
+    assert roi([0, 0, 0], [2, 4, 6], "plane-z") == ([0, 0, 3], [2, 4, 3])
+    assert roi([0, 0, 0], [2, 4, 6], "plane-y", 1) == ([0, 1, 0], [2, 1, 6])
+    with pytest.raises(ValueError):
+        roi([0, 0, 0], [1, 1, 1], "plane-w")
+
+
+def test_add_dump(monkeypatch):
+    monkeypatch.delenv(PRESET_ENV, raising=False)
+    CSX = FakeCSX()
+    _, p = add_dump(CSX, "Et", [0, 0, 0], [1, 1, 1], "subsampled", priority=2)
+    assert CSX.kw == dict(dump_type=0, dump_mode=1, file_type=1, sub_sampling=[2, 2, 2])
+    assert CSX.dump.box == ([0, 0, 0], [1, 1, 1], 2)
+    add_dump(CSX, "Hf", [0, 0, 0], [1, 1, 1], "freq", field="H", frequencies=(1e9, 2e9))
+    assert CSX.kw["dump_type"] == 11 and CSX.kw["frequency"] == [1e9, 2e9]
+    with pytest.raises(ValueError):
+        add_dump(CSX, "Ef", [0, 0, 0], [1, 1, 1], "freq")
+
+
+def test_dump_files(tmp_path):
+    for fn in ("Et.h5", "Et_0001.vtr", "Et_0002.vtr", "Etx.h5", "Et.txt"):
+        (tmp_path / fn).touch()
+    assert [p.name for p in dump_files(tmp_path, "Et")] == ["Et.h5", "Et_0001.vtr", "Et_0002.vtr"]
+
+
+def test_repack(tmp_path):
+    h5py = pytest.importorskip("h5py")
+    fn = tmp_path / "Et.h5"
+    write_td_dump(fn)
+    before, after = repack(fn, get_preset("decimated", time_decimation=3))
+    assert after < before
+    with h5py.File(fn, "r") as f:
+        td = f["FieldData/TD"]
+        assert sorted(td) == ["00000000", "00000030", "00000060"]
+        assert td["00000030"].compression == "gzip"
+        assert td["00000030"].attrs["time"][0] == 3e-12
+        np.testing.assert_array_equal(td["00000060"][()], 6)
+        assert f["Mesh"].attrs["MeshType"] == 0
+    # only dumps whose preset needs it are repacked
+    assert repack_all(tmp_path, {"Et": get_preset("raw")}, verbose=False) == {}
+
+
+def test_benchmark(tmp_path):
+    # stands in for an example: writes a profiling report like Simulation.write_report
+    script = tmp_path / "ex.py"
+    script.write_text(
+        "import os, json\n"
+        "preset = os.environ['OPENEMS_DUMP_PRESET']\n"
+        "assert os.environ['OPENEMS_CACHE'] == '0' and os.environ['OPENEMS_NUM_THREADS'] == '2'\n"
+        "os.makedirs(os.environ['OPENEMS_PROFILE_DIR'])\n"
+        "rep = {'phases': [{'name': 'FDTD.Run', 'wall_time': 3.0}],\n"
+        "       'info': {'dump_repack_time': 1.0, 'dump_bytes': {'Et': len(preset)}}}\n"
+        "json.dump(rep, open(os.path.join(os.environ['OPENEMS_PROFILE_DIR'], 'ex.json'), 'w'))\n"
+        "raise SystemExit(preset == 'raw')\n")
+    res = benchmark(script, ["vtk", "raw"], threads=2, log_dir=tmp_path / "logs")
+    assert res["vtk"]["ok"] and not res["raw"]["ok"]
+    assert res["vtk"]["run_time"] == 2.0 and res["vtk"]["repack_time"] == 1.0
+    assert res["vtk"]["dump_bytes"] == 3 and res["raw"]["dump_bytes"] == 3
+    assert (tmp_path / "logs" / "ex-raw.log").exists()
+    assert PRESET_ENV not in os.environ
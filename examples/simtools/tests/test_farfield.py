@@ -0,0 +1,31 @@
+import numpy as np
+
+from simtools.farfield import FarField, FIELDS, _indices
+
+
+def farfield(nf=3, nt=5, npx=4):
+    rng = np.random.default_rng(0)
+    data = {k: rng.normal(size=(nf, nt, npx)) for k in FIELDS}
+    return FarField(freq=np.linspace(1e9, 3e9, nf), theta=np.linspace(0, 180, nt), phi=np.linspace(0, 270, npx),
+                    r=1.0, Dmax=np.arange(nf, dtype=float), Prad=np.arange(nf, dtype=float), **data)
+
+
+def test_indices():
+    np.testing.assert_array_equal(_indices([90, 0], np.linspace(0, 180, 5)), [2, 0])
+    assert _indices([10], np.linspace(0, 180, 5)) is None
+
+
+def test_subset():
+    ff = farfield()
+    sub = ff.subset(np.array([2]), np.array([0, 4]), np.array([1]))
+    assert sub.E_norm.shape == (1, 2, 1)
+    np.testing.assert_array_equal(sub.E_norm[0, :, 0], ff.E_norm[2, [0, 4], 1])
+    np.testing.assert_array_equal(sub.Prad, [2.0])
+
+
+def test_save_load(tmp_path):
+    ff = farfield()
+    ff.save(tmp_path / "ff.npz")
+    ff2 = FarField.load(tmp_path / "ff.npz")
+    for k in FIELDS + ("freq", "theta", "phi", "Dmax"):
+        np.testing.assert_array_equal(getattr(ff2, k), getattr(ff, k))
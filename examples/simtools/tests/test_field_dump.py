@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from simtools.dumps import FieldDump, open_dump, repack, get_preset
+
+h5py = pytest.importorskip("h5py")
+
+NX, NY, NZ = 4, 5, 6
+
+
+def field(k):
+    """ Distinct values per timestep, component and position, stored as (3, nz, ny, nx) """
+    c, z, y, x = np.meshgrid(np.arange(3), np.arange(NZ), np.arange(NY), np.arange(NX), indexing="ij")
+    return (1000*k + 100*c + 10*z + y + x/10).astype(np.float32)
+
+
+def write_dump(fn, nt=6, cylindrical=False):
+    with h5py.File(fn, "w") as f:
+        mesh = f.create_group("Mesh")
+        mesh.attrs["MeshType"] = int(cylindrical)
+        for n, axis in zip((NX, NY, NZ), ("rho", "alpha", "z") if cylindrical else ("x", "y", "z")):
+            mesh[axis] = np.linspace(0, 1, n)
+        td = f.create_group("FieldData/TD")
+        for k in range(nt):
+            td.create_dataset(f"{5*k:08d}", data=field(k)).attrs["time"] = [k * 1e-12]
+
+
+def test_memmap_matches_h5py(tmp_path):
+    fn = tmp_path / "Et.h5"
+    write_dump(fn)
+    with open_dump(tmp_path, "Et") as Et:
+        assert Et.shape == (6, NX, NY, NZ, 3)
+        np.testing.assert_allclose(Et.time, np.arange(6) * 1e-12)
+        # contiguous datasets are memory-mapped
+        assert isinstance(Et._dataset(0), np.memmap)
+        np.testing.assert_array_equal(Et[2], field(2).T)
+        np.testing.assert_array_equal(Et[:, 1, :, 3, 2], np.stack([field(k)[2, 3, :, 1] for k in range(6)]))
+        np.testing.assert_array_equal(Et[[0, 5], 0, 0, 0], [field(0)[:, 0, 0, 0], field(5)[:, 0, 0, 0]])
+        assert len(list(Et)) == 6
+        with pytest.raises(IndexError):
+            Et[0, [0, 1]]
+
+
+def test_compressed_and_decimated(tmp_path):
+    fn = tmp_path / "Et.h5"
+    write_dump(fn)
+    repack(fn, get_preset("decimated", time_decimation=2))
+    with FieldDump(fn) as Et:
+        assert len(Et) == 3
+        np.testing.assert_allclose(Et.time, [0, 2e-12, 4e-12])
+        # compressed datasets are read through h5py
+        assert not isinstance(Et._dataset(1), np.memmap)
+        np.testing.assert_array_equal(Et[1], field(2).T)
+        np.testing.assert_array_equal(Et[-1, :, 2, :, 0], field(4)[0, :, 2, :].T)
+
+
+def test_cylindrical_mesh(tmp_path):
+    write_dump(tmp_path / "Et.h5", nt=1, cylindrical=True)
+    with open_dump(tmp_path, "Et") as Et:
+        assert Et.coord_system == 1 and Et.axes == ("rho", "alpha", "z")
+        assert [len(l) for l in Et.lines] == [NX, NY, NZ]
+
+
+def test_missing_dump(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        open_dump(tmp_path, "Et")
+    (tmp_path / "Et_0001.vtr").touch()
+    with pytest.raises(ValueError):
+        open_dump(tmp_path, "Et")
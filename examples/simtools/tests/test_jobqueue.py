@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from simtools.jobqueue import Spool, new_job, run_job, main
+
+
+def test_claim_order_and_finish(tmp_path):
+    q = Spool(tmp_path / "spool")
+    first = q.submit(new_job("a/a.py", job_id="first"))
+    os.utime(q._path("incoming", first), (1, 1))
+    q.submit(new_job("b/b.py", job_id="second"))
+    job = q.claim("w1")
+    assert job["id"] == "first"
+    assert q.status("first")["state"] == "running"
+    q.finish(job, "done", returncode=0)
+    assert q.status("first")["state"] == "done"
+    assert q.claim("w2")["id"] == "second"
+    assert q.claim("w2") is None
+
+
+def test_recover_only_dead_workers(tmp_path):
+    q = Spool(tmp_path / "spool")
+    for job_id in ("alive", "dead"):
+        q.submit(new_job("a/a.py", job_id=job_id))
+        q.claim("w")
+    sleeper = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        q.set_status("alive", pid=sleeper.pid)
+        q.set_status("dead", pid=2**22 + 1)
+        assert q.recover("w") == ["dead"]
+        assert q.status("dead")["state"] == "queued"
+        assert q.status("alive")["state"] == "running"
+    finally:
+        sleeper.kill()
+
+
+def test_job_ids_and_scripts_stay_inside(tmp_path):
+    with pytest.raises(ValueError):
+        new_job("a/a.py", job_id="../x")
+    examples = tmp_path / "examples"
+    examples.mkdir()
+    with pytest.raises(ValueError):
+        run_job(new_job("../outside.py"), examples, tmp_path / "shared", tmp_path / "scratch", 1)
+
+
+def test_run_job(tmp_path):
+    examples = tmp_path / "examples"
+    (examples / "ex").mkdir(parents=True)
+    (examples / "ex" / "ex.py").write_text(
+        "import os\nopen('out.txt', 'w').write(os.environ['OPENEMS_RUN_MODE'] + os.environ['Y'])\n")
+    state, info = run_job(new_job("ex/ex.py", env={"Y": "!"}, job_id="j1"), examples, tmp_path / "shared",
+                          tmp_path / "scratch", 2)
+    assert state == "done" and info["returncode"] == 0
+    assert (tmp_path / "shared" / "j1" / "ex" / "out.txt").read_text() == "headless!"
+    assert not (examples / "ex" / "out.txt").exists()
+
+
+def test_scratch_copy_excludes(tmp_path):
+    examples = tmp_path / "examples"
+    for d in ("ex/data/run", "ex/results", "ex/lib"):
+        (examples / d).mkdir(parents=True)
+    (examples / "ex" / "data" / "run" / "big.h5").write_bytes(bytes(1000))
+    (examples / "ex" / "ex.py").write_text(
+        "import os\nseen = ' '.join(sorted(os.listdir('.')))\nopen('seen.txt', 'w').write(seen)\n")
+    run_job(new_job("ex/ex.py", job_id="j1"), examples, tmp_path / "shared", tmp_path / "scratch", 1)
+    assert (tmp_path / "shared" / "j1" / "ex" / "seen.txt").read_text() == "ex.py lib"
+    run_job(new_job("ex/ex.py", job_id="j2", exclude=["results*"]), examples, tmp_path / "shared",
+            tmp_path / "scratch", 1)
+    assert (tmp_path / "shared" / "j2" / "ex" / "seen.txt").read_text() == "data ex.py lib"
+
+
+def test_cli_queue_option(tmp_path, capsys):
+    spool = str(tmp_path / "spool")
+    assert main(["submit", "--queue", spool, "--id", "j1", "--exclude", "data", "ex/ex.py", "--mode", "headless"]) == 0
+    job = Spool(spool).claim("w")
+    assert job["args"] == ["--mode", "headless"] and job["exclude"] == ["data"]
+    capsys.readouterr()
+    assert main(["status", "--queue", spool]) == 0
+    assert "j1" in capsys.readouterr().out
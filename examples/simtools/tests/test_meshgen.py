@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from simtools.meshgen import MeshGenerator, dedup_lines, periodic_mesh_hint
+
+
+def generator(**kw):
+    gen = MeshGenerator(f_max=10e9, unit=1e-3, **kw)
+    gen.set_domain([-20, -20, -5], [20, 20, 10])
+    return gen
+
+
+def test_domain_bounds_kept():
+    gen = generator()
+    # metal edge and dielectric face close to the domain bounds
+    gen.add_metal([-19.99, -5, 1.5], [5, 5, 1.5])
+    gen.add_dielectric([-20, -20, 0], [20, 20, 1.5], 4.4)
+    for n, l in enumerate(gen.lines()):
+        assert l[0] == pytest.approx(gen.domain[0][n])
+        assert l[-1] == pytest.approx(gen.domain[1][n])
+        assert np.all(np.diff(l) > 0)
+
+
+def test_thin_metal_is_meshed():
+    gen = generator()
+    edge = gen.resolution() / 2
+    width = edge / 4
+    gen.add_metal([-width/2, -10, 0], [width/2, 10, 0])
+    x = gen.axis_lines(0)
+    inside = x[(x > -width/2) & (x < width/2)]
+    assert len(inside) == 1
+    assert np.all(np.diff(x) > 0)
+
+
+def test_thirds_rule():
+    gen = generator()
+    edge = gen.resolution() / 2
+    gen.add_metal([-5, -5, 0], [5, 5, 0])
+    x = gen.axis_lines(0)
+    for line in (5 - edge/3, 5 + 2*edge/3, -5 + edge/3, -5 - 2*edge/3):
+        assert np.min(np.abs(x - line)) < 1e-9
+
+
+def test_grading_and_resolution():
+    gen = generator(ratio=1.4)
+    gen.add_metal([-1, -1, 0], [1, 1, 0])
+    x = gen.axis_lines(0)
+    d = np.diff(x)
+    assert d.max() <= gen.resolution() * (1 + 1e-6)
+    assert np.max(d[1:] / d[:-1]) < 1.4 * 1.1
+
+
+def test_budget():
+    gen = generator()
+    gen.add_dielectric([-20, -20, 0], [20, 20, 1.5], 4.4)
+    full, _ = gen.generate()
+    budget = 0.5 * np.prod([len(l) - 1 for l in full])
+    lines, report = gen.generate(budget=budget)
+    assert report.cells <= budget
+
+
+def test_dedup_and_periodic_hint():
+    np.testing.assert_allclose(dedup_lines([3, 1, 1.0001, 2], tol=0.01), [1, 2, 3])
+    hint, counts = periodic_mesh_hint([[0, 0.5], [1], [2]], offsets=[0, 1, 2], tol=1e-9)
+    np.testing.assert_allclose(hint[0], [0, 0.5, 1, 1.5, 2, 2.5])
+    assert counts["unique"] == 8
@@ -0,0 +1,80 @@
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pytest
+
+from simtools.mpi import split, set_split, command, run, scaling, MIN_LINES
+
+XML = """<?xml version="1.0"?>
+<openEMS>
+  <FDTD NumberOfTimesteps="1000"><MPI SplitN_Z="3"/></FDTD>
+  <ContinuousStructure>
+    <RectilinearGrid DeltaUnit="1">
+      <XLines>{x}</XLines>
+      <YLines>{y}</YLines>
+      <ZLines>{z}</ZLines>
+    </RectilinearGrid>
+  </ContinuousStructure>
+</openEMS>
+"""
+
+
+def write_model(fn, nx=40, ny=32, nz=16):
+    fn.write_text(XML.format(**{a: ",".join(map(str, range(n))) for a, n in zip("xyz", (nx, ny, nz))}))
+    return fn
+
+
+def lines(*counts):
+    return [np.arange(n) for n in counts]
+
+
+def test_split_cuts_the_smallest_interfaces():
+    # cuts across the long axis have the smallest area
+    assert split(2, lines(64, 32, 16)) == (2, 1, 1)
+    assert split(4, lines(128, 32, 16)) == (4, 1, 1)
+    assert split(4, lines(32, 128, 16)) == (1, 4, 1)
+    assert split(1, lines(4, 4, 4)) == (1, 1, 1)
+    # a cube is cut in all directions
+    assert split(8, lines(64, 64, 64)) == (2, 2, 2)
+
+
+def test_split_min_lines():
+    n = 3*MIN_LINES
+    assert split(3, lines(n, MIN_LINES, MIN_LINES)) == (3, 1, 1)
+    assert split(4, lines(n, MIN_LINES, MIN_LINES)) is None
+    assert split(7, lines(40, 16, 16)) is None
+
+
+def test_set_split(tmp_path):
+    fn = write_model(tmp_path / "model.xml")
+    out = tmp_path / "split.xml"
+    set_split(fn, (2, 1, 4), out)
+    mpi = ET.parse(out).getroot().findall(".//FDTD/MPI")
+    assert len(mpi) == 1
+    assert mpi[0].attrib == {"SplitN_X": "2", "SplitN_Z": "4"}
+    # the source is unchanged
+    assert ET.parse(fn).getroot().find(".//FDTD/MPI").attrib == {"SplitN_Z": "3"}
+    (tmp_path / "csx.xml").write_text("<ContinuousStructure/>")
+    with pytest.raises(ValueError):
+        set_split(tmp_path / "csx.xml", (2, 1, 1))
+
+
+def test_command(monkeypatch):
+    monkeypatch.setenv("OPENEMS_BIN", "/opt/openEMS/bin/openEMS")
+    assert command("model.xml", 4, "mpirun --oversubscribe", ["--hostfile", "hosts"]) == [
+        "mpirun", "--oversubscribe", "-n", "4", "--hostfile", "hosts",
+        "/opt/openEMS/bin/openEMS", "model.xml", "--engine=MPI"]
+
+
+def test_run_and_scaling(tmp_path):
+    fn = write_model(tmp_path / "model.xml")
+    log = tmp_path / "run.log"
+    assert run(fn, 2, tmp_path / "sim", mpirun="echo mpirun", log=log) >= 0
+    assert log.read_text().split() == ["mpirun", "-n", "2", "openEMS", "model.xml", "--engine=MPI"]
+    assert ET.parse(tmp_path / "sim" / "model.xml").getroot().find(".//FDTD/MPI").attrib == {"SplitN_X": "2"}
+    with pytest.raises(ValueError):
+        run(fn, 4, tmp_path / "sim", parts=(2, 1, 1), mpirun="echo mpirun")
+    res = scaling(fn, [2, 1, 7], tmp_path / "scaling", mpirun="echo mpirun")
+    assert [r["ranks"] for r in res["results"]] == [1, 2]
+    assert res["cells"] == 39 * 31 * 15
+    assert res["results"][0]["speedup"] == 1.0
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from simtools.network import Network, s2abcd, abcd2s, s2z, s2y, z2s, two_port, bloch_phase
+
+
+def random_s(nf, N, seed=1):
+    rng = np.random.default_rng(seed)
+    return (rng.normal(size=(nf, N, N)) + 1j*rng.normal(size=(nf, N, N))) / 4
+
+
+def test_z_round_trip():
+    S = random_s(7, 3)
+    np.testing.assert_allclose(z2s(s2z(S, 50), 50), S, atol=1e-12)
+    np.testing.assert_allclose(z2s(s2z(S, 75), 75), S, atol=1e-12)
+
+
+def test_y_is_inverse_of_z():
+    S = random_s(5, 2)
+    np.testing.assert_allclose(s2y(S) @ s2z(S), np.broadcast_to(np.eye(2), S.shape), atol=1e-12)
+
+
+def test_frequency_dependent_reference():
+    S = random_s(4, 2)
+    z_ref = np.array([40, 50, 60, 70])
+    np.testing.assert_allclose(z2s(s2z(S, z_ref), z_ref), S, atol=1e-12)
+
+
+class Port:
+    """ Port voltages and currents of port `i` when port `j` of the network S is driven """
+
+    def __init__(self, S, i, j, Z_ref=50):
+        self.Z_ref = Z_ref
+        self.uf_inc = np.full(len(S), 1.0 if i == j else 0.0) * np.sqrt(Z_ref)
+        self.uf_ref = S[:, i, j] * np.sqrt(Z_ref)
+        self.uf_tot = self.uf_inc + self.uf_ref
+        self.if_tot = (self.uf_inc - self.uf_ref) / Z_ref
+
+
+def excitation(S, j):
+    return [Port(S, i, j) for i in range(S.shape[-1])]
+
+
+def test_from_excitations():
+    S = random_s(5, 3)
+    net = Network.from_excitations({j + 1: excitation(S, j) for j in range(3)})
+    np.testing.assert_allclose(net.S, S, atol=1e-12)
+    np.testing.assert_allclose(net.Z, s2z(S), atol=1e-9)
+    # input impedance of a driven port with the others matched
+    np.testing.assert_allclose(net.Z_in[:, 1], 50*(1 + S[:, 1, 1])/(1 - S[:, 1, 1]))
+
+
+def test_incomplete_network():
+    S = random_s(5, 3)
+    net = Network.from_excitations({1: excitation(S, 0), 3: excitation(S, 2)})
+    np.testing.assert_allclose(net.S[:, :, 2], S[:, :, 2])
+    assert np.isnan(net.S[:, :, 1]).all() and np.isnan(net.Z_in[:, 1]).all()
+    with pytest.raises(ValueError, match=r"\[2\]"):
+        net.Z
+
+
+def test_from_ports_symmetric():
+    S = two_port(random_s(4, 1)[:, 0, 0], random_s(4, 1, seed=2)[:, 0, 0])
+    net = Network.from_ports(excitation(S, 1), excite=2, symmetric=True)
+    np.testing.assert_allclose(net.S, S, atol=1e-12)
+    np.testing.assert_allclose(net.ABCD, s2abcd(S), atol=1e-12)
+    with pytest.raises(ValueError):
+        Network.from_ports(excitation(S, 0)).ABCD
+
+
+def test_abcd_round_trip():
+    S = random_s(6, 2)
+    np.testing.assert_allclose(abcd2s(s2abcd(S)), S, atol=1e-12)
+
+
+def test_series_impedance():
+    # a series impedance Z has A = D = 1, B = Z, C = 0
+    Z = 25 + 10j
+    T = np.array([[[1, Z], [0, 1]]], dtype=complex)
+    S = abcd2s(T, 50)
+    np.testing.assert_allclose(S[0, 0, 0], Z/(Z + 100))
+    np.testing.assert_allclose(S[0, 1, 0], 100/(Z + 100))
+    np.testing.assert_allclose(s2abcd(S, 50), T, atol=1e-12)
+
+
+def test_cascade_is_matrix_product():
+    T1 = s2abcd(random_s(3, 2, seed=2))
+    T2 = s2abcd(random_s(3, 2, seed=3))
+    S = abcd2s(T1 @ T2)
+    np.testing.assert_allclose(s2abcd(S), T1 @ T2, atol=1e-10)
+
+
+def test_two_port_reciprocal_symmetric():
+    s11, s21 = np.array([0.1, 0.2]), np.array([0.9, 0.8])
+    S = two_port(s11, s21)
+    assert S.shape == (2, 2, 2)
+    np.testing.assert_array_equal(S[:, 0, 1], s21)
+    np.testing.assert_array_equal(S[:, 1, 1], s11)
+
+
+def test_bloch_phase_of_matched_line():
+    # lossless matched line of electrical length theta: A = D = cos(theta)
+    theta = np.array([0.3, 1.0, 2.0])
+    T = np.zeros((3, 2, 2), dtype=complex)
+    T[:, 0, 0] = T[:, 1, 1] = np.cos(theta)
+    T[:, 0, 1] = 50j*np.sin(theta)
+    T[:, 1, 0] = 1j*np.sin(theta)/50
+    np.testing.assert_allclose(bloch_phase(T), 1j*theta, atol=1e-7)
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from simtools.nport import run_excitations, calc_network, s_matrix
+
+
+class FakeFDTD:
+    """ Records the thread count of its run in the simulation directory """
+
+    def Run(self, sim_path, numThreads=0, **kw):
+        with open(f"{sim_path}.run", "w") as f:
+            f.write(f"{numThreads} {kw.get('cleanup')}")
+
+
+class FakePort:
+    """ Port of an ideal N-port with the given S-matrix column per excitation """
+
+    def __init__(self, number, S):
+        self.number = number
+        self.S = S
+
+    def CalcPort(self, sim_path, freq, ref_impedance=None):
+        exciteport = int(sim_path.rsplit("_", 1)[1])
+        self.Z_ref = ref_impedance
+        self.uf_inc = np.full(len(freq), 2.0) if self.number == exciteport else np.zeros(len(freq))
+        self.uf_ref = 2.0 * self.S[:, self.number - 1, exciteport - 1]
+        self.uf_tot = self.uf_inc + self.uf_ref
+        self.if_tot = (self.uf_inc - self.uf_ref) / ref_impedance
+
+
+@pytest.mark.parametrize("max_parallel", [1, None])
+def test_run_excitations(tmp_path, max_parallel):
+    models = {p: (FakeFDTD(), tmp_path / f"excite_{p}") for p in (1, 2)}
+    run_excitations(models, total_threads=4, max_parallel=max_parallel, cleanup=True)
+    threads = 4 if max_parallel == 1 else 2
+    for p in (1, 2):
+        assert (tmp_path / f"excite_{p}.run").read_text() == f"{threads} True"
+
+
+def test_s_matrix():
+    freq = np.array([1e9, 2e9])
+    rng = np.random.default_rng(0)
+    S = rng.normal(size=(2, 3, 3)) + 1j*rng.normal(size=(2, 3, 3))
+    excitations = {p: ([FakePort(n, S) for n in (1, 2, 3)], f"excite_{p}") for p in (1, 3)}
+    res = s_matrix(excitations, freq)
+    np.testing.assert_allclose(res[:, :, 0], S[:, :, 0])
+    np.testing.assert_allclose(res[:, :, 2], S[:, :, 2])
+    assert np.all(np.isnan(res[:, :, 1]))
+
+
+def test_calc_network():
+    freq = np.array([1e9])
+    S = np.array([[[0.2, 0.7], [0.7, 0.1j]]])
+    excitations = {p: ([FakePort(n, S) for n in (1, 2)], f"excite_{p}") for p in (1, 2)}
+    net = calc_network(excitations, freq, ref_impedance=25)
+    np.testing.assert_allclose(net.S, S)
+    np.testing.assert_allclose(net.Z_in[:, 0], 25*1.2/0.8)
+    np.testing.assert_allclose(net.z_ref, 25)
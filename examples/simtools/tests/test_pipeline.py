@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from simtools import Simulation
+from simtools.pipeline import StageStore, input_hash, source_hash
+
+
+def test_input_hash():
+    a = np.arange(4.0)
+    assert input_hash(a, {"x": 1, "y": [1, 2]}) == input_hash(a.copy(), {"y": [1, 2], "x": 1})
+    assert input_hash(a) != input_hash(a.astype(np.float32))
+    assert input_hash(a) != input_hash(a.reshape(2, 2))
+    assert input_hash([1, 2], 3) != input_hash([1, 2, 3])
+
+
+def test_source_hash():
+    def f(x):
+        return x + 1
+
+    def g(x):
+        return x + 2
+    assert source_hash(f) == source_hash(f)
+    assert source_hash(f) != source_hash(g)
+
+
+def test_store(tmp_path):
+    store = StageStore(tmp_path)
+    assert not store.is_current("ports", "k1")
+    store.save("ports", "k1", {"s11": np.ones(3), "f0": 1e9})
+    store.save("plot", "k2", None)
+    assert store.is_current("ports", "k1") and not store.is_current("ports", "k0")
+    res = store.load("ports")
+    np.testing.assert_array_equal(res["s11"], np.ones(3))
+    assert res["f0"] == 1e9
+    assert store.load("plot") is None
+    assert not store.is_current("plot", "k2", outputs=[tmp_path / "plot.png"])
+    (store.path / "ports.npz").unlink()
+    assert not store.is_current("ports", "k1")
+    store.clear()
+    assert not store.is_current("plot", "k2")
+    with pytest.raises(TypeError):
+        store.save("bad", "k", [1, 2])
+
+
+def test_stage_chaining(tmp_path):
+    calls = []
+
+    def ports(scale):
+        calls.append("ports")
+        return {"s11": scale * np.arange(3.0)}
+
+    def post(res):
+        calls.append("post")
+        return {"max": res["s11"].max()}
+
+    def run(upstream, scale):
+        sim = Simulation("example", tmp_path / "geometry.xml", tmp_path)
+        sim.upstream = upstream
+        res = sim.stage("ports", ports, scale)
+        return sim.stage("post", post, res)["max"]
+
+    assert run("fdtd1", 1.0) == 2.0
+    assert calls == ["ports", "post"]
+    # unchanged: both stages are loaded
+    assert run("fdtd1", 1.0) == 2.0
+    assert calls == ["ports", "post"]
+    # a changed input re-runs the stage and everything after it
+    assert run("fdtd1", 2.0) == 4.0
+    assert calls == ["ports", "post"] * 2
+    # a new engine run invalidates all stages
+    run("fdtd2", 2.0)
+    assert calls == ["ports", "post"] * 3
@@ -0,0 +1,86 @@
+from math import pi, sqrt
+
+import numpy as np
+import pytest
+
+from simtools import model_info
+from simtools.preflight import (Estimate, estimate, check, courant_dt, calibrate, load_throughput,
+                                PreflightError, BASE_MEMORY, BYTES_PER_CELL, RINGDOWN_FACTOR, C0)
+
+XML = b"""<?xml version="1.0"?>
+<openEMS>
+  <FDTD NumberOfTimesteps="100000" endCriteria="1e-05" TimeStepFactor="0.5">
+    <Excitation Type="0" f0="0" fc="1e9"/>
+  </FDTD>
+  <ContinuousStructure CoordSystem="0">
+    <RectilinearGrid DeltaUnit="0.001" CoordSystem="0">
+      <XLines>0,1,2,3,4,5,6,7,8,9,10</XLines>
+      <YLines>0,2,4,6</YLines>
+      <ZLines>0,0.5,1</ZLines>
+    </RectilinearGrid>
+  </ContinuousStructure>
+</openEMS>
+"""
+
+
+def test_model_info():
+    lines, unit, coords = model_info.read_grid(XML)
+    assert [len(l) for l in lines] == [11, 4, 3]
+    assert unit == 1e-3 and coords == 0
+    assert model_info.cell_count(lines) == 10 * 3 * 2
+    assert model_info.max_timesteps(XML) == 100000
+    assert model_info.read_excitation(XML)["fc"] == "1e9"
+
+
+def test_courant_dt():
+    lines = [np.arange(11.0), np.arange(0, 7.0, 2), np.arange(0, 1.5, 0.5)]
+    dt = courant_dt(lines, 1e-3)
+    assert dt == pytest.approx(1 / (C0 * sqrt(1/1e-3**2 + 1/2e-3**2 + 1/0.5e-3**2)))
+    assert courant_dt(lines, 1e-3, factor=0.5) == pytest.approx(dt / 2)
+    # cylindrical: the smallest angular cell is at the smallest positive radius
+    cyl = [np.array([0.0, 1, 2]), np.array([0.0, 0.1]), np.array([0.0, 1])]
+    assert courant_dt(cyl, 1.0, coord_system=1) == pytest.approx(1 / (C0 * sqrt(1 + 1/0.1**2 + 1)))
+
+
+def test_estimate(tmp_path):
+    fn = tmp_path / "model.xml"
+    fn.write_bytes(XML)
+    est = estimate(fn, mcells_per_s=1.0)
+    assert est.cells == 60
+    assert est.memory == BASE_MEMORY + 60 * BYTES_PER_CELL
+    lines, unit, _ = model_info.read_grid(XML)
+    assert est.dt == pytest.approx(courant_dt(lines, unit, factor=0.5))
+    # Gaussian pulse of +-9 sigma, rung down over RINGDOWN_FACTOR pulse lengths
+    assert est.excitation_timesteps == int(np.ceil(18 / (2*pi*1e9) / est.dt))
+    assert est.timesteps == RINGDOWN_FACTOR * est.excitation_timesteps
+    assert est.runtime == pytest.approx(60 * est.timesteps / 1e6)
+    assert est.as_dict()["mesh_lines"] == [11, 4, 3]
+
+
+def test_timesteps_capped_by_nrts():
+    lines = [np.arange(3.0)] * 3
+    est = Estimate(lines, 1, 0, 1e-12, 500, 100, 1e-5, 1.0)
+    assert est.timesteps == 500
+    est = Estimate(lines, 1, 0, 1e-12, 500, 100, 0, 1.0)
+    assert est.timesteps == 500
+    est = Estimate(lines, 1, 0, 1e-12, None, None, 1e-5, 1.0)
+    assert est.timesteps is None and est.runtime is None
+
+
+def test_check_modes():
+    est = estimate(XML, mcells_per_s=1.0)
+    assert check(est, mode="warn", memory=10 * est.memory) == []
+    with pytest.warns(RuntimeWarning, match="available"):
+        assert len(check(est, mode="warn", memory=est.memory / 2)) == 1
+    with pytest.raises(PreflightError, match="limit"):
+        check(est, mode="strict", memory=10 * est.memory, max_runtime=est.runtime / 2)
+    assert check(est, mode="off", memory=1) == []
+
+
+def test_calibration(tmp_path):
+    fn = tmp_path / "throughput.json"
+    assert calibrate({"results": {"a": {"mcells_per_s": 10}, "b": {"mcells_per_s": 30},
+                                  "c": {"mcells_per_s": 20}, "d": {}}}, fn) == 20
+    assert load_throughput(fn) == 20
+    with pytest.raises(ValueError):
+        calibrate({"results": {}}, fn)
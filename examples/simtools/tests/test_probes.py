@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from simtools import probes
+from simtools.probes import iter_probe, probe_memmap, probe_dft, DFTAccumulator, StreamingLumpedPort, ProbePort, ProbeTraces
+
+
+def write_probe(fn, t, val):
+    with open(fn, "w") as fh:
+        fh.write("% time-domain probe\n% t/s  value\n")
+        for a, b in zip(t, val):
+            fh.write(f"{a:.12e}\t{b:.12e}\n")
+
+
+def pulse(t):
+    return np.exp(-((t - 2e-9)/3e-10)**2)
+
+
+def test_chunks_and_limit(tmp_path):
+    t = np.arange(1000) * 1e-11
+    write_probe(tmp_path / "ut1", t, pulse(t))
+    chunks = list(iter_probe(tmp_path / "ut1", chunk_size=64))
+    assert max(len(c[0]) for c in chunks) == 64
+    np.testing.assert_allclose(np.concatenate([c[0] for c in chunks]), t)
+    limited = np.concatenate([c[0] for c in iter_probe(tmp_path / "ut1", chunk_size=64, t_max=5e-9)])
+    assert limited[-2] <= 5e-9 < limited[-1] or limited[-1] == 5e-9
+
+
+def test_memmap(tmp_path):
+    t = np.arange(300) * 1e-11
+    write_probe(tmp_path / "it1", t, pulse(t))
+    data = probe_memmap(tmp_path / "it1", chunk_size=50)
+    assert data.shape == (300, 2)
+    np.testing.assert_allclose(data[:, 1], pulse(t), rtol=1e-10)
+
+
+def test_dft_matches_direct_sum(tmp_path):
+    t = np.arange(2000) * 1e-11
+    val = pulse(t)
+    write_probe(tmp_path / "ut1", t, val)
+    f = np.linspace(1e8, 2e9, 7)
+    direct = 2 * 1e-11 * np.exp(-2j*np.pi*np.outer(f, t)) @ val
+    np.testing.assert_allclose(probe_dft(tmp_path / "ut1", f, chunk_size=128), direct, rtol=1e-8)
+
+    acc = DFTAccumulator(f, block_elements=10)
+    acc.update(t, val)
+    np.testing.assert_allclose(acc.result(), direct, rtol=1e-8)
+
+
+def test_lumped_port_matched(tmp_path):
+    # u = Z*i: no reflected wave
+    t = np.arange(1000) * 1e-11
+    write_probe(tmp_path / "port_ut_1", t, 50*pulse(t))
+    write_probe(tmp_path / "port_it_1", t, pulse(t))
+    port = StreamingLumpedPort(tmp_path, 1, Z_ref=50)
+    port.calc(np.array([5e8, 1e9]))
+    np.testing.assert_allclose(port.uf_ref, 0, atol=1e-20)
+    np.testing.assert_allclose(port.uf_inc, port.uf_tot)
+    t_w, u, i, u_inc, u_ref = port.read_waves()
+    np.testing.assert_allclose(u_ref, 0, atol=1e-9)
+
+
+class MSLPort:
+    U_filenames = ["port_ut1A", "port_ut1B", "port_ut1C"]
+    I_filenames = ["port_it1A", "port_it1B"]
+
+
+def test_probe_port_reads_traces_once(tmp_path, monkeypatch):
+    t = np.arange(1000) * 1e-11
+    for fn in MSLPort.U_filenames:
+        write_probe(tmp_path / fn, t, 50*pulse(t))
+    write_probe(tmp_path / "port_it1A", t, 0.5*pulse(t))
+    write_probe(tmp_path / "port_it1B", t, 1.5*pulse(t))
+    traces = ProbeTraces(tmp_path, chunk_size=128)
+    port = ProbePort.of(MSLPort(), traces)
+    assert port.u_probes == {"port_ut1B": 1.0}
+
+    reads = []
+    memmap = probes.probe_memmap
+    monkeypatch.setattr(probes, "probe_memmap", lambda fn, chunk_size: reads.append(fn) or memmap(fn, chunk_size))
+    f = np.array([5e8, 1e9])
+    port.CalcPort(str(tmp_path), f, ref_impedance=50)
+    # averaged current 1.0*pulse: matched
+    np.testing.assert_allclose(port.uf_tot, probe_dft(tmp_path / "port_ut1B", f))
+    np.testing.assert_allclose(port.uf_ref, 0, atol=1e-20)
+    port.CalcPort(tmp_path, [2e9], ref_impedance=25)
+    assert port.uf_ref.shape == (1,) and np.all(port.uf_ref != 0)
+    assert len(reads) == 3
+
+    with pytest.raises(ValueError):
+        port.CalcPort(tmp_path / "other", f)
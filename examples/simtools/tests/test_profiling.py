@@ -0,0 +1,69 @@
+import json
+
+from simtools.profiling import Profiler, aggregate, format_report, load_reports, phase_peak, main
+
+
+def test_phases_in_order():
+    prof = Profiler("example")
+    prof.checkpoint("setup")
+    prof.checkpoint("mesh")
+    with prof.phase("run"):     # ends the open sequential phase first
+        pass
+
+    @prof.timed()
+    def post():
+        return 1
+
+    assert post() == 1
+    prof.checkpoint("plot")
+    prof.set(cells=1000)
+    rep = prof.report()
+    assert [p["name"] for p in rep["phases"]] == ["setup", "mesh", "run", "post", "plot"]
+    assert rep["info"] == {"cells": 1000}
+    for a, b in zip(rep["phases"], rep["phases"][1:]):
+        assert a["start"] + a["wall_time"] <= b["start"] + 1e-9
+    for p in rep["phases"]:
+        assert p["wall_time"] >= 0
+        assert p["cumulative_peak_rss_mb"] > 0
+    # the report closes the open phase only once
+    assert len(prof.report()["phases"]) == 5
+
+
+def test_format_report():
+    prof = Profiler("example")
+    with prof.phase("run"):
+        pass
+    text = format_report(prof.report())
+    assert text.startswith("example: ")
+    assert "run" in text and "peak so far" in text
+
+
+def report(name, phases, total=10.0, peak=100.0):
+    return {"name": name, "total_wall_time": total, "peak_rss_mb": peak,
+            "phases": [{"name": n, "wall_time": w, "cumulative_peak_rss_mb": r} for n, w, r in phases]}
+
+
+def test_aggregate():
+    reps = [report("a", [("run", 2.0, 50.0), ("post", 1.0, 60.0), ("post", 0.5, 70.0)]),
+            report("a", [("run", 4.0, 80.0)], total=20.0, peak=120.0)]
+    stats = aggregate(reps)
+    assert stats[("a", "run")]["count"] == 2
+    assert stats[("a", "run")]["mean"] == 3.0
+    assert stats[("a", "run")]["cumulative_peak_rss_mb"] == 80.0
+    # repeated phases of one run are summed
+    assert stats[("a", "post")]["count"] == 1
+    assert stats[("a", "post")]["max"] == 1.5
+    assert stats[("a", "post")]["cumulative_peak_rss_mb"] == 70.0
+    assert stats[("a", "total")]["min"] == 10.0
+
+
+def test_old_reports(tmp_path):
+    rep = report("a", [])
+    rep["phases"] = [{"name": "run", "wall_time": 1.0, "peak_rss_mb": 42.0}]
+    assert phase_peak(rep["phases"][0]) == 42.0
+    fn = tmp_path / "profile.json"
+    fn.write_text(json.dumps(rep))
+    assert load_reports([fn]) == [rep]
+    out = tmp_path / "summary.json"
+    assert main(["summarize", str(fn), "--json", str(out)]) == 0
+    assert json.loads(out.read_text())[0]["cumulative_peak_rss_mb"] == 42.0
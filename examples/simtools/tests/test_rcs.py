@@ -0,0 +1,44 @@
+import numpy as np
+
+from simtools import rcs
+from simtools.farfield import FarField
+from simtools.rcs import RCSResult, backscatter_angles, calc_monostatic, calc_rcs
+
+
+def test_backscatter_angles():
+    # phi is arbitrary at the pole
+    assert backscatter_angles([0, 0, -1])[0] == 0
+    np.testing.assert_allclose(backscatter_angles([-1, 0, 0]), (90, 0), atol=1e-12)
+    np.testing.assert_allclose(backscatter_angles([0, -1, 0]), (90, 90), atol=1e-12)
+
+
+def test_monostatic():
+    freq = np.array([1e9, 2e9])
+    theta = np.linspace(0, 180, 19)
+    phi = np.array([-180, -90, 0, 90])
+    rcs = np.zeros((2, len(theta), len(phi)))
+    rcs[:, 9, 2] = [1.0, 2.0]
+    res = RCSResult(freq, theta, phi, rcs, S_inc=None, farfield=None)
+    # wave travelling along -x, backscatter towards +x (theta=90, phi=0)
+    np.testing.assert_allclose(res.monostatic([-1, 0, 0]), [1.0, 2.0])
+    np.testing.assert_array_equal(res.at_freq(1.9e9), rcs[1])
+
+
+class FakeFarField:
+    def __init__(self):
+        self.calls = []
+
+    def calc(self, freq, theta, phi, center=[0, 0, 0], verbose=0):
+        self.calls.append((len(freq), len(theta), len(phi)))
+        return FarField(freq=freq, theta=theta, phi=phi, P_rad=np.ones((len(freq), len(theta), len(phi))))
+
+
+def test_monostatic_requests_backscatter_only(monkeypatch):
+    monkeypatch.setattr(rcs, "incident_power_density", lambda sim_path, freq, E_dir, probe: np.full(len(freq), 4*np.pi))
+    farfield = FakeFarField()
+    freq = np.linspace(1e8, 1e9, 100)
+    back = calc_monostatic(None, "sim", freq, [-1, 0, 0], [0, 0, 1], farfield=farfield)
+    np.testing.assert_allclose(back, 1.0)
+    cut = calc_rcs(None, "sim", 5e8, 90, np.arange(-180, 180.1, 2), [0, 0, 1], farfield=farfield)
+    assert cut.at_freq(5e8).shape == (1, 181)
+    assert farfield.calls == [(100, 1, 1), (1, 1, 181)]
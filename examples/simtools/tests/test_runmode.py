@@ -0,0 +1,31 @@
+import sys
+
+import pytest
+
+from simtools import runmode
+
+
+def test_mode_argument_does_not_change_argv(monkeypatch):
+    argv = ["script.py", "--mode", "headless", "--other"]
+    monkeypatch.setattr(sys, "argv", list(argv))
+    assert runmode.mode_argument() == "headless"
+    assert sys.argv == argv
+    assert runmode.mode_argument(["x", "--mode=preview"]) == "preview"
+    assert runmode.mode_argument(["x", "--mode"]) is None
+
+
+def test_modes(monkeypatch):
+    monkeypatch.setattr(runmode, "_mode", None)
+    monkeypatch.setattr(sys, "argv", ["script.py"])
+    monkeypatch.setenv(runmode.MODE_ENV, "headless")
+    assert runmode.mode() == "headless"
+    assert runmode.run_engine() and runmode.postprocess()
+    assert not runmode.plots() and not runmode.select_backend()
+    # plotting calls are ignored without importing matplotlib
+    plt = runmode.pyplot()
+    plt.figure().add_subplot(111).plot([1], [2])
+    monkeypatch.setattr(runmode, "_mode", None)
+    monkeypatch.setenv(runmode.MODE_ENV, "nonsense")
+    with pytest.raises(ValueError):
+        runmode.mode()
+    monkeypatch.setattr(runmode, "_mode", None)
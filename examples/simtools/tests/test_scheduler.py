@@ -0,0 +1,28 @@
+from pathlib import Path
+
+from simtools.scheduler import Job, thread_budget, run_jobs, summary_table
+
+
+def test_thread_budget():
+    assert thread_budget(8, range(3)) == (3, 2)
+    assert thread_budget(8, range(3), max_parallel=1) == (1, 8)
+    assert thread_budget(2, range(5)) == (2, 1)
+    assert thread_budget(0, range(2)) == (1, 1)
+
+
+def test_run_jobs(tmp_path):
+    ok = tmp_path / "ok.py"
+    ok.write_text("import os, sys\nsys.exit(0 if os.environ['X'] == '1' and os.environ['OPENEMS_NUM_THREADS'] == '2' else 3)\n")
+    jobs = [Job("ok", ok, env={"X": 1}), Job("missing", tmp_path / "missing.py")]
+    run_jobs(jobs, total_threads=4, log_dir=tmp_path / "logs", verbose=False)
+    assert jobs[0].ok and jobs[0].log_file.exists()
+    assert jobs[1].returncode == 127
+
+
+def test_summary_table():
+    jobs = [Job("done", Path("done.py"), returncode=0, wall_time=1.0),
+            Job("failed", Path("failed.py"), returncode=1, wall_time=2.0),
+            Job("interrupted", Path("interrupted.py"))]
+    table = summary_table(jobs)
+    assert "not run" in table and "FAILED" in table
+    assert "1/3 succeeded" in table
@@ -0,0 +1,47 @@
+import numpy as np
+
+from simtools.sweep import grid, latin_hypercube, run_sweep, write_table, read_table
+
+
+def model(index, params, threads):
+    if params["a"] < 0:
+        raise ValueError("negative a")
+    return {"sum": params["a"] + params["b"], "threads": threads}
+
+
+def test_grid():
+    points = grid(a=[1, 2], b=[10, 20, 30])
+    assert len(points) == 6
+    assert points[0] == {"a": 1, "b": 10}
+    assert points[-1] == {"a": 2, "b": 30}
+
+
+def test_latin_hypercube_strata():
+    n = 8
+    points = latin_hypercube(n, seed=1, x=(0, 8), y=(-1, 1))
+    assert points == latin_hypercube(n, seed=1, x=(0, 8), y=(-1, 1))
+    # every stratum is sampled once
+    x = np.array([p["x"] for p in points])
+    np.testing.assert_array_equal(np.sort(np.floor(x)), np.arange(n))
+    y = np.array([p["y"] for p in points])
+    np.testing.assert_array_equal(np.sort(np.floor((y + 1) / 2 * n)), np.arange(n))
+
+
+def test_run_sweep_keeps_failed_points():
+    points = [{"a": 1, "b": 2}, {"a": -1, "b": 0}, {"a": 3, "b": 4}]
+    table = run_sweep(model, points, total_threads=4, max_parallel=2)
+    np.testing.assert_array_equal(table["index"], [0, 1, 2])
+    np.testing.assert_array_equal(table["sum"][[0, 2]], [3, 7])
+    assert np.isnan(table["sum"][1])
+    np.testing.assert_array_equal(table["threads"][[0, 2]], [2, 2])
+    assert table["error"][0] == ""
+    assert "negative a" in table["error"][1]
+
+
+def test_table_round_trip(tmp_path):
+    table = run_sweep(model, grid(a=[1, 2], b=[0.5]), total_threads=1)
+    write_table(table, tmp_path / "sweep.csv")
+    table2 = read_table(tmp_path / "sweep.csv")
+    assert list(table2) == list(table)
+    np.testing.assert_allclose(table2["sum"], table["sum"])
+    np.testing.assert_allclose(table2["a"], [1, 2])
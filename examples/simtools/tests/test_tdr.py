@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from simtools.tdr import tdr, extrapolate_to_dc, half_window
+
+
+def test_constant_reflection():
+    # a resistive load: the step response settles at s and Z at the load
+    f = np.linspace(0, 10e9, 201)
+    Z_load = 75.0
+    s = np.full(len(f), (Z_load - 50)/(Z_load + 50), dtype=complex)
+    res = tdr(f, s, 50, window="hamming")
+    late = res.t > 1e-9
+    np.testing.assert_allclose(res.Z[late][:100], Z_load, rtol=1e-2)
+
+
+def test_stacked_ports():
+    f = np.linspace(0, 10e9, 101)
+    s = np.stack([np.full(len(f), 0.2), np.full(len(f), -0.2)]).astype(complex)
+    res = tdr(f, s, Z0=[50, 75])
+    assert res.Z.shape == res.step.shape == (2, len(res.t))
+    np.testing.assert_allclose(res.Z[:, len(res.t)//4], [50*1.2/0.8, 75*0.8/1.2], rtol=1e-2)
+
+
+def test_extrapolate_to_dc():
+    f = np.arange(3, 10) * 1e8
+    s = (1 + 2j) + 0.1*f/1e8
+    f2, s2 = extrapolate_to_dc(f, s)
+    np.testing.assert_allclose(f2, np.arange(10) * 1e8)
+    np.testing.assert_allclose(s2[1:3], (1 + 2j) + 0.1*np.arange(1, 3))
+    assert s2[0].imag == 0
+    with pytest.raises(ValueError):
+        extrapolate_to_dc(np.array([1.5e8, 2.5e8, 3.5e8]), s[:3])
+
+
+def test_half_window():
+    w = half_window(11)
+    assert len(w) == 11 and w[0] == pytest.approx(1) and np.all(np.diff(w) <= 0)
+    with pytest.raises(ValueError):
+        half_window(11, "nope")
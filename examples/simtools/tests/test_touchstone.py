@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from simtools.touchstone import write_touchstone, read_touchstone
+
+
+def random_s(nf, N, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.normal(size=(nf, N, N)) + 1j*rng.normal(size=(nf, N, N))) / 3
+
+
+@pytest.mark.parametrize("fmt", ["RI", "MA", "DB"])
+@pytest.mark.parametrize("version", [1, 2])
+@pytest.mark.parametrize("N", [1, 2, 3, 4])
+def test_round_trip(tmp_path, fmt, version, N):
+    f = np.linspace(1e6, 10e9, 11)
+    S = random_s(len(f), N)
+    fn = tmp_path / f"net.s{N}p"
+    write_touchstone(fn, f, S, z0=50, fmt=fmt, version=version)
+    f2, S2, z0 = read_touchstone(fn)
+    np.testing.assert_allclose(f2, f, rtol=1e-10)
+    np.testing.assert_allclose(S2, S, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(z0, 50)
+
+
+def test_frequency_unit(tmp_path):
+    f = np.array([1e9, 2e9])
+    S = random_s(2, 2)
+    fn = tmp_path / "net.s2p"
+    write_touchstone(fn, f, S, freq_unit="GHz")
+    f2, S2, _ = read_touchstone(fn)
+    np.testing.assert_allclose(f2, f)
+    np.testing.assert_allclose(S2, S, rtol=1e-9)
+
+
+def test_one_port_vector(tmp_path):
+    f = np.linspace(1e9, 2e9, 5)
+    s11 = random_s(5, 1)[:, 0, 0]
+    fn = tmp_path / "net.s1p"
+    write_touchstone(fn, f, s11)
+    _, S, _ = read_touchstone(fn)
+    assert S.shape == (5, 1, 1)
+    np.testing.assert_allclose(S[:, 0, 0], s11, rtol=1e-9)
+
+
+def test_per_port_reference(tmp_path):
+    f = np.linspace(1e9, 2e9, 3)
+    S = random_s(3, 2)
+    fn = tmp_path / "net.s2p"
+    write_touchstone(fn, f, S, z0=[50, 75], version=2)
+    _, S2, z0 = read_touchstone(fn)
+    np.testing.assert_allclose(z0, [50, 75])
+    np.testing.assert_allclose(S2, S, rtol=1e-9)
+    with pytest.raises(ValueError):
+        write_touchstone(fn, f, S, z0=[50, 75], version=1)
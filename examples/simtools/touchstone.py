@@ -0,0 +1,206 @@
+"""
+ Touchstone (v1 and v2) reader and writer for N-port S-parameter data.
+
+ S-parameters are handled as complex arrays of shape (nfreq, N, N). The
+ writer converts the whole array to the requested number format in one
+ vectorized pass and writes it in chunks of frequency points, each chunk
+ being formatted with a single string operation.
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+FREQ_UNITS = {"HZ": 1.0, "KHZ": 1e3, "MHZ": 1e6, "GHZ": 1e9}
+FORMATS = ("RI", "MA", "DB")
+
+
+def _column_order(N):
+    """(row, col) index pairs in the order the data is stored in the file."""
+    if N == 2:
+        # 2-port data is stored as N11 N21 N12 N22
+        return [(0, 0), (1, 0), (0, 1), (1, 1)]
+    return [(i, j) for i in range(N) for j in range(N)]
+
+
+def _row_format(N, num_fmt):
+    """printf style format of one frequency point, with line breaks as per spec."""
+    pair = f"{num_fmt} {num_fmt}"
+    if N <= 2:
+        return " ".join([num_fmt] + [pair] * (N * N)) + "\n"
+    lines = []
+    for _ in range(N):
+        # every matrix row starts on a new line, with at most 4 pairs per line
+        row = [pair] * N
+        chunks = [" ".join(row[k:k+4]) for k in range(0, N, 4)]
+        lines.extend(chunks)
+    lines[0] = f"{num_fmt} " + lines[0]
+    return "\n".join(lines[:1] + ["  " + l for l in lines[1:]]) + "\n"
+
+
+def _to_columns(freq, S, fmt, freq_scale):
+    """Build the (nfreq, 1 + 2*N*N) real array written to the file."""
+    nf, N, _ = S.shape
+    order = _column_order(N)
+    rows = np.array([i for i, j in order])
+    cols = np.array([j for i, j in order])
+    s = S[:, rows, cols]
+
+    if fmt == "RI":
+        a, b = s.real, s.imag
+    elif fmt == "MA":
+        a, b = np.abs(s), np.angle(s, deg=True)
+    elif fmt == "DB":
+        a, b = 20.0*np.log10(np.abs(s)), np.angle(s, deg=True)
+    else:
+        raise ValueError(f"unknown Touchstone format {fmt!r}, use one of {FORMATS}")
+
+    data = np.empty((nf, 1 + 2*N*N))
+    data[:, 0] = np.asarray(freq) / freq_scale
+    data[:, 1::2] = a
+    data[:, 2::2] = b
+    return data
+
+
+def write_touchstone(filename, freq, S, z0=50, fmt="RI", version=1, freq_unit="Hz",
+                     comments=None, chunk_size=8192, precision=12):
+    """
+    Write S-parameters to a Touchstone file.
+
+    freq:      frequencies in Hz, shape (nfreq,)
+    S:         complex S-matrix, shape (nfreq, N, N) (or (nfreq,) for 1-port)
+    z0:        reference impedance, scalar or one value per port (v2 only)
+    fmt:       'RI', 'MA' or 'DB'
+    version:   1 or 2
+    """
+    S = np.asarray(S)
+    if S.ndim == 1:
+        S = S[:, None, None]
+    nf, N, _ = S.shape
+    fmt = fmt.upper()
+    unit = freq_unit.upper()
+    if unit not in FREQ_UNITS:
+        raise ValueError(f"unknown frequency unit {freq_unit!r}")
+    z0 = np.atleast_1d(np.asarray(z0, dtype=float))
+    if len(z0) > 1 and (version == 1 or len(z0) != N):
+        if version == 1 and np.all(z0 == z0[0]):
+            z0 = z0[:1]
+        else:
+            raise ValueError("per-port reference impedances need version=2 and one value per port")
+
+    data = _to_columns(freq, S, fmt, FREQ_UNITS[unit])
+    row_fmt = _row_format(N, f"%.{precision}g")
+
+    with open(filename, "w") as fh:
+        for c in (comments or []):
+            fh.write(f"! {c}\n")
+        if version == 2:
+            fh.write("[Version] 2.0\n")
+        fh.write(f"# {freq_unit} S {fmt} R {z0[0]:g}\n")
+        if version == 2:
+            fh.write(f"[Number of Ports] {N}\n")
+            if N == 2:
+                fh.write("[Two-Port Data Order] 21_12\n")
+            fh.write(f"[Number of Frequencies] {nf}\n")
+            if len(z0) > 1:
+                fh.write("[Reference] " + " ".join(f"{z:g}" for z in z0) + "\n")
+            fh.write("[Network Data]\n")
+        else:
+            fh.write("!\n")
+
+        for start in range(0, nf, chunk_size):
+            chunk = data[start:start+chunk_size]
+            fh.write((row_fmt * len(chunk)) % tuple(chunk.ravel()))
+
+        if version == 2:
+            fh.write("[End]\n")
+
+
+def read_touchstone(filename):
+    """
+    Read a Touchstone v1 or v2 file.
+
+    Returns (freq, S, z0) with freq in Hz, S of shape (nfreq, N, N) and z0 an
+    array with one reference impedance per port.
+    """
+    filename = Path(filename)
+    N = None
+    nfreq = None
+    z0 = None
+    two_port_order = "21_12"
+    unit, fmt, ref = "GHZ", "MA", 50.0
+    tokens = []
+
+    with open(filename) as fh:
+        for line in fh:
+            line = line.split("!", 1)[0].strip()
+            if not line:
+                continue
+            if line.startswith("#"):
+                opts = line[1:].upper().split()
+                k = 0
+                while k < len(opts):
+                    o = opts[k]
+                    if o in FREQ_UNITS:
+                        unit = o
+                    elif o in FORMATS:
+                        fmt = o
+                    elif o == "R":
+                        ref = float(opts[k+1])
+                        k += 1
+                    elif o != "S":
+                        raise ValueError(f"only S-parameter files are supported, got {o!r}")
+                    k += 1
+                continue
+            if line.startswith("["):
+                key, _, value = line[1:].partition("]")
+                key = key.strip().upper()
+                value = value.strip()
+                if key == "NUMBER OF PORTS":
+                    N = int(value)
+                elif key == "NUMBER OF FREQUENCIES":
+                    nfreq = int(value)
+                elif key == "TWO-PORT DATA ORDER":
+                    two_port_order = value
+                elif key == "REFERENCE":
+                    z0 = [float(v) for v in value.split()]
+                elif key == "END":
+                    break
+                continue
+            if z0 is not None and N is not None and len(z0) < N and not tokens:
+                # [Reference] values may continue on the following lines
+                z0.extend(float(v) for v in line.split())
+                continue
+            tokens.append(line)
+
+    if N is None:
+        ext = filename.suffix.lower()
+        if not (ext.startswith(".s") and ext.endswith("p") and ext[2:-1].isdigit()):
+            raise ValueError(f"cannot determine the number of ports of {filename}")
+        N = int(ext[2:-1])
+
+    values = np.array(" ".join(tokens).split(), dtype=float)
+    width = 1 + 2*N*N
+    if len(values) % width:
+        raise ValueError(f"{filename}: number of values does not match a {N}-port file")
+    data = values.reshape(-1, width)
+    if nfreq is not None and len(data) != nfreq:
+        raise ValueError(f"{filename}: expected {nfreq} frequencies, found {len(data)}")
+
+    a, b = data[:, 1::2], data[:, 2::2]
+    if fmt == "RI":
+        s = a + 1j*b
+    elif fmt == "MA":
+        s = a * np.exp(1j*np.deg2rad(b))
+    else:
+        s = 10**(a/20) * np.exp(1j*np.deg2rad(b))
+
+    order = _column_order(N)
+    if N == 2 and two_port_order == "12_21":
+        order = [(0, 0), (0, 1), (1, 0), (1, 1)]
+    S = np.empty((len(data), N, N), dtype=complex)
+    for k, (i, j) in enumerate(order):
+        S[:, i, j] = s[:, k]
+
+    z0 = np.array(z0 if z0 is not None else [ref] * N, dtype=float)
+    return data[:, 0] * FREQ_UNITS[unit], S, z0
@@ -1,18 +1,28 @@
 import os
-from pylab import *
+import sys
+import numpy as np
 
 from CSXCAD  import ContinuousStructure
 from openEMS import openEMS
-from openEMS.physical_constants import *
 
-# preview model/mesh only?
-# postprocess existing data without re-running simulation?
-preview_only = False
-postprocess_only = False
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from simtools import runmode
+from simtools.nport import run_excitations, calc_network
+from simtools.touchstone import write_touchstone
+from simtools.tdr import tdr
+
+# run mode: preview model/mesh only, simulate, postprocess existing data or
+# run without plots (headless); set with --mode or OPENEMS_RUN_MODE
+preview_only = runmode.mode() == 'preview'
+postprocess_only = not runmode.run_engine()
+plt = runmode.pyplot()
 
 # Simulate reverse path (S22 and S12) also?
 full_2port = True
 
+# run the port excitations in parallel worker processes?
+parallel_ports = True
+
 # get *.py model path and put simulation files in data directory below
 model_path = os.path.normcase(os.path.dirname(__file__))
 model_basename = os.path.basename(__file__).replace('.py','')
@@ -44,20 +54,22 @@ Boundaries   = ['PEC', 'PEC', 'PEC', 'PEC', 'PEC', 'PEC']  # xmin xmax ymin ymax
 
 eps_max = 4.4 # maximum permittivity in model, used for calculating max cellsize
 
-lim = exp(energy_limit/10 * log(10))
-FDTD = openEMS(EndCriteria=lim)
-FDTD.SetGaussExcite( (fstart+fstop)/2, (fstop-fstart)/2 )
-FDTD.SetBoundaryCond( Boundaries )
+lim = np.exp(energy_limit/10 * np.log(10))
 
 wavelength_air = (3e8/unit)/fstop
-max_cellsize = wavelength_air/(sqrt(eps_max)*20) # max cellsize is lambda/20 in medium
+max_cellsize = wavelength_air/(np.sqrt(eps_max)*20) # max cellsize is lambda/20 in medium
 max_cellsize = min(max_cellsize, 2) # using lambda/20 would be too large here, creating abrupt steps in cell size -> use smaller value for nicely graded mesh
 
 def createSimulation (exciteport):
 # Define function for model creation because we need to create and run separate CSX
 # for each excitation. For S11,S21 we only need to excite port 1, but for S22,S12
 # we need to excite port 2. This requires separate CSX with different port settings.
+# Each excitation gets its own openEMS instance, so the runs are independent and
+# can be executed in parallel.
 
+    FDTD = openEMS(EndCriteria=lim)
+    FDTD.SetGaussExcite( (fstart+fstop)/2, (fstop-fstart)/2 )
+    FDTD.SetBoundaryCond( Boundaries )
 
     ############ Geometry setup ############
     CSX = ContinuousStructure()
@@ -118,12 +130,12 @@ def createSimulation (exciteport):
     port_zmin = BottomMetal_zmax
     port_zmax = TopMetal_zmin
 
-    if exciteport==1:
-        port1 = FDTD.AddLumpedPort(1, Z0, [-lline/2, -wline/2, port_zmin], [-lline/2, wline/2, port_zmax], 'z', excite=1.0, priority=150)
-        port2 = FDTD.AddLumpedPort(2, Z0, [ lline/2, -wline/2, port_zmin], [ lline/2, wline/2, port_zmax], 'z', excite=0,   priority=150)
-    else:
-        port1 = FDTD.AddLumpedPort(1, Z0, [-lline/2, -wline/2, port_zmin], [-lline/2, wline/2, port_zmax], 'z', excite=0,   priority=150)
-        port2 = FDTD.AddLumpedPort(2, Z0, [ lline/2, -wline/2, port_zmin], [ lline/2, wline/2, port_zmax], 'z', excite=1.0, priority=150)
+    # x position of each port, only the port number exciteport is driven
+    port_xpos = [-lline/2, lline/2]
+    ports = []
+    for n, xpos in enumerate(port_xpos, start=1):
+        excite = 1.0 if n==exciteport else 0
+        ports.append(FDTD.AddLumpedPort(n, Z0, [xpos, -wline/2, port_zmin], [xpos, wline/2, port_zmax], 'z', excite=excite, priority=150))
 
 
     #################  end ports  ################
@@ -141,16 +153,16 @@ def createSimulation (exciteport):
     FDTD.AddEdges2Grid(dirs='all', properties=BottomMetal)
 
     # manual mesh line in substrate
-    mesh.AddLine('z',linspace(Sub_zmin, Sub_zmax, 5))
+    mesh.AddLine('z',np.linspace(Sub_zmin, Sub_zmax, 5))
 
     # fine mesh near port 1
-    mesh.AddLine('x', linspace(-lline/2-wline/2, -lline/2+wline/2, 5))
+    mesh.AddLine('x', np.linspace(-lline/2-wline/2, -lline/2+wline/2, 5))
 
     #finer mesh near port 2
-    mesh.AddLine('x', linspace(+lline/2-wline/2, +lline/2+wline/2, 5))
+    mesh.AddLine('x', np.linspace(+lline/2-wline/2, +lline/2+wline/2, 5))
 
     # fine mesh across line width
-    mesh.AddLine('y', linspace(-wline/2, wline/2,7))
+    mesh.AddLine('y', np.linspace(-wline/2, wline/2,7))
 
 
     # mesh lines at simulation boundaries
@@ -182,18 +194,8 @@ def createSimulation (exciteport):
     CSX_file = os.path.join(excitation_path, model_basename + '.xml')
     CSX.Write2XML(CSX_file)
 
-    if not postprocess_only: # preview model, but only for first port excitation
-        if (exciteport==1):
-            from CSXCAD import AppCSXCAD_BIN
-            os.system(AppCSXCAD_BIN + ' "{}"'.format(CSX_file))
-
-    if not preview_only:  # start simulation
-        if not postprocess_only:
-            print("Running FDTD simulation, excitation port " + str(exciteport))
-            FDTD.Run(excitation_path, verbose=1)
-
-    # return ports, so that we can postprocess them
-    return port1, port2, excitation_path
+    # return the engine and ports, so that we can run and postprocess them
+    return FDTD, ports, excitation_path
 
 ######### end of function createSimulation (exciteport) ##########
 
@@ -201,76 +203,85 @@ def createSimulation (exciteport):
 
 ########### create model, run and post-process ###########
 
-f = np.linspace(fstart,fstop,numfreq)
-
-# call createSimulation function defined above
-sub1_port1, sub1_port2, sub1_excitation_path = createSimulation (1)  # excite port 1
-if full_2port:
-    sub2_port1, sub2_port2, sub2_excitation_path = createSimulation (2)  # excite port 2
-
-if not preview_only:
-    # evaluate port 1 excitation
-    sub1_port1.CalcPort( sub1_excitation_path, f, ref_impedance = Z0)
-    sub1_port2.CalcPort( sub1_excitation_path, f, ref_impedance = Z0)
-
-    s11 = sub1_port1.uf_ref / sub1_port1.uf_inc
-    s21 = sub1_port2.uf_ref / sub1_port1.uf_inc
-
-    if full_2port:
-        # evaluate port 2 excitation
-        sub2_port1.CalcPort( sub2_excitation_path, f, ref_impedance = Z0)
-        sub2_port2.CalcPort( sub2_excitation_path, f, ref_impedance = Z0)
-
-        s22 = sub2_port2.uf_ref / sub2_port2.uf_inc
-        s12 = sub2_port1.uf_ref / sub2_port2.uf_inc
-
-    Zin_port1 = sub1_port1.uf_tot / sub1_port1.if_tot
-
-    ### Plot results
-
-    s11_dB = 20.0*np.log10(np.abs(s11))
-    s11_phase = angle(s11, deg=True)
-
-    s21_dB = 20.0*np.log10(np.abs(s21))
-    s21_phase = angle(s21, deg=True)
-
-    if full_2port:
-        s22_dB = 20.0*np.log10(np.abs(s22))
-        s22_phase = angle(s22, deg=True)
-
-        s12_dB = 20.0*np.log10(np.abs(s12))
-        s12_phase = angle(s12, deg=True)
-
-
-    ## Plot reflection coefficient S11
-    figure()
-    plot( f/1e6, s11_dB, 'k-', linewidth=2, label='dB(S11)' )
-    plot( f/1e6, s21_dB, 'r-', linewidth=2, label='dB(S21)' )
-    grid()
-    title( 'S11 and S21' )
-    xlabel( 'frequency (MHz)' )
-    ylabel( 'dB' )
-    legend()
-
-    if full_2port:
-        # create Touchstone S2P output file in simulation data path
-        s2p_name = os.path.join(sim_path, model_basename + '.s2p')
-        s2p_file = open(s2p_name, 'w')
-        s2p_file.write('#   Hz   S  RI   R   50\n')
-        s2p_file.write('!\n')
-        for index in range(0, numfreq):
-            freq = f[index]
-            s11re = real(s11[index])
-            s11im = imag(s11[index])
-            s12re = real(s12[index])
-            s12im = imag(s12[index])
-            s21re = real(s21[index])
-            s21im = imag(s21[index])
-            s22re = real(s22[index])
-            s22im = imag(s22[index])
-            s2p_file.write(f"{freq} {s11re} {s11im} {s21re} {s21im} {s12re} {s12im} {s22re} {s22im} \n")
-        s2p_file.close()
-
-
-    # show plots
-    show()
+if __name__ == '__main__':
+    f = np.linspace(fstart,fstop,numfreq)
+
+    excite_ports = [1, 2] if full_2port else [1]
+
+    # create one model per excitation, they are written to separate sub-N directories
+    models = {n: createSimulation(n) for n in excite_ports}
+    excitations = {n: (ports, excitation_path) for n, (FDTD, ports, excitation_path) in models.items()}
+
+    if preview_only: # preview model, but only for first port excitation
+        CSX_file = os.path.join(excitations[1][1], model_basename + '.xml')
+        runmode.preview(CSX_file)
+
+    if not preview_only and not postprocess_only:  # start simulations
+        # the models built above are run, one after the other if not parallel_ports
+        run_excitations({n: (FDTD, excitation_path) for n, (FDTD, ports, excitation_path) in models.items()},
+                        max_parallel=None if parallel_ports else 1, verbose=1)
+
+    if not preview_only:
+        # evaluate all excitations, S[:, i, j] is S(i+1)(j+1)
+        net = calc_network(excitations, f, ref_impedance = Z0)
+        S = net.S
+
+        s11 = S[:, 0, 0]
+        s21 = S[:, 1, 0]
+
+        if full_2port:
+            s22 = S[:, 1, 1]
+            s12 = S[:, 0, 1]
+
+        Zin_port1 = net.Z_in[:, 0]
+
+        ### Plot results
+
+        s11_dB = 20.0*np.log10(np.abs(s11))
+        s11_phase = np.angle(s11, deg=True)
+
+        s21_dB = 20.0*np.log10(np.abs(s21))
+        s21_phase = np.angle(s21, deg=True)
+
+        if full_2port:
+            s22_dB = 20.0*np.log10(np.abs(s22))
+            s22_phase = np.angle(s22, deg=True)
+
+            s12_dB = 20.0*np.log10(np.abs(s12))
+            s12_phase = np.angle(s12, deg=True)
+
+
+        ## Plot reflection coefficient S11
+        plt.figure()
+        plt.plot( f/1e6, s11_dB, 'k-', linewidth=2, label='dB(S11)' )
+        plt.plot( f/1e6, s21_dB, 'r-', linewidth=2, label='dB(S21)' )
+        plt.grid()
+        plt.title( 'S11 and S21' )
+        plt.xlabel( 'frequency (MHz)' )
+        plt.ylabel( 'dB' )
+        plt.legend()
+
+        if full_2port:
+            # create Touchstone S2P output file in simulation data path
+            s2p_name = os.path.join(sim_path, model_basename + '.s2p')
+            write_touchstone(s2p_name, f, S, z0=Z0, fmt='RI')
+
+        # impedance profile seen from each excited port, computed directly
+        # from the S-parameters without going through the Touchstone file
+        refl = np.stack([S[:, n-1, n-1] for n in excite_ports])
+        tdr_res = tdr(f, refl, Z0, window='hamming')
+
+        plt.figure()
+        for n, Z_tdr in zip(excite_ports, tdr_res.Z):
+            plt.plot( tdr_res.t*1e9, Z_tdr, linewidth=2, label='port {}'.format(n) )
+        plt.xlim(0, 2)
+        plt.ylim(0, 100)
+        plt.grid()
+        plt.title( 'Time Domain Reflectometry' )
+        plt.xlabel( 'time (ns)' )
+        plt.ylabel( 'impedance (Ohm)' )
+        plt.legend()
+
+
+        # show plots
+        runmode.show()
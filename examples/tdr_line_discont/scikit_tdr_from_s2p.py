@@ -1,7 +1,16 @@
 import sys
 import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from simtools import runmode
+
+# this script only plots
+if not runmode.plots():
+    sys.exit(0)
+runmode.select_backend()  # before skrf imports pyplot
+plt = runmode.pyplot()
+
 import skrf
-import matplotlib.pyplot as plt
 skrf.stylely()
 
 model_path = os.path.normcase(os.path.dirname(__file__))
@@ -16,5 +25,5 @@ network_dc.s11.plot_z_time_step(window='hamming', label="impedance")
 plt.xlim((0, 2))
 
 plt.tight_layout()
-plt.show()
+runmode.show()
 
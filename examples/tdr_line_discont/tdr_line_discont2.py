@@ -1,15 +1,21 @@
 
 import os
-from pylab import *
+import sys
+import numpy as np
 
 from CSXCAD  import ContinuousStructure
 from openEMS import openEMS
 from openEMS.physical_constants import *
 
-# preview model/mesh only?
-# postprocess existing data without re-running simulation?
-preview_only = False
-postprocess_only = False
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from simtools import runmode
+from simtools.probes import StreamingLumpedPort
+
+# run mode: preview model/mesh only, simulate, postprocess existing data or
+# run without plots (headless); set with --mode or OPENEMS_RUN_MODE
+preview_only = runmode.mode() == 'preview'
+postprocess_only = not runmode.run_engine()
+plt = runmode.pyplot()
 
 # get *.py model path and put simulation files in data directory below
 model_path = os.path.normcase(os.path.dirname(__file__))
@@ -33,9 +39,7 @@ os.chdir(sim_path)
 unit = 1e-3 # specify everything in mm
 Z0=50 # reference impedance for ports
 
-fstart = 0
 fstop  = 10e9
-numfreq = 2001  # number of frequency points (has no effect on simulation time!)
 
 maxtime = 2e-9 # stop limit (real time in seconds)
 
@@ -44,7 +48,7 @@ Boundaries   = ['PEC', 'PEC', 'PEC', 'PEC', 'PEC', 'PEC']  # xmin xmax ymin ymax
 
 eps_max = 4.4 # maximum permittivity in model, used for calculating max cellsize
 
-lim = exp(energy_limit/10 * log(10))
+lim = np.exp(energy_limit/10 * np.log(10))
 FDTD = openEMS(EndCriteria=lim, MaxTime=maxtime)
 FDTD.SetStepExcite(fstop)
 FDTD.SetBoundaryCond( Boundaries )
@@ -52,7 +56,7 @@ FDTD.SetBoundaryCond( Boundaries )
 FDTD.SetOverSampling (20)   # <<<<<<<<<<<<<<<<<<<<<<< oversampling for smoother time curves <<<<<<<<<<<<<<<<<<<<<<<<<<
 
 wavelength_air = (3e8/unit)/fstop
-max_cellsize = wavelength_air/(sqrt(eps_max)*20) # max cellsize is lambda/20 in medium
+max_cellsize = wavelength_air/(np.sqrt(eps_max)*20) # max cellsize is lambda/20 in medium
 
 ############ Geometry setup ############
 CSX = ContinuousStructure()
@@ -113,8 +117,8 @@ TopMetal.AddBox(priority=200, start=[xdiscont-lline/2, -wdiscont/2, TopMetal_zmi
 port_zmin = BottomMetal_zmax
 port_zmax = TopMetal_zmin
 
-port1 = FDTD.AddLumpedPort(1, Z0, [-lline/2, -wline/2, port_zmin], [-lline/2, wline/2, port_zmax], 'z', excite=1.0, priority=150)
-port2 = FDTD.AddLumpedPort(2, Z0, [ lline/2, -wline/2, port_zmin], [ lline/2, wline/2, port_zmax], 'z', excite=0,   priority=150)
+FDTD.AddLumpedPort(1, Z0, [-lline/2, -wline/2, port_zmin], [-lline/2, wline/2, port_zmax], 'z', excite=1.0, priority=150)
+FDTD.AddLumpedPort(2, Z0, [ lline/2, -wline/2, port_zmin], [ lline/2, wline/2, port_zmax], 'z', excite=0,   priority=150)
 
 #################  end ports  ################
 
@@ -131,16 +135,16 @@ FDTD.AddEdges2Grid(dirs='all', properties=TopMetal)
 FDTD.AddEdges2Grid(dirs='all', properties=BottomMetal)
 
 # manual mesh line in substrate
-mesh.AddLine('z',linspace(Sub_zmin, Sub_zmax, 5))
+mesh.AddLine('z',np.linspace(Sub_zmin, Sub_zmax, 5))
 
 # fine mesh near port 1
-mesh.AddLine('x', linspace(-lline/2-wline/2, -lline/2+wline/2, 5))
+mesh.AddLine('x', np.linspace(-lline/2-wline/2, -lline/2+wline/2, 5))
 
 #finer mesh near port 2
-mesh.AddLine('x', linspace(+lline/2-wline/2, +lline/2+wline/2, 5))
+mesh.AddLine('x', np.linspace(+lline/2-wline/2, +lline/2+wline/2, 5))
 
 # fine mesh across line width
-mesh.AddLine('y', linspace(-wline/2, wline/2, 7))
+mesh.AddLine('y', np.linspace(-wline/2, wline/2, 7))
 
 
 # mesh lines at simulation boundaries
@@ -166,9 +170,7 @@ mesh.SmoothMeshLines('z', max_cellsize, 1.3)
 CSX_file = os.path.join(sim_path, model_basename + '.xml')
 CSX.Write2XML(CSX_file)
 
-if not postprocess_only: # preview model, but only for first port excitation
-    from CSXCAD import AppCSXCAD_BIN
-    os.system(AppCSXCAD_BIN + ' "{}"'.format(CSX_file))
+runmode.preview(CSX_file) # only opened in preview mode
 
 if not preview_only:  # start simulation
     if not postprocess_only:
@@ -178,62 +180,51 @@ if not preview_only:  # start simulation
 
 ########### create model, run and post-process ###########
 
-f = np.linspace(fstart,fstop,numfreq)
-
 # call createSimulation function defined above
 if not preview_only:
-    # evaluate port 1 excitation
-    port1.CalcPort( sim_path, f, ref_impedance = Z0)
-    port2.CalcPort( sim_path, f, ref_impedance = Z0)
+    # the port probes are read chunk by chunk, only the time domain
+    # waves are needed here (no frequency domain port evaluation)
+    sport1 = StreamingLumpedPort(sim_path, 1, Z0)
+    sport2 = StreamingLumpedPort(sim_path, 2, Z0)
 
 
     ### Plot results
 
-    #portVariable.u_data.ui_val[0] = U over time
-    #portVariable.i_data.ui_val[0] = I over time
-    #portVariable.u_data.ui_time[0] = timesteps
-    #portVariable.i_data.ui_time[0] = timesteps (should be same as for voltage)
-
-    u1 = port1.u_data.ui_val[0]
-    u2 = port2.u_data.ui_val[0]
-    i1 = port1.i_data.ui_val[0]
-    i2 = port2.i_data.ui_val[0]
-    t = port1.u_data.ui_time[0]
-
-    portZ = Z0
-    u1_inc = 0.5 * (u1 + i1 * portZ)
-    u1_ref = u1 - u1_inc
-    u2_inc = 0.5 * (u2 + i2 * portZ)
-    u2_ref = u2 - u2_inc
+    # t = timesteps, u/i = port voltage/current over time
+    # the run stops at maxtime, so the whole traces are plotted; for longer
+    # runs read_waves(t_max=...) stops reading after the plotted window
+    t_plot = maxtime
+    t, u1, i1, u1_inc, u1_ref = sport1.read_waves()
+    _, u2, i2, u2_inc, u2_ref = sport2.read_waves()
 
 
-    figure()
-    plot(t,u1 / u1_inc, 'k-', label='u1')
-    plot(t,u2 / u1_inc, 'r--',label='u2')
-    plot(t,u1_ref / u1_inc, 'b--', label='u1 reflected')
-    xlim(0, 2e-9)
-    grid()
-    legend()
-    ylabel('Port voltages (normalized to incident)')
-    xlabel('Time (s)')
+    plt.figure()
+    plt.plot(t,u1 / u1_inc, 'k-', label='u1')
+    plt.plot(t,u2 / u1_inc, 'r--',label='u2')
+    plt.plot(t,u1_ref / u1_inc, 'b--', label='u1 reflected')
+    plt.xlim(0, t_plot)
+    plt.grid()
+    plt.legend()
+    plt.ylabel('Port voltages (normalized to incident)')
+    plt.xlabel('Time (s)')
 
-    savefig(os.path.join(sim_path,'voltages.png'))
+    plt.savefig(os.path.join(sim_path,'voltages.png'))
 
     # estimate impedance magnitude
     r = u1_ref / u1_inc
     Z = Z0 * (1+r)/(1-r)
 
-    figure()
-    plot(t,Z, 'k-', label='Z')
-    xlim(0, 2e-9)
-    ylim(0, 100)
-    grid()
-    legend()
-    ylabel('Estimated Z')
-    xlabel('Time (s)')
+    plt.figure()
+    plt.plot(t,Z, 'k-', label='Z')
+    plt.xlim(0, t_plot)
+    plt.ylim(0, 100)
+    plt.grid()
+    plt.legend()
+    plt.ylabel('Estimated Z')
+    plt.xlabel('Time (s)')
 
 
     # show plots
-    show()
+    runmode.show()
 
 